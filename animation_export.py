@@ -0,0 +1,173 @@
+"""
+Animation export of one variable across all forecast times.
+
+Frames are rendered in a process pool with colour levels fixed across the
+whole sequence and streamed, in order, into an ffmpeg encoder, so at most a
+small window of frames is ever held in memory. The pass that finds the
+colour range stores each field in the product store, so the render pass
+reads it back instead of computing it again. Workers are spawned rather than
+forked: the server process holds netCDF/HDF5 locks and service threads that
+a forked child would inherit in an unusable state.
+
+Without ffmpeg, GIF/APNG fall back to Pillow, which keeps every decoded frame
+in memory until saving; that path is capped at PILLOW_MAX_FRAMES.
+"""
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import ANIMATION_DPI, PRODUCT_STORE_DIR
+
+FORMATS = {
+    'gif': ('image/gif', ['-filter_complex', '[0:v]split[a][b];[a]palettegen=stats_mode=diff[p];[b][p]paletteuse',
+                          '-loop', '0', '-f', 'gif']),
+    'mp4': ('video/mp4', ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-movflags', '+faststart', '-f', 'mp4']),
+    'apng': ('image/apng', ['-plays', '0', '-f', 'apng'])
+}
+
+PILLOW_MAX_FRAMES = 100  # frames the in-memory Pillow fallback may hold
+
+_POOL = None
+
+
+def _worker_dataset(location):
+    # One small handle pool per worker process, reused across its frames
+    global _POOL
+    if _POOL is None:
+        from catalog import DatasetPool
+        _POOL = DatasetPool(max_open=4)
+    return _POOL.checkout(location)
+
+
+def _frame_range(args):
+    location, time_idx, var_type, pressure_level = args
+    from precompute import GETTERS, PRODUCTS
+    from product_store import product_key, product_path, write_product
+
+    variable, _ = PRODUCTS[var_type]
+    with _worker_dataset(location) as nc:
+        # The getter reads the product store first, so storing the field here
+        # lets the render pass (in whichever worker) skip computing it again
+        value = GETTERS[variable](nc, time_idx, level=pressure_level)
+        path = product_path(PRODUCT_STORE_DIR, product_key(nc), variable, pressure_level, time_idx)
+        if not os.path.exists(path):
+            try:
+                write_product(path, value)
+            except OSError:
+                pass  # read-only store: the render pass recomputes
+    values = np.asarray(value, dtype=np.float64)
+    return float(np.nanmin(values)), float(np.nanmax(values))
+
+
+def _render_frame(args):
+    location, time_idx, label, var_type, cmap, pressure_level, contour_levels, dpi = args
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from plot_utils import create_plot
+
+    with _worker_dataset(location) as nc:
+        fig, _ = create_plot(nc, var_type, time_idx, cmap, pressure_level, contour_levels)
+    if fig is None:
+        raise RuntimeError(f"Could not render {var_type} at {label}")
+    ax = fig.axes[0]
+    ax.set_title(f"{ax.get_title()}\n{label}", fontsize=16)
+    buf = io.BytesIO()
+    # Fixed canvas (no tight bbox) keeps every frame the same size for the encoder
+    fig.savefig(buf, format='png', dpi=dpi)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def fixed_contour_levels(pool, frames, var_type, pressure_level=None, n_levels=20):
+    """
+    Colour levels shared by every frame, from the range over all times,
+    computed in `pool`. Returns None for wind (barbs only) and the standard
+    0-50 mm for rainfall.
+    """
+    if 'Wind Speed' in var_type:
+        return None
+    if var_type.startswith('Rainfall'):
+        return np.linspace(0, 50, 11)
+    tasks = [(location, time_idx, var_type, pressure_level) for location, time_idx, _ in frames]
+    ranges = list(pool.map(_frame_range, tasks))
+    lo = min(r[0] for r in ranges)
+    hi = max(r[1] for r in ranges)
+    return np.linspace(lo, hi if hi > lo else lo + 1, n_levels)
+
+
+def _ordered_frames(pool, tasks, window):
+    # Keep only `window` frames in flight so memory stays bounded
+    pending = []
+    for task in tasks:
+        pending.append(pool.submit(_render_frame, task))
+        if len(pending) >= window:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+def export_animation(frames, var_type, cmap, pressure_level=None, fmt='gif', fps=2,
+                     workers=None, dpi=ANIMATION_DPI):
+    """
+    Render `frames` - (location, time_idx, label) per forecast time - to an
+    animation and return (bytes, mime type).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported animation format: {fmt}")
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+    if not has_ffmpeg and fmt == 'mp4':
+        raise RuntimeError("MP4 export needs ffmpeg on the PATH")
+    if not has_ffmpeg and len(frames) > PILLOW_MAX_FRAMES:
+        raise RuntimeError(f"Without ffmpeg at most {PILLOW_MAX_FRAMES} frames can be exported "
+                           f"(every frame is held in memory); install ffmpeg or export fewer times")
+    workers = workers or os.cpu_count() or 1
+
+    mime, codec_args = FORMATS[fmt]
+    # One spawned pool for both passes, so the worker start-up is paid once
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        contour_levels = fixed_contour_levels(pool, frames, var_type, pressure_level)
+        tasks = [(location, time_idx, label, var_type, cmap, pressure_level, contour_levels, dpi)
+                 for location, time_idx, label in frames]
+        stream = _ordered_frames(pool, tasks, window=2 * workers)
+        if has_ffmpeg:
+            return _encode_ffmpeg(stream, fps, codec_args), mime
+        return _encode_pillow(stream, fps, fmt), mime
+
+
+def _encode_ffmpeg(stream, fps, codec_args):
+    fd, out_path = tempfile.mkstemp(suffix='.anim')
+    os.close(fd)
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'image2pipe', '-framerate', str(fps),
+               '-i', '-'] + codec_args + [out_path]
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for png in stream:
+            proc.stdin.write(png)
+        proc.stdin.close()
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace')}")
+        with open(out_path, 'rb') as f:
+            return f.read()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        os.remove(out_path)
+
+
+def _encode_pillow(stream, fps, fmt):
+    # Fallback without ffmpeg: Pillow keeps the decoded frames until saving (see PILLOW_MAX_FRAMES)
+    from PIL import Image
+
+    images = [Image.open(io.BytesIO(png)).convert('RGB' if fmt == 'gif' else 'RGBA') for png in stream]
+    buf = io.BytesIO()
+    images[0].save(buf, format='GIF' if fmt == 'gif' else 'PNG', save_all=True,
+                   append_images=images[1:], duration=int(1000 / fps), loop=0)
+    return buf.getvalue()
@@ -0,0 +1,260 @@
+"""
+Benchmark the data and plotting hot paths on a synthetic wrfout file.
+
+    python benchmark.py [--ny 120] [--nx 150] [--levels 33] [--times 8]
+                        [--file wrfout.nc] [--out results.json] [--compare baseline.json]
+
+Times opening the file, every getter (surface and pressure-level, cold and
+from the field cache), summarize_over_county and create_plot/save_figure,
+recording wall time and peak RSS for each. Results are written as JSON keyed
+by the git revision so runs of different revisions can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Keep runs cold and isolated from the app's on-disk caches and product store
+os.environ.setdefault('WRF_CACHE_DIR', tempfile.mkdtemp(prefix='wrf_benchmark_'))
+
+import numpy as np  # noqa: E402
+
+from config import COUNTY_SHAPEFILE_PATH, STANDARD_PRESSURE_LEVELS, SUBCOUNTY_SHAPEFILE_PATH  # noqa: E402
+from synthetic_wrf import make_synthetic_wrfout  # noqa: E402
+
+RSS_SAMPLE_INTERVAL = 0.005  # seconds
+
+
+def _current_rss():
+    """Resident set size of this process in bytes, or None if unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class _PeakRSS:
+    """Samples RSS on a background thread while the block runs."""
+
+    def __enter__(self):
+        self.start = _current_rss()
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = _current_rss()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = _current_rss()
+        if rss is not None and self.peak is not None:
+            self.peak = max(self.peak, rss)
+        return False
+
+
+def _result_nbytes(value):
+    if isinstance(value, (tuple, list)):
+        return sum(_result_nbytes(v) for v in value)
+    if isinstance(value, bytes):
+        return len(value)
+    return int(getattr(value, 'nbytes', 0) or 0)
+
+
+def measure(results, stage, name, func, calls=1):
+    """Run `func()`, append a result record and return its value (None on error)."""
+    record = {'stage': stage, 'name': name, 'calls': calls}
+    value = None
+    with _PeakRSS() as rss:
+        start = time.perf_counter()
+        try:
+            value = func()
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+        record['wall_s'] = time.perf_counter() - start
+    if rss.peak is not None:
+        record['peak_rss_mb'] = rss.peak / 2 ** 20
+        record['rss_delta_mb'] = (rss.peak - rss.start) / 2 ** 20
+    record['result_mb'] = _result_nbytes(value) / 2 ** 20
+    results.append(record)
+    status = record.get('error', f"{record['wall_s'] * 1000:.1f} ms")
+    print(f"{stage:>10} | {name:<32} | {status}")
+    return value
+
+
+def _synthetic_counties(lats, lons, n=3):
+    """n x n grid of box 'counties' covering the domain, for runs without shapefiles."""
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    lat_edges = np.linspace(np.min(lats), np.max(lats), n + 1)
+    lon_edges = np.linspace(np.min(lons), np.max(lons), n + 1)
+    polygons = [box(lon_edges[i], lat_edges[j], lon_edges[i + 1], lat_edges[j + 1])
+                for j in range(n) for i in range(n)]
+    names = [f"Synthetic {k + 1}" for k in range(len(polygons))]
+    return gpd.GeoDataFrame({'NAME_1': names}, geometry=polygons, crs="EPSG:4326")
+
+
+def _getter_calls(nc, name, n_times):
+    """(label, zero-argument callables) for every time (and level) of one variable."""
+    from precompute import GETTERS, PRODUCTS
+
+    variable, on_levels = PRODUCTS[name]
+    getter = GETTERS[variable]
+    if not on_levels:
+        yield name, [lambda t=t: getter(nc, t) for t in range(n_times)]
+        return
+    for level in STANDARD_PRESSURE_LEVELS:
+        yield f"{name} {level}hPa", [lambda t=t, lvl=level: getter(nc, t, lvl) for t in range(n_times)]
+
+
+def _call_all(calls):
+    return [call() for call in calls]
+
+
+def run_benchmarks(path, plots=True):
+    from netCDF4 import Dataset
+
+    from data_loader import as_xarray, get_available_variables, get_temperature, load_kenya_shapefiles
+    from field_cache import FIELD_CACHE
+    from metadata_index import build_metadata
+    from plot_utils import create_plot, create_preview_plot, save_figure, summarize_over_county
+
+    results = []
+    nc = measure(results, 'open', 'netCDF4.Dataset', lambda: Dataset(path))
+    measure(results, 'open', 'as_xarray', lambda: as_xarray(nc))
+    available, _ = measure(results, 'open', 'get_available_variables', lambda: get_available_variables(nc)) or ([], None)
+    measure(results, 'open', 'build_metadata', lambda: build_metadata(nc))
+    n_times = len(nc.dimensions['Time'])
+
+    # Getters: cold (empty field cache), then warm (served from the cache)
+    FIELD_CACHE.clear()
+    cases = [case for name, var_type in available for case in _getter_calls(nc, name, n_times)]
+    for label, calls in cases:
+        measure(results, 'getter', label, lambda calls=calls: _call_all(calls), calls=len(calls))
+    for label, calls in cases:
+        measure(results, 'getter-warm', label, lambda calls=calls: _call_all(calls), calls=len(calls))
+
+    # Zonal statistics over one county
+    lats, lons = nc.variables['XLAT'][0], nc.variables['XLONG'][0]
+    if os.path.exists(COUNTY_SHAPEFILE_PATH):
+        gdf, sub_gdf = load_kenya_shapefiles(COUNTY_SHAPEFILE_PATH, SUBCOUNTY_SHAPEFILE_PATH)
+    else:
+        gdf = sub_gdf = _synthetic_counties(lats, lons)
+    county = gdf['NAME_1'].iloc[len(gdf) // 2]
+    t2 = get_temperature(nc, 0)
+    measure(results, 'summarize', f"first call ({county})",
+            lambda: summarize_over_county(gdf, sub_gdf, county, t2, lats, lons))
+    measure(results, 'summarize', f"repeat ({county})",
+            lambda: summarize_over_county(gdf, sub_gdf, county, t2, lats, lons))
+
+    if plots:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        for name, var_type in available:
+            level = 850 if var_type == 'pressure' else None
+            label = f"{name} {level}hPa" if level else name
+            preview = measure(results, 'plot', f"create_preview_plot {label}",
+                              lambda: create_preview_plot(nc, name, 0, 'viridis', level))
+            if preview is None:
+                results[-1].setdefault('error', "create_preview_plot returned no figure")
+            created = measure(results, 'plot', f"create_plot {label}", lambda: create_plot(nc, name, 0, 'viridis', level))
+            fig = created[0] if created else None
+            if fig is None:
+                results[-1].setdefault('error', "create_plot returned no figure")
+                continue
+            measure(results, 'plot', f"save_figure {label}", lambda: save_figure(fig).getvalue())
+            plt.close(fig)
+
+    nc.close()
+    return results
+
+
+def _revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    """Print wall-time ratios against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['stage'], r['name']): r for r in baseline['results'] if 'error' not in r}
+    print(f"\nvs {baseline['meta'].get('revision') or baseline_path}")
+    for record in current['results']:
+        before = previous.get((record['stage'], record['name']))
+        if before is None or 'error' in record or not before['wall_s']:
+            continue
+        ratio = record['wall_s'] / before['wall_s']
+        print(f"{record['stage']:>10} | {record['name']:<32} | {before['wall_s'] * 1000:9.1f} -> "
+              f"{record['wall_s'] * 1000:9.1f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--file', help="benchmark an existing wrfout file instead of a synthetic one")
+    parser.add_argument('--ny', type=int, default=120)
+    parser.add_argument('--nx', type=int, default=150)
+    parser.add_argument('--levels', type=int, default=33)
+    parser.add_argument('--times', type=int, default=8)
+    parser.add_argument('--no-plots', action='store_true', help="skip create_plot/save_figure")
+    parser.add_argument('--out', help="results JSON (default: benchmark-<revision>.json)")
+    parser.add_argument('--compare', help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    path = args.file
+    grid = None
+    if path is None:
+        path = os.path.join(os.environ['WRF_CACHE_DIR'], 'wrfout_d01_synthetic.nc')
+        grid = {'ny': args.ny, 'nx': args.nx, 'levels': args.levels, 'times': args.times}
+        start = time.perf_counter()
+        make_synthetic_wrfout(path, args.ny, args.nx, args.levels, args.times)
+        print(f"Generated {path} ({os.path.getsize(path) / 2 ** 20:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+    revision = _revision()
+    results = run_benchmarks(path, plots=not args.no_plots)
+    report = {
+        'meta': {
+            'revision': revision,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'file': None if grid else path,
+            'grid': grid,
+            'file_mb': os.path.getsize(path) / 2 ** 20
+        },
+        'results': results
+    }
+    out = args.out or f"benchmark-{(revision or 'local')[:10]}.json"
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
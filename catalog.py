@@ -0,0 +1,342 @@
+"""
+Catalog of wrfout files across runs, domains and valid times.
+
+Files are discovered from a local directory tree or an S3-compatible bucket
+listing and indexed by (run, domain). Valid times come from each file's
+metadata sidecar, built from a header read rather than a download. Open
+Dataset handles are kept in a bounded, reference-counted LRU pool so
+browsing many files never exhausts file descriptors.
+"""
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from contextlib import closing, contextmanager
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+import numpy as np
+import requests
+
+from config import DATA_ACCESS_MODE, DOWNLOAD_TIMEOUT, MAX_OPEN_DATASETS
+from dataset_service import get_dataset_service
+from metadata_index import SIDECAR_SUFFIX, file_metadata, valid_times
+
+WRFOUT_PATTERN = re.compile(
+    r'wrfout_d(?P<domain>\d{2})_(?P<date>\d{4}-\d{2}-\d{2})_(?P<hour>\d{2})[:_](?P<minute>\d{2})[:_](?P<second>\d{2})'
+)
+
+CatalogEntry = namedtuple('CatalogEntry', ['run', 'domain', 'start_time', 'location'])
+TimeStep = namedtuple('TimeStep', ['valid_time', 'location', 'time_idx'])
+
+
+def parse_wrfout_name(name):
+    """Return (domain, start_time) for a wrfout file name, or None."""
+    match = WRFOUT_PATTERN.search(os.path.basename(name))
+    if not match:
+        return None
+    start = datetime.strptime(
+        f"{match['date']} {match['hour']}:{match['minute']}:{match['second']}", "%Y-%m-%d %H:%M:%S"
+    )
+    return f"d{match['domain']}", start
+
+
+def scan_directory(root):
+    """Index every wrfout file under `root`; the parent directory names the run."""
+    entries = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(SIDECAR_SUFFIX):
+                continue
+            parsed = parse_wrfout_name(name)
+            if parsed:
+                run = os.path.relpath(dirpath, root)
+                entries.append(CatalogEntry(run if run != '.' else 'default', *parsed, os.path.join(dirpath, name)))
+    return entries
+
+
+def scan_bucket(list_url, base_url=None):
+    """
+    Index wrfout objects from an S3-compatible ListObjectsV2 endpoint.
+    The key prefix names the run; objects are addressed relative to `base_url`.
+    """
+    base_url = base_url or list_url
+    entries = []
+    token = None
+    while True:
+        params = {'list-type': 2}
+        if token:
+            params['continuation-token'] = token
+        response = requests.get(list_url, params=params, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        root = ET.fromstring(response.content)
+        ns = {'s3': root.tag.split('}')[0].strip('{')} if root.tag.startswith('{') else {}
+        prefix = 's3:' if ns else ''
+
+        for content in root.iterfind(f'{prefix}Contents', ns):
+            key = content.findtext(f'{prefix}Key', namespaces=ns)
+            parsed = parse_wrfout_name(key)
+            if parsed:
+                run = os.path.dirname(key) or 'default'
+                entries.append(CatalogEntry(run, *parsed, urljoin(base_url.rstrip('/') + '/', key)))
+
+        if root.findtext(f'{prefix}IsTruncated', namespaces=ns) != 'true':
+            break
+        token = root.findtext(f'{prefix}NextContinuationToken', namespaces=ns)
+    return entries
+
+
+def open_wrf_file(location):
+    """
+    Open a local path or URL according to DATA_ACCESS_MODE. Local and
+    downloaded files are read through the shared dataset service.
+    """
+    if not location.startswith(('http://', 'https://')):
+        return get_dataset_service().open(location)
+    if DATA_ACCESS_MODE == 'range':
+        from remote_reader import RemoteDataset
+        return RemoteDataset(location)
+    from data_loader import fetch_to_cache
+    return get_dataset_service().open(fetch_to_cache(location))
+
+
+class _Slot:
+    def __init__(self):
+        self.future = Future()  # resolves to the handle once the first caller has opened it
+        self.refs = 0
+
+
+class DatasetPool:
+    """
+    LRU pool of open datasets, checked out with `checkout(location)`.
+
+    Files are opened outside the pool lock, so a cold file (a full download
+    in download mode) only blocks the callers that asked for it; concurrent
+    callers for the same file wait on one in-flight open. Once more than
+    `max_open` handles are open the least recently used idle one is closed;
+    handles still checked out are never closed under a reader, the pool just
+    runs over its limit until they are released.
+    """
+
+    def __init__(self, max_open=MAX_OPEN_DATASETS, opener=open_wrf_file):
+        self.max_open = max_open
+        self.opener = opener
+        self._slots = OrderedDict()
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.evictions = 0
+
+    def acquire(self, location):
+        """Open (or reuse) the handle for `location`; pair every call with release()."""
+        with self._lock:
+            slot = self._slots.get(location)
+            opening = slot is None
+            if opening:
+                slot = self._slots[location] = _Slot()
+            slot.refs += 1
+            self._slots.move_to_end(location)
+
+        if opening:
+            try:
+                handle = self.opener(location)
+            except BaseException as e:
+                with self._lock:
+                    self._slots.pop(location, None)
+                slot.future.set_exception(e)
+                raise
+            slot.future.set_result(handle)
+            with self._lock:
+                self.opens += 1
+                idle = self._evict()
+            _close(idle)
+        try:
+            return slot.future.result()
+        except BaseException:
+            with self._lock:
+                slot.refs -= 1
+            raise
+
+    def release(self, location):
+        with self._lock:
+            if location in self._slots:
+                self._slots[location].refs -= 1
+            idle = self._evict()
+        _close(idle)
+
+    @contextmanager
+    def checkout(self, location):
+        """Context manager yielding the open handle; it stays open until the block exits."""
+        handle = self.acquire(location)
+        try:
+            yield handle
+        finally:
+            self.release(location)
+
+    def location_of(self, handle):
+        """Location `handle` was checked out for, or None if it is not in the pool."""
+        with self._lock:
+            for location, slot in self._slots.items():
+                if slot.future.done() and slot.future.exception() is None and slot.future.result() is handle:
+                    return location
+        return None
+
+    def _evict(self):
+        # Called with the lock held; returns the handles to close once it is released
+        idle = [location for location, slot in self._slots.items() if slot.refs == 0 and slot.future.done()]
+        closing = []
+        while len(self._slots) > self.max_open and idle:
+            closing.append(self._slots.pop(idle.pop(0)).future.result())
+            self.evictions += 1
+        return closing
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open': len(self._slots),
+                'checked_out': sum(slot.refs for slot in self._slots.values()),
+                'max_open': self.max_open,
+                'opens': self.opens,
+                'evictions': self.evictions
+            }
+
+    def close_all(self):
+        with self._lock:
+            handles = [slot.future.result() for slot in self._slots.values() if slot.future.done()]
+            self._slots.clear()
+        _close(handles)
+
+
+def _close(handles):
+    for handle in handles:
+        handle.close()
+
+
+def _read_valid_times(nc):
+    raw = nc.variables['Times'][:]
+    return [
+        datetime.strptime(b''.join(np.atleast_1d(row)).decode().strip('\x00 '), "%Y-%m-%d_%H:%M:%S")
+        for row in np.atleast_2d(raw)
+    ]
+
+
+class Catalog:
+    """
+    wrfout files grouped by run and domain with a unified, sorted time axis.
+    """
+
+    def __init__(self, entries, pool=None):
+        self.entries = sorted(entries, key=lambda e: (e.run, e.domain, e.start_time))
+        self.pool = pool or DatasetPool()
+        self._times = {}
+        self._metadata = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_source(cls, source, pool=None):
+        """Build from a directory, a bucket listing URL, or a single wrfout path/URL."""
+        if source.startswith(('http://', 'https://')):
+            name = urlparse(source).path.rsplit('/', 1)[-1]
+            if parse_wrfout_name(source) and not source.endswith('/') or '.' in name:
+                return cls._single_file(source, pool)
+            try:
+                entries = scan_bucket(source)
+            except ET.ParseError:
+                raise ValueError(f"{source} is neither a bucket listing nor a file named "
+                                 f"like wrfout_d01_YYYY-MM-DD_HH:MM:SS")
+        elif os.path.isdir(source):
+            entries = scan_directory(source)
+        else:
+            return cls._single_file(source, pool)
+        return cls(entries, pool)
+
+    @classmethod
+    def _single_file(cls, source, pool):
+        parsed = parse_wrfout_name(source)
+        if parsed:
+            return cls([CatalogEntry('default', *parsed, source)], pool)
+        # Not named like a wrfout file: take the domain and start from the file itself
+        catalog = cls([CatalogEntry('default', 'd01', None, source)], pool)
+        meta = catalog.metadata(source)
+        times = valid_times(meta)
+        if not times:
+            raise ValueError(f"{source} is not named like wrfout_d01_YYYY-MM-DD_HH:MM:SS and has no Times")
+        domain = f"d{int(meta['attributes'].get('GRID_ID', 1)):02d}"
+        catalog.entries = [CatalogEntry('default', domain, times[0], source)]
+        return catalog
+
+    def runs(self):
+        # Newest run first
+        return sorted({e.run for e in self.entries}, reverse=True)
+
+    def domains(self, run):
+        return sorted({e.domain for e in self.entries if e.run == run})
+
+    def files(self, run, domain):
+        return [e for e in self.entries if e.run == run and e.domain == domain]
+
+    def run_of(self, location):
+        """(run, domain) of the file at `location`, or None."""
+        for e in self.entries:
+            if e.location == location:
+                return e.run, e.domain
+        return None
+
+    def open(self, location):
+        """Context manager yielding the pooled dataset for `location`."""
+        return self.pool.checkout(location)
+
+    def time_axis(self, run, domain):
+        """
+        Every valid time available for (run, domain) as TimeSteps, sorted and
+        de-duplicated across files. File time lists are read once and cached.
+        """
+        axis = OrderedDict()
+        for entry in self.files(run, domain):
+            for time_idx, valid_time in enumerate(self._file_times(entry.location)):
+                axis.setdefault(valid_time, TimeStep(valid_time, entry.location, time_idx))
+        return [axis[t] for t in sorted(axis)]
+
+    @contextmanager
+    def locate(self, step):
+        """Context manager yielding (dataset, time index within that dataset) for a TimeStep."""
+        with self.open(step.location) as nc:
+            yield nc, step.time_idx
+
+    def metadata(self, location):
+        """
+        Metadata index of one file (see metadata_index), read from its JSON
+        sidecar; the file is only opened (URLs in download mode: only its
+        header read by range) the first time it is indexed.
+        """
+        with self._lock:
+            if location in self._metadata:
+                return self._metadata[location]
+        # Built outside the lock: a cold file must not stall every other session
+        meta = self._build_metadata(location)
+        with self._lock:
+            return self._metadata.setdefault(location, meta)
+
+    def _build_metadata(self, location):
+        if location.startswith(('http://', 'https://')) and DATA_ACCESS_MODE != 'range':
+            # Index the header and a few slices by range rather than downloading a
+            # file the user may never look at; fall back to the download without range support
+            from remote_reader import RemoteDataset
+            try:
+                return file_metadata(location, lambda url: closing(RemoteDataset(url)))
+            except (IOError, ValueError, requests.RequestException):
+                pass
+        return file_metadata(location, self.open)
+
+    def available_variables(self, location):
+        """(available variables, pressure levels) for the page selectors, from the metadata index."""
+        meta = self.metadata(location)
+        return [tuple(v) for v in meta['available']], list(meta['pressure_levels'])
+
+    def _file_times(self, location):
+        if location not in self._times:
+            times = valid_times(self.metadata(location))
+            with self._lock:
+                self._times[location] = times
+        return self._times[location]
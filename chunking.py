@@ -0,0 +1,86 @@
+"""
+Dask-chunked lazy views of wrfout datasets.
+
+xarray views are split into time/level/space chunks so derived expressions
+stay task graphs until a slice is actually requested. The local scheduler's
+worker count is bounded so that the chunks in flight fit a memory budget.
+"""
+import os
+
+import numpy as np
+
+from config import (
+    DASK_MEMORY_LIMIT,
+    DASK_SCHEDULER,
+    XARRAY_LEVEL_CHUNK,
+    XARRAY_SPACE_CHUNK,
+    XARRAY_TIME_CHUNK
+)
+
+CHUNK_MEMORY_FACTOR = 4  # input chunk plus intermediates held by one task
+_CONFIGURED = False
+
+
+def dask_available():
+    try:
+        import dask  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def dataset_chunks(dims):
+    """Chunk sizes for the WRF dimensions present in `dims` (name -> size)."""
+    chunks = {}
+    for name in dims:
+        if name == 'Time':
+            chunks[name] = XARRAY_TIME_CHUNK
+        elif name.startswith('bottom_top'):
+            chunks[name] = XARRAY_LEVEL_CHUNK
+        elif name.startswith(('south_north', 'west_east')):
+            chunks[name] = XARRAY_SPACE_CHUNK
+    return chunks
+
+
+def chunk_nbytes(sizes, chunks, itemsize=8):
+    """Bytes of the largest chunk of a variable spanning every chunked dimension."""
+    nbytes = itemsize
+    for name, chunk in chunks.items():
+        size = sizes.get(name, 1)
+        nbytes *= size if chunk == -1 else min(chunk, size)
+    return nbytes
+
+
+def worker_budget(nbytes, memory_limit=DASK_MEMORY_LIMIT):
+    """Workers whose in-flight chunks fit in `memory_limit`, at least one."""
+    per_task = max(nbytes * CHUNK_MEMORY_FACTOR, 1)
+    return int(np.clip(memory_limit // per_task, 1, os.cpu_count() or 1))
+
+
+def configure_scheduler(nbytes, scheduler=DASK_SCHEDULER, memory_limit=DASK_MEMORY_LIMIT):
+    """Use the local `scheduler` with as many workers as the memory budget allows."""
+    import dask
+
+    workers = worker_budget(nbytes, memory_limit)
+    dask.config.set({
+        'scheduler': scheduler,
+        'num_workers': workers,
+        'array.chunk-size': f"{max(memory_limit // (workers * CHUNK_MEMORY_FACTOR), 1)}B"
+    })
+    return workers
+
+
+def chunk_dataset(ds, picklable=True):
+    """
+    Re-chunk a lazily opened xarray Dataset. Returned unchanged when dask is
+    not installed, or when tasks would have to be pickled to worker
+    processes but the dataset wraps an unpicklable handle (`picklable`).
+    """
+    global _CONFIGURED
+    if not dask_available() or (DASK_SCHEDULER == 'processes' and not picklable):
+        return ds
+    chunks = dataset_chunks(ds.sizes)
+    if not _CONFIGURED:
+        configure_scheduler(chunk_nbytes(dict(ds.sizes), chunks))
+        _CONFIGURED = True
+    return ds.chunk(chunks)
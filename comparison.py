@@ -0,0 +1,81 @@
+"""
+Side-by-side comparison of one variable at two forecast times.
+
+Both panels are extracted and rendered concurrently on a small thread pool.
+Threads share the process-wide field cache, the cached coordinates and the
+rasterized basemap, so neither panel repeats work the other has done. File
+reads are serialized by the dataset service; the rendering overlaps. The
+difference panel is computed from the two fields the panels already
+extracted.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from config import COMPARISON_WORKERS, IMAGE_FORMAT
+from data_loader import get_latlon
+from image_cache import get_image_cache
+from plot_utils import (
+    DPI,
+    FIGSIZE,
+    MAP_EXTENT,
+    RENDER_STYLE_VERSION,
+    create_difference_plot,
+    get_basemap_layers,
+    plot_field,
+    render_plot_image,
+    save_figure
+)
+from product_store import product_key
+from tracing import span, traced_submit
+
+_EXECUTOR = None
+_INIT_LOCK = threading.Lock()
+
+
+def _executor():
+    global _EXECUTOR
+    with _INIT_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=COMPARISON_WORKERS, thread_name_prefix='comparison')
+        return _EXECUTOR
+
+
+def _panel(ctx, nc, var_type, time_idx, cmap, pressure_level):
+    # Attach the page's script context so st.error/st.warning from create_plot reach the page
+    add_script_run_ctx(threading.current_thread(), ctx)
+    image = render_plot_image(nc, var_type, time_idx, cmap, pressure_level)
+    try:
+        field = plot_field(nc, var_type, time_idx, pressure_level)  # field cache hit after a render
+    except Exception:
+        field = None  # create_plot has already reported the error
+    return field, image
+
+
+def render_comparison(nc1, time_idx1, nc2, time_idx2, var_type, cmap, pressure_level=None, title=None):
+    """
+    (image 1, image 2, difference image) for two forecast times. The
+    difference is field 2 minus field 1; it is None when either field is
+    missing or the two grids differ.
+    """
+    get_basemap_layers()  # rasterized once here, reused by both workers
+    ctx = get_script_run_ctx()
+    with span('comparison panels'):
+        futures = [traced_submit(_executor(), _panel, ctx, nc, var_type, time_idx, cmap, pressure_level)
+                   for nc, time_idx in ((nc1, time_idx1), (nc2, time_idx2))]
+        (field1, image1), (field2, image2) = [future.result() for future in futures]
+
+    if field1 is None or field2 is None or field1.shape != field2.shape:
+        return image1, image2, None
+
+    key = (product_key(nc1), int(time_idx1), product_key(nc2), int(time_idx2), var_type, pressure_level,
+           'difference', MAP_EXTENT, FIGSIZE, DPI, IMAGE_FORMAT, RENDER_STYLE_VERSION)
+
+    def render():
+        lats, lons = get_latlon(nc2, time_idx2)
+        fig = create_difference_plot(lats, lons, field2 - field1, var_type, pressure_level, title)
+        return save_figure(fig, IMAGE_FORMAT).getvalue()
+
+    with span('difference panel'):
+        return image1, image2, get_image_cache().get_or_render(key, render)
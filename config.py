@@ -1,11 +1,105 @@
+import os
 
 R2_PUBLIC_URL = "https://pub-a4b102ebcc97446cae3ea4ff76e17abf.r2.dev/wrfout_d01_2024-05-20_06_00_00"
 
+# Where to discover wrfout files: a directory, an S3-compatible bucket listing
+# URL, or a single file path/URL (defaults to the R2 file above)
+WRF_DATA_SOURCE = os.environ.get("WRF_DATA_SOURCE", R2_PUBLIC_URL)
+MAX_OPEN_DATASETS = 16  # open file handles kept by the catalog pool
+# Reader processes for local files; one core gains nothing from them. 0: read on the I/O thread
+DATASET_READER_PROCESSES = int(os.environ.get("WRF_READER_PROCESSES", str(min(4, (os.cpu_count() or 1) - 1))))
+DATASET_READER_MAX_OPEN = 8  # open handles kept by each reader process
+
+# Local cache for downloaded wrfout files (override with WRF_CACHE_DIR)
+CACHE_DIR = os.environ.get(
+    "WRF_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "wrf_visualization_app")
+)
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # bytes per streamed chunk
+DOWNLOAD_TIMEOUT = 60  # seconds
+
+# "download" caches the whole file locally; "range" reads only the bytes a plot needs
+DATA_ACCESS_MODE = os.environ.get("WRF_ACCESS_MODE", "download")
+HTTP_POOL_SIZE = 8
+RANGE_BLOCK_SIZE = 1024 * 1024  # bytes per cached block when walking HDF5 metadata
+RANGE_COALESCE_GAP = 256 * 1024  # merge range requests separated by less than this
+
+# Precomputed products written by precompute.py (override with WRF_PRODUCT_STORE)
+PRODUCT_STORE_DIR = os.environ.get("WRF_PRODUCT_STORE", os.path.join(CACHE_DIR, "products"))
+
+# Persisted polygon/grid overlay weights for area-weighted zonal means
+OVERLAY_CACHE_DIR = os.path.join(CACHE_DIR, "overlays")
+OVERLAY_CACHE_MAX_BYTES = int(os.environ.get("WRF_OVERLAY_CACHE_MB", "256")) * 1024 * 1024
+ZONAL_MEMORY_ENTRIES = 8  # label grids / overlays kept in memory per kind
+
+# Byte budget for derived fields shared across pages and sessions
+FIELD_CACHE_MAX_BYTES = int(os.environ.get("WRF_FIELD_CACHE_MB", "1024")) * 1024 * 1024
+
+# Rendered plot images shared across sessions
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("WRF_IMAGE_CACHE_MB", "512")) * 1024 * 1024
+IMAGE_FORMAT = "png"  # or "webp" (needs Pillow)
+
+# Dask chunking of the xarray views (-1 keeps a dimension whole)
+XARRAY_TIME_CHUNK = int(os.environ.get("WRF_CHUNK_TIME", "1"))
+XARRAY_LEVEL_CHUNK = int(os.environ.get("WRF_CHUNK_LEVEL", "-1"))
+XARRAY_SPACE_CHUNK = int(os.environ.get("WRF_CHUNK_SPACE", "256"))
+# "threads", "processes" (local files only) or "synchronous"
+DASK_SCHEDULER = os.environ.get("WRF_DASK_SCHEDULER", "threads")
+DASK_MEMORY_LIMIT = int(os.environ.get("WRF_DASK_MEMORY_MB", "2048")) * 1024 * 1024
+
+# Span tracing of getters and plot stages (or add ?debug=1 to a page URL)
+TRACE_ENABLED = os.environ.get("WRF_TRACE") == "1"
+TRACE_ALLOCATIONS = os.environ.get("WRF_TRACE_ALLOC") == "1"  # tracemalloc; slows everything down
+
+TIMESERIES_TIME_CHUNK = 8  # time steps read per block by the Stats time series
+TIMESERIES_LEVEL_CHUNK = 2  # ... for pressure-level series, which read whole 3-D fields
+ANIMATION_DPI = 100  # frame resolution for animation export
+COMPARISON_WORKERS = int(os.environ.get("WRF_COMPARISON_WORKERS", "2"))  # threads rendering the comparison panels
+
+# Level-of-detail preview shown while the full-quality plot renders in the background
+PREVIEW_ENABLED = os.environ.get("WRF_PREVIEW", "1") == "1"
+PREVIEW_DPI = 60
+PREVIEW_MAX_CELLS = 160  # grid cells per side of the coarsened preview raster
+PREVIEW_BASEMAP_SCALE = "50m"  # Natural Earth resolution of the preview basemap
+PREVIEW_SIMPLIFY = 0.02  # county outline simplification tolerance, degrees
+PREVIEW_RENDER_WORKERS = int(os.environ.get("WRF_RENDER_WORKERS", "2"))  # threads rendering the full-quality plots
+PREVIEW_POLL_INTERVAL = 0.5  # seconds between checks for a finished full render
+
+# Interactive map mode: quantized rasters coloured in the browser
+INTERACTIVE_RASTER_WIDTH = 400  # pixels across MAP_EXTENT; the height follows its aspect
+INTERACTIVE_BITS = int(os.environ.get("WRF_INTERACTIVE_BITS", "8"))  # 8 or 16
+INTERACTIVE_CACHE_MAX_BYTES = int(os.environ.get("WRF_INTERACTIVE_CACHE_MB", "64")) * 1024 * 1024
+
+# Speculative prefetch of neighbouring time steps and levels into the field cache
+PREFETCH_ENABLED = os.environ.get("WRF_PREFETCH", "1") == "1"
+PREFETCH_AHEAD = 2  # forecast steps warmed after the selected one
+PREFETCH_BEHIND = 1  # and before it
+PREFETCH_MAX_BYTES = int(os.environ.get("WRF_PREFETCH_MB", "128")) * 1024 * 1024  # per selection
+
 COUNTY_SHAPEFILE_PATH = r"shapefiles\gadm41_KEN_1.shp"
+SUBCOUNTY_SHAPEFILE_PATH = r"shapefiles\gadm41_KEN_2.shp"
 STANDARD_PRESSURE_LEVELS = [1000, 850, 700, 500, 300, 250]
 
+# Named sounding/meteogram locations (lat, lon)
+STATIONS = {
+    'Nairobi': (-1.2921, 36.8219),
+    'Mombasa': (-4.0435, 39.6682),
+    'Kisumu': (-0.0917, 34.7680),
+    'Nakuru': (-0.3031, 36.0800),
+    'Eldoret': (0.5143, 35.2698),
+    'Garissa': (-0.4532, 39.6461),
+    'Lodwar': (3.1191, 35.5973),
+    'Marsabit': (2.3284, 37.9899),
+    'Wajir': (1.7471, 40.0573),
+    'Malindi': (-3.2192, 40.1169),
+    'Nyeri': (-0.4201, 36.9476),
+    'Kitale': (1.0157, 35.0062),
+    'Voi': (-3.3961, 38.5561),
+    'Mandera': (3.9366, 41.8670),
+}
+
 CMAP_OPTIONS = {
     'Temperature': ['coolwarm', 'viridis', 'cividis'],
     'Rainfall': ['Blues', 'GnBu', 'coolwarm'],
     'Humidity': ['viridis', 'YlGnBu']
-}
\ No newline at end of file
+}
@@ -1,50 +1,163 @@
-from netCDF4 import Dataset
 import xarray as xr
 import requests
-from wrf import destagger, getvar, interplevel
 import streamlit as st
-import geopandas as gpd
 import numpy as np
-import io
-from config import STANDARD_PRESSURE_LEVELS, R2_PUBLIC_URL
+import hashlib
+import json
+import os
+import tempfile
+from config import (
+    STANDARD_PRESSURE_LEVELS,
+    R2_PUBLIC_URL,
+    CACHE_DIR,
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_TIMEOUT,
+    DATA_ACCESS_MODE,
+    DASK_SCHEDULER,
+    WRF_DATA_SOURCE
+)
+from remote_reader import RemoteDataset
+from dataset_service import ServicedDataset, get_dataset_service
+from catalog import Catalog
+from metadata_index import available_variables
+from field_cache import FIELD_CACHE, cached_field, dataset_identity
+from vertical_interp import LevelInterpolator
+from product_store import stored_product
+from rainfall import use_catalog
+from chunking import chunk_dataset, dask_available
+from tracing import register_stats, span, traced
+from lazy_imports import lazy_module
+
+# Only loaded when a getter or the shapefile loader actually runs
+wrf = lazy_module('wrf')
+gpd = lazy_module('geopandas')
 
 @st.cache_resource
 def load_wrf_data_from_r2(_=None):
-    netcdf_dataset = load_netcdf_datasets(R2_PUBLIC_URL)
-    xarray_dataset = load_xarray_datasets(R2_PUBLIC_URL)
+    if DATA_ACCESS_MODE == 'range':
+        # Header/index only; variable slices are fetched on demand
+        netcdf_dataset = RemoteDataset(R2_PUBLIC_URL)
+        return netcdf_dataset, netcdf_dataset.to_xarray()
+
+    local_path = fetch_to_cache(R2_PUBLIC_URL)
+    netcdf_dataset = load_netcdf_datasets(local_path)
+    xarray_dataset = load_xarray_datasets(local_path)
     return netcdf_dataset, xarray_dataset
 
-def load_netcdf_datasets(url):
-    response = requests.get(url)
-    response.raise_for_status()
-    memory_file = io.BytesIO(response.content)
-    return Dataset('inmemory.nc', mode='r', memory=memory_file.read())
+@st.cache_resource
+def load_catalog(source=WRF_DATA_SOURCE):
+    catalog = Catalog.from_source(source)
+    register_stats('dataset pool', catalog.pool.stats)
+    use_catalog(catalog)  # rainfall windows span every file of a run
+    return catalog
+
+def as_xarray(nc):
+    """Chunked xarray view over an already open dataset, sharing its file handle."""
+    if isinstance(nc, RemoteDataset):
+        return chunk_dataset(nc.to_xarray(), picklable=False)
+    if DASK_SCHEDULER == 'processes' and dask_available():
+        # Worker processes cannot share the handle, so their tasks reopen the file by path
+        return load_xarray_datasets(nc.filepath())
+    # The store reads under xarray's netCDF lock, the same one the dataset service holds
+    handle = nc.dataset if isinstance(nc, ServicedDataset) else nc
+    return chunk_dataset(xr.open_dataset(xr.backends.NetCDF4DataStore(handle)), picklable=False)
+
+def load_netcdf_datasets(path):
+    return get_dataset_service().open(path)
+
+def load_xarray_datasets(path):
+    # Lazily backed by the same local file; chunks are read only when computed
+    return chunk_dataset(xr.open_dataset(path))
+
+@traced('download')
+def fetch_to_cache(url, cache_dir=CACHE_DIR):
+    """
+    Stream `url` into a content-addressed file under `cache_dir` and return its path.
+    The stored ETag/Last-Modified are sent on the next call, so an unchanged
+    object is never downloaded twice. The version a new download supersedes
+    is deleted unless another URL still points at it.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, hashlib.sha256(url.encode()).hexdigest() + '.json')
+    meta = _read_json(meta_path)
+    cached_path = meta.get('path') if meta else None
+    if cached_path and not os.path.exists(cached_path):
+        cached_path = None
+
+    headers = {}
+    if cached_path:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
 
-def load_xarray_datasets(url):
-    response = requests.get(url)
-    response.raise_for_status()
-    memory_file = io.BytesIO(response.content)
-    return xr.open_dataset(memory_file)
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            if cached_path and response.status_code == 304:
+                return cached_path
+            response.raise_for_status()
+            path = _stream_to_file(response, cache_dir)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+    except requests.RequestException:
+        if cached_path:  # offline: serve the last good copy
+            return cached_path
+        raise
+
+    _write_json(meta_path, {
+        'url': url,
+        'path': path,
+        'etag': etag,
+        'last_modified': last_modified
+    })
+    if cached_path and cached_path != path:
+        _remove_unreferenced(cached_path, cache_dir)
+    return path
+
+def _remove_unreferenced(path, cache_dir):
+    """Delete a superseded download once no URL sidecar refers to it."""
+    for name in os.listdir(cache_dir):
+        if name.endswith('.json'):
+            meta = _read_json(os.path.join(cache_dir, name))
+            if isinstance(meta, dict) and meta.get('path') == path:
+                return
+    try:
+        os.remove(path)  # open handles keep reading the unlinked file on POSIX
+    except OSError:
+        pass
+
+def _stream_to_file(response, cache_dir):
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+        path = os.path.join(cache_dir, digest.hexdigest() + '.nc')
+        os.replace(tmp_path, path)  # atomic: readers never see a partial file
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
 
 
 def get_available_variables(nc):
-    available = []
-    if all(var in nc.variables for var in ['U10', 'V10']):
-        available.append(('Wind Speed (10m)', 'surface'))
-    if 'T2' in nc.variables:
-        available.append(('Temperature (2m)', 'surface'))
-    if 'RAINNC' in nc.variables or 'RAINC' in nc.variable:
-        available.append(('Rainfall', 'surface'))   
-    if 'Q2' in nc.variables or 'RH2' in nc.variables:
-        available.append(('Humidity (2m)', 'surface'))    
-    if all(var in nc.variables for var in ['U', 'V']):
-        available.append(('Wind Speed', 'pressure'))
-    if 'T' in nc.variables:
-        available.append(('Temperature', 'pressure'))
-    if 'rh' in nc.variables:
-        available.append(('Relative Humidity', 'pressure'))
-
-    return available, STANDARD_PRESSURE_LEVELS.copy()
+    return available_variables(nc.variables), STANDARD_PRESSURE_LEVELS.copy()
 
 def load_kenya_shapefiles(county_path, subcounty_path):
     """
@@ -61,64 +174,125 @@ def load_kenya_shapefiles(county_path, subcounty_path):
 
     return gdf, sub_gdf
 
+@traced()
+@cached_field('rainfall')
+@stored_product('rainfall')
 def get_rainfall(nc, time_idx):
-    rain = getvar(nc, 'RAINNC', timeidx=time_idx)
-    rain += getvar(nc, 'RAINC', timeidx=time_idx)
+    rain = wrf.getvar(nc, 'RAINNC', timeidx=time_idx)
+    rain += wrf.getvar(nc, 'RAINC', timeidx=time_idx)
     return rain  # Total rainfall
 
+@traced()
+@cached_field('temperature')
+@stored_product('temperature')
 def get_temperature(nc, time_idx, level=None):
     if level:  # pressure-level temperature
-        theta = getvar(nc, "T", timeidx=time_idx)  # Potential temperature
-        p = getvar(nc, "pressure", timeidx=time_idx)
-        
-        # Validate inputs
-        if p is None or np.any(np.isnan(p)):
-            raise ValueError("Invalid pressure data")
-        if level < np.nanmin(p) or level > np.nanmax(p):
-            raise ValueError(f"Requested level {level}hPa outside available range")
-            
-        # Convert potential temperature to actual temperature
-        theta_interp = interplevel(theta, p, level)
+        theta_interp, = _fields_at_level(nc, time_idx, 'theta', level)  # Potential temperature
         temp_k = theta_interp / ((1000.0/level)**0.286)  # Convert to Kelvin
         return temp_k - 273.15  # Convert to Celsius
     else:
-        return getvar(nc, "T2", timeidx=time_idx) - 273.15
+        return wrf.getvar(nc, "T2", timeidx=time_idx) - 273.15
     
+@traced()
+@cached_field('humidity')
+@stored_product('humidity')
 def get_humidity(nc, time_idx, level=None):
     if level:  # pressure-level RH
-        rh = getvar(nc, "rh", timeidx=time_idx)
-        p = getvar(nc, "pressure", timeidx=time_idx)
-        return interplevel(rh, p, level)
+        rh, = _fields_at_level(nc, time_idx, 'rh', level)
+        return rh
     else:
         if "RH2" in nc.variables:
-            return getvar(nc, "RH2", timeidx=time_idx)
+            return wrf.getvar(nc, "RH2", timeidx=time_idx)
         elif "Q2" in nc.variables:
-            return getvar(nc, "Q2", timeidx=time_idx) * 1000  # Convert to g/kg
+            return wrf.getvar(nc, "Q2", timeidx=time_idx) * 1000  # Convert to g/kg
         else:
             return None
 
+@traced()
+@cached_field('pressure')
 def get_pressure(ncfile, timeidx):
-    return getvar(ncfile, "pressure", timeidx=timeidx)
+    return wrf.getvar(ncfile, "pressure", timeidx=timeidx)
+
+@traced()
+@cached_field('latlon')
+def get_latlon(nc, time_idx):
+    """
+    Mass-grid (lats, lons) arrays, read once per file and time and shared by
+    every plot of it.
+    """
+    lats = wrf.to_np(wrf.getvar(nc, "XLAT", timeidx=time_idx))
+    lons = wrf.to_np(wrf.getvar(nc, "XLONG", timeidx=time_idx))
+    return lats, lons
 
+@traced()
+@cached_field('wind')
+@stored_product('wind')
 def get_wind_speed(nc, time_idx, level=None):
     """
     Returns wind speed magnitude at surface (10m) or pressure level.
     """
     if level:  # pressure-level wind speed
-        u = getvar(nc, "U", timeidx=time_idx)
-        v = getvar(nc, "V", timeidx=time_idx)
-        u = destagger(u, stagger_dim=-1)
-        v = destagger(v, stagger_dim=-2)
-        p = getvar(nc, "pressure", timeidx=time_idx)
-        u = interplevel(u, p, level)
-        v = interplevel(v, p, level)
+        u, v = _fields_at_level(nc, time_idx, 'wind', level)
     else:
-        u= getvar(nc, "U10", timeidx=time_idx)
-        v = getvar(nc, "V10", timeidx=time_idx)
+        u= wrf.getvar(nc, "U10", timeidx=time_idx)
+        v = wrf.getvar(nc, "V10", timeidx=time_idx)
 
     wind_speed = (u**2 + v**2)**0.5
-    return wind_speed, u, v  
-    
-    
-    
-   
\ No newline at end of file
+    return wind_speed, u, v
+
+# === Pressure-level interpolation ===
+
+@traced()
+def get_level_interpolator(nc, time_idx):
+    """
+    Bracketing model levels and weights for every STANDARD_PRESSURE_LEVELS
+    level, computed from the column pressure once per time step.
+    """
+    def build():
+        p = wrf.to_np(get_pressure(nc, time_idx))
+        # Validate inputs
+        if p is None or np.any(np.isnan(p)):
+            raise ValueError("Invalid pressure data")
+        return LevelInterpolator(p, STANDARD_PRESSURE_LEVELS)
+
+    key = (dataset_identity(nc), 'level_interpolator', int(time_idx), None)
+    return FIELD_CACHE.get_or_compute(key, build)
+
+def get_level_stack(nc, time_idx, name):
+    """
+    Model-level field(s) interpolated to all standard levels in one batched pass.
+    `name` is 'theta', 'rh' or 'wind' (u and v together).
+    """
+    def build():
+        interp = get_level_interpolator(nc, time_idx)
+        fields = _model_level_fields(nc, time_idx, name)
+        with span('interpolate levels', field=name):
+            return tuple(interp.apply(*fields))
+
+    key = (dataset_identity(nc), f'levels:{name}', int(time_idx), None)
+    return FIELD_CACHE.get_or_compute(key, build)
+
+@traced('getvar model levels')
+def _model_level_fields(nc, time_idx, name):
+    if name == 'theta':
+        return [wrf.to_np(wrf.getvar(nc, "T", timeidx=time_idx)) + 300.0]  # T is perturbation theta
+    if name == 'rh':
+        return [wrf.to_np(wrf.getvar(nc, "rh", timeidx=time_idx))]
+    if name == 'wind':
+        u = wrf.destagger(wrf.getvar(nc, "U", timeidx=time_idx), stagger_dim=-1)
+        v = wrf.destagger(wrf.getvar(nc, "V", timeidx=time_idx), stagger_dim=-2)
+        return [wrf.to_np(u), wrf.to_np(v)]
+    raise ValueError(f"Unknown level field: {name}")
+
+def _fields_at_level(nc, time_idx, name, level):
+    interp = get_level_interpolator(nc, time_idx)
+    if level < interp.p_min or level > interp.p_max:
+        raise ValueError(f"Requested level {level}hPa outside available range")
+    try:
+        idx = interp.level_index(level)
+        fields = [stack[idx] for stack in get_level_stack(nc, time_idx, name)]
+    except KeyError:
+        # Non-standard level: interpolate just this one
+        single = LevelInterpolator(wrf.to_np(get_pressure(nc, time_idx)), [level])
+        fields = [f[0] for f in single.apply(*_model_level_fields(nc, time_idx, name))]
+    return [xr.DataArray(f, dims=('south_north', 'west_east'), attrs={'level': level}) for f in fields]
@@ -0,0 +1,278 @@
+"""
+Shared dataset service for concurrent Streamlit sessions.
+
+netCDF-C and HDF5 are not thread-safe, so threads cannot read in parallel
+within one process. Local files are opened by an I/O worker thread fed from
+one request queue: pages get a netCDF4.Dataset look-alike (as for
+RemoteDataset) whose metadata is snapshotted when the file is opened. Variable
+reads go to a small pool of reader processes (DATASET_READER_PROCESSES), each
+with its own handles, which return the arrays; that is what lets concurrent
+sessions read at the same time. With no reader processes (or inside a worker
+process) reads are queued to the I/O thread instead, which only serializes
+them. The thread holds xarray's netCDF lock, so the chunked xarray views over
+the same handles stay serialized with it.
+
+Queue depth, reads in flight in the reader processes and the wait and
+service latency of recent requests are kept for the debug panel.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from config import DATASET_READER_MAX_OPEN, DATASET_READER_PROCESSES
+from tracing import register_stats
+
+METRICS_WINDOW = 1000  # requests kept for the latency percentiles
+
+
+class DatasetService:
+    """
+    Opens datasets on one I/O worker thread and reads their variables in
+    `reader_processes` processes, or on that thread when there are none.
+    """
+
+    def __init__(self, lock=None, window=METRICS_WINDOW, reader_processes=DATASET_READER_PROCESSES):
+        if lock is None:
+            from xarray.backends.netCDF4_ import NETCDF4_PYTHON_LOCK
+            lock = NETCDF4_PYTHON_LOCK
+        self.lock = lock
+        self.reader_processes = reader_processes
+        self._readers = None
+        self._in_flight = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._pid = os.getpid()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self._services = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def _ensure_worker(self):
+        if self._pid != os.getpid():
+            # Forked (e.g. a precompute or animation worker): the parent's thread did not come along
+            self._queue, self._start_lock, self._worker, self._pid = queue.Queue(), threading.Lock(), None, os.getpid()
+            self._readers = None
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='dataset-io', daemon=True)
+                self._worker.start()
+
+    def call(self, func, *args):
+        """Run func(*args) on the I/O worker and return its result."""
+        if threading.current_thread() is self._worker:
+            return func(*args)  # nested request from the worker itself
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((time.perf_counter(), future, func, args))
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            with self._stats_lock:
+                self.max_depth = max(self.max_depth, depth)
+        return future.result()
+
+    def read(self, path, var, key):
+        """var[key] for a variable of the file at `path`, in a reader process when there are any."""
+        readers = self._reader_pool()
+        if readers is None:
+            return self.call(var.__getitem__, key)
+        with self._stats_lock:
+            self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            return readers.submit(_read_in_process, path, var.name, key).result()
+        except BaseException:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+                self.requests += 1
+                self._services.append(time.perf_counter() - started)
+
+    def _reader_pool(self):
+        # Worker processes (animation, precompute) read in-thread rather than start their own pools
+        if self.reader_processes <= 0 or multiprocessing.parent_process() is not None:
+            return None
+        self._ensure_worker()  # resets the pool after a fork
+        with self._start_lock:
+            if self._readers is None:
+                self._readers = ProcessPoolExecutor(max_workers=self.reader_processes,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+            return self._readers
+
+    def _run(self):
+        while True:
+            enqueued, future, func, args = self._queue.get()
+            started = time.perf_counter()
+            try:
+                with self.lock:
+                    result = func(*args)
+            except BaseException as e:
+                future.set_exception(e)
+                failed = True
+            else:
+                future.set_result(result)
+                failed = False
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self.requests += 1
+                self.errors += failed
+                self._waits.append(started - enqueued)
+                self._services.append(finished - started)
+
+    def pending(self):
+        """Requests waiting for the worker thread or in flight in the reader processes."""
+        return self._queue.qsize() + self._in_flight
+
+    def open(self, path):
+        """ServicedDataset for a local netCDF file, opened on the worker."""
+        return self.call(_open_serviced, self, path)
+
+    def stats(self):
+        with self._stats_lock:
+            waits = np.array(self._waits) * 1000
+            services = np.array(self._services) * 1000
+            stats = {
+                'reader_processes': self.reader_processes,
+                'reads_in_flight': self._in_flight,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_depth,
+                'requests': self.requests,
+                'errors': self.errors
+            }
+        for name, values in (('wait_ms', waits), ('service_ms', services)):
+            for q in (50, 95):
+                stats[f'{name}_p{q}'] = round(float(np.percentile(values, q)), 3) if len(values) else 0.0
+        return stats
+
+
+_READER_HANDLES = OrderedDict()  # (path, mtime, size) -> Dataset, per reader process
+
+
+def _read_in_process(path, name, key):
+    # Runs in a reader process, which keeps its own LRU of open handles
+    from netCDF4 import Dataset
+
+    stat = os.stat(path)
+    identity = (path, stat.st_mtime_ns, stat.st_size)
+    nc = _READER_HANDLES.get(identity)
+    if nc is None:
+        nc = _READER_HANDLES[identity] = Dataset(path, mode='r')
+        while len(_READER_HANDLES) > DATASET_READER_MAX_OPEN:
+            _READER_HANDLES.popitem(last=False)[1].close()
+    else:
+        _READER_HANDLES.move_to_end(identity)
+    return nc.variables[name][key]
+
+
+def _open_serviced(service, path):
+    from netCDF4 import Dataset
+
+    return ServicedDataset(service, Dataset(path, mode='r'))
+
+
+class ServicedVariable:
+    """netCDF4.Variable look-alike whose reads run in the service's readers."""
+
+    __slots__ = ('name', 'dimensions', 'shape', 'dtype', '_attrs', '_var', '_service', '_path')
+
+    def __init__(self, service, var, path):
+        self._service = service
+        self._var = var
+        self._path = path
+        self.name = var.name
+        self.dimensions = tuple(var.dimensions)
+        self.shape = tuple(var.shape)
+        self.dtype = var.dtype
+        self._attrs = OrderedDict((name, var.getncattr(name)) for name in var.ncattrs())
+
+    @property
+    def __dict__(self):
+        return self._attrs
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    def ncattrs(self):
+        return list(self._attrs)
+
+    def getncattr(self, name):
+        return self._attrs[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._attrs[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        return self._service.read(self._path, self._var, key)
+
+
+class ServicedDataset:
+    """
+    Read-only netCDF4.Dataset look-alike over a local file. Dimensions and
+    attributes are read once at open; `dataset` is the underlying handle for
+    xarray, whose reads take the same lock.
+    """
+
+    def __init__(self, service, nc):
+        self._service = service
+        self.dataset = nc
+        self._path = nc.filepath()
+        self.dimensions = OrderedDict((name, len(dim)) for name, dim in nc.dimensions.items())
+        self._attrs = OrderedDict((name, nc.getncattr(name)) for name in nc.ncattrs())
+        self.variables = OrderedDict((name, ServicedVariable(service, var, self._path))
+                                     for name, var in nc.variables.items())
+
+    def filepath(self):
+        return self._path
+
+    def ncattrs(self):
+        return list(self._attrs)
+
+    def getncattr(self, name):
+        return self._attrs[name]
+
+    def __getattr__(self, name):
+        attrs = self.__dict__.get('_attrs', {})
+        if name in attrs:
+            return attrs[name]
+        raise AttributeError(name)
+
+    def close(self):
+        self._service.call(self.dataset.close)
+
+
+_SERVICE = None
+_INIT_LOCK = threading.Lock()
+
+
+def get_dataset_service():
+    """Process-wide DatasetService, created on first use."""
+    global _SERVICE
+    with _INIT_LOCK:
+        if _SERVICE is None:
+            _SERVICE = DatasetService()
+            register_stats('dataset service', _SERVICE.stats)
+        return _SERVICE
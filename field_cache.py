@@ -0,0 +1,148 @@
+"""
+Process-wide cache of derived fields returned by the data_loader getters.
+
+Entries are keyed by (file identity, variable, time index, pressure level)
+and evicted least-recently-used once their total size exceeds a byte budget.
+Because the cache lives at module level it is shared by every page and session.
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import FIELD_CACHE_MAX_BYTES
+from tracing import annotate
+
+
+def dataset_identity(nc):
+    """Stable identity for an open dataset: path + mtime + size, or remote version."""
+    reader = getattr(nc, 'reader', None)
+    if reader is not None:  # RemoteDataset
+        return reader.version_key
+    try:
+        path = nc.filepath()
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+    except (AttributeError, ValueError, OSError):
+        return ('object', id(nc))
+
+
+def _nbytes(value):
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return int(getattr(value, 'nbytes', 0))
+
+
+class FieldCache:
+    """
+    Thread-safe LRU mapping bounded by total bytes rather than entry count.
+    """
+
+    def __init__(self, max_bytes=FIELD_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return  # never cache something that would flush everything else
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            added = getattr(self._local, 'added', None)
+            if added is not None:
+                added[0] += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    @contextmanager
+    def measure(self):
+        """
+        Yield a one-item list holding the bytes this thread puts into the
+        cache inside the block, whatever other threads add or evict meanwhile.
+        """
+        added = self._local.added = [0]
+        try:
+            yield added
+        finally:
+            self._local.added = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+FIELD_CACHE = FieldCache()
+
+
+def cached_field(variable, cache=None):
+    """
+    Memoize a getter with signature (nc, time_idx[, level]).
+    Cached values are shared between callers and must not be modified in place.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(nc, time_idx, *args, **kwargs):
+            target = cache if cache is not None else FIELD_CACHE
+            level = kwargs.get('level', args[0] if args else None)
+            key = (dataset_identity(nc), variable, int(time_idx), level)
+            computed = []
+
+            def compute():
+                computed.append(True)
+                return func(nc, time_idx, *args, **kwargs)
+
+            value = target.get_or_compute(key, compute)
+            annotate(field_cache='miss' if computed else 'hit')
+            return value
+        return wrapper
+    return decorator
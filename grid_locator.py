@@ -0,0 +1,128 @@
+"""
+Map station coordinates or place names to WRF grid columns.
+
+A KD-tree over XLAT/XLONG projected onto the unit sphere gives the nearest
+cell; bilinear weights come from the local grid Jacobian around that cell, so
+curvilinear (Lambert/Mercator) grids are handled. Profile extraction then
+reads only the selected columns for the requested times.
+"""
+import numpy as np
+
+from config import STATIONS
+
+_LOCATORS = {}
+
+
+def _unit_vectors(lats, lons):
+    lat, lon = np.radians(lats), np.radians(lons)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def resolve_station(name_or_coords):
+    """(lat, lon) for a station name from config.STATIONS or a (lat, lon) pair."""
+    if isinstance(name_or_coords, str):
+        for name, coords in STATIONS.items():
+            if name.lower() == name_or_coords.strip().lower():
+                return coords
+        raise KeyError(f"Unknown station: {name_or_coords}")
+    return tuple(name_or_coords)
+
+
+class GridLocator:
+    def __init__(self, lats, lons):
+        from scipy.spatial import cKDTree
+
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.shape = self.lats.shape
+        self.tree = cKDTree(_unit_vectors(self.lats, self.lons).reshape(-1, 3))
+
+    def nearest(self, lats, lons):
+        """(j, i) index arrays of the cells nearest to each point."""
+        points = _unit_vectors(np.atleast_1d(lats), np.atleast_1d(lons))
+        _, flat = self.tree.query(points)
+        return np.unravel_index(flat, self.shape)
+
+    def bilinear(self, lats, lons):
+        """
+        Corner indices (j, i), each (n, 4), and weights (n, 4) of the cell
+        surrounding each point. Points off the grid are clamped to its edge.
+        """
+        lats, lons = np.atleast_1d(lats).astype(np.float64), np.atleast_1d(lons).astype(np.float64)
+        ny, nx = self.shape
+        j, i = self.nearest(lats, lons)
+        jc, ic = np.clip(j, 1, ny - 2), np.clip(i, 1, nx - 2)
+
+        # Local Jacobian d(lat, lon)/d(j, i) by central differences
+        dlat_dj = (self.lats[jc + 1, ic] - self.lats[jc - 1, ic]) / 2
+        dlon_dj = (self.lons[jc + 1, ic] - self.lons[jc - 1, ic]) / 2
+        dlat_di = (self.lats[jc, ic + 1] - self.lats[jc, ic - 1]) / 2
+        dlon_di = (self.lons[jc, ic + 1] - self.lons[jc, ic - 1]) / 2
+        det = dlat_dj * dlon_di - dlat_di * dlon_dj
+        dlat, dlon = lats - self.lats[j, i], lons - self.lons[j, i]
+        fj = j + (dlat * dlon_di - dlon * dlat_di) / det
+        fi = i + (dlon * dlat_dj - dlat * dlon_dj) / det
+
+        fj, fi = np.clip(fj, 0, ny - 1), np.clip(fi, 0, nx - 1)
+        j0 = np.minimum(np.floor(fj).astype(int), ny - 2)
+        i0 = np.minimum(np.floor(fi).astype(int), nx - 2)
+        wj, wi = fj - j0, fi - i0
+        corners_j = np.stack([j0, j0, j0 + 1, j0 + 1], axis=1)
+        corners_i = np.stack([i0, i0 + 1, i0, i0 + 1], axis=1)
+        weights = np.stack([(1 - wj) * (1 - wi), (1 - wj) * wi, wj * (1 - wi), wj * wi], axis=1)
+        return corners_j, corners_i, weights
+
+
+def get_grid_locator(lats, lons):
+    """GridLocator for a grid, built once per distinct XLAT/XLONG."""
+    from zonal import grid_hash
+
+    key = grid_hash(lats, lons)
+    if key not in _LOCATORS:
+        _LOCATORS[key] = GridLocator(lats, lons)
+    return _LOCATORS[key]
+
+
+def read_columns(var, times, js, is_):
+    """
+    Values of a (Time, bottom_top, south_north, west_east) DataArray at the
+    given columns: returns (n_times, n_columns, bottom_top). Only the bounding
+    box of the columns is read from disk.
+    """
+    js, is_ = np.asarray(js).ravel(), np.asarray(is_).ravel()
+    j_lo, i_lo = js.min(), is_.min()
+    box = var.isel(Time=list(times),
+                   south_north=slice(j_lo, js.max() + 1),
+                   west_east=slice(i_lo, is_.max() + 1)).values
+    return np.moveaxis(box[:, :, js - j_lo, is_ - i_lo], 1, 2)
+
+
+def extract_profiles(ds, stations, times, method='nearest'):
+    """
+    Pressure (hPa), temperature (°C) and dewpoint (°C) profiles for every
+    station at every time index, each shaped (n_times, n_stations, bottom_top).
+    `stations` are names from config.STATIONS or (lat, lon) pairs.
+    """
+    coords = np.array([resolve_station(s) for s in stations], dtype=np.float64)
+    locator = get_grid_locator(ds['XLAT'][0].values, ds['XLONG'][0].values)
+    if method == 'bilinear':
+        js, is_, weights = locator.bilinear(coords[:, 0], coords[:, 1])
+    else:
+        js, is_ = locator.nearest(coords[:, 0], coords[:, 1])
+        js, is_, weights = js[:, None], is_[:, None], np.ones((len(coords), 1))
+
+    def column(name):
+        values = read_columns(ds[name], times, js, is_)
+        values = values.reshape(len(times), len(coords), js.shape[1], -1)
+        return (values * weights[None, :, :, None]).sum(axis=2)
+
+    pressure = (column('P') + column('PB')) / 100  # Convert to hPa
+    theta = column('T') + 300  # Potential temperature [K]
+    qv = column('QVAPOR')  # Water vapor mixing ratio [kg/kg]
+
+    temp = theta / ((1000 / pressure) ** 0.286) - 273.15  # Actual temperature
+
+    # Calculate dewpoint from vapor pressure
+    e = (qv * pressure) / (0.622 + qv)
+    dewpoint = (243.5 * np.log(e / 6.112)) / (17.67 - np.log(e / 6.112))
+    return pressure, temp, dewpoint
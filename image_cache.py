@@ -0,0 +1,130 @@
+"""
+Disk-backed cache of rendered plot images.
+
+Images are stored under a content-addressed file name derived from the render
+key (file, variable, time, level, colormap, style), shared by every session and
+process, and evicted least-recently-used once the directory exceeds its budget.
+The directory is re-scanned before evicting, so writes from worker processes
+and other replicas count against the same budget.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, IMAGE_FORMAT
+
+
+RESCAN_INTERVAL = 10  # seconds between directory scans that pick up other processes' writes
+
+
+class ImageCache:
+    def __init__(self, root=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES, fmt=IMAGE_FORMAT):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._rescan()
+
+    def path_for(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.root, f"{digest}.{self.fmt}")
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mtime doubles as the LRU clock
+        except OSError:
+            pass  # evicted by another session since the read; the bytes are still good
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self.path_for(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            os.replace(tmp_path, path)
+            self.current_bytes += len(data) - previous
+            # Worker processes and other replicas write to the same directory, so
+            # the running total is only an estimate between scans
+            if time.monotonic() - self._scanned > RESCAN_INTERVAL or self.current_bytes > self.max_bytes:
+                files = self._rescan()
+                if self.current_bytes > self.max_bytes:
+                    self._evict(files)
+
+    def get_or_render(self, key, render):
+        """Return cached bytes for `key`, calling `render()` -> bytes on a miss."""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            if data is not None:
+                self.put(key, data)
+        return data
+
+    def _files(self):
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(f'.{self.fmt}'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # removed by another process mid-scan
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def _rescan(self):
+        files = list(self._files())
+        self.current_bytes = sum(size for _, _, size in files)
+        self._scanned = time.monotonic()
+        return files
+
+    def _evict(self, files):
+        # Drop oldest images until we are back under 90% of the budget
+        target = self.max_bytes * 0.9
+        for path, _, size in sorted(files, key=lambda f: f[1]):
+            if self.current_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another process evicted it first
+            except OSError:
+                continue
+            self.current_bytes -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+_IMAGE_CACHE = None
+_INIT_LOCK = threading.Lock()
+
+
+def get_image_cache():
+    """Process-wide ImageCache, created on first use."""
+    global _IMAGE_CACHE
+    with _INIT_LOCK:
+        if _IMAGE_CACHE is None:
+            _IMAGE_CACHE = ImageCache()
+    return _IMAGE_CACHE
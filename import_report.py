@@ -0,0 +1,105 @@
+"""
+Import-time budget report for the app entry points.
+
+    python import_report.py [--budget-ms 2500] [--json report.json]
+
+Runs the module-level imports of app.py and every page in a fresh
+interpreter under `python -X importtime`, then reports the total import time,
+the heaviest top-level packages and which heavy libraries were loaded eagerly.
+Exits non-zero when a page goes over the budget, so it can gate a deploy.
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 2500
+HEAVY_MODULES = ['wrf', 'cartopy', 'geopandas', 'shapely', 'pyproj', 'metpy', 'tephi',
+                 'scipy', 'matplotlib', 'dask', 'h5netcdf', 'h5py']
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def entry_points():
+    return [os.path.join(ROOT, 'app.py')] + sorted(glob.glob(os.path.join(ROOT, 'pages', '*.py')))
+
+
+def module_imports(path):
+    """Source of the module-level import statements of a script."""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source)
+    return '\n'.join(ast.get_source_segment(source, node) for node in tree.body
+                     if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def _importtime(code):
+    """{module: (self_us, cumulative_us, depth)} for everything `code` imports."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def page_report(path, baseline):
+    modules = _importtime(module_imports(path))
+    top = {name: cumulative for name, (_, cumulative, depth) in modules.items()
+           if depth == 0 and name not in baseline}
+    roots = {name.split('.')[0] for name in modules}
+    return {
+        'page': os.path.relpath(path, ROOT),
+        'total_ms': round(sum(top.values()) / 1000, 1),
+        'heaviest': sorted(((name, round(us / 1000, 1)) for name, us in top.items()),
+                           key=lambda item: -item[1])[:8],
+        'heavy_loaded': [name for name in HEAVY_MODULES if name in roots],
+        'heavy_deferred': [name for name in HEAVY_MODULES if name not in roots]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="maximum import time per page")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    baseline = _importtime('pass')  # interpreter start-up imports
+    reports = []
+    over_budget = False
+    for path in entry_points():
+        try:
+            report = page_report(path, baseline)
+        except RuntimeError as e:
+            print(f"{os.path.relpath(path, ROOT)}: could not import ({e})")
+            over_budget = True
+            continue
+        report['over_budget'] = report['total_ms'] > args.budget_ms
+        over_budget |= report['over_budget']
+        reports.append(report)
+
+        flag = "OVER BUDGET" if report['over_budget'] else "ok"
+        print(f"\n{report['page']}: {report['total_ms']:.0f} ms ({flag}, budget {args.budget_ms:.0f} ms)")
+        for name, ms in report['heaviest']:
+            print(f"  {ms:8.1f} ms  {name}")
+        print(f"  eager:    {', '.join(report['heavy_loaded']) or '-'}")
+        print(f"  deferred: {', '.join(report['heavy_deferred']) or '-'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'budget_ms': args.budget_ms, 'pages': reports}, f, indent=2)
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
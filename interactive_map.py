@@ -0,0 +1,240 @@
+"""
+Interactive map mode: quantized fields coloured in the browser.
+
+Instead of a rendered image, the plotted field is resampled onto a regular
+lat/lon raster over MAP_EXTENT (nearest grid cell, the index computed once
+per grid), quantized to uint8 or uint16 with a scale and offset, deflated and
+sent with a 256-entry lookup table of the selected colormap and simplified
+county outlines. The browser decodes, colours and outlines the raster itself
+and reads values under the cursor, so each interaction costs one lookup of a
+cached payload of a few tens of kilobytes.
+"""
+import base64
+import functools
+import json
+import zlib
+
+import numpy as np
+
+from config import (
+    COUNTY_SHAPEFILE_PATH,
+    INTERACTIVE_BITS,
+    INTERACTIVE_CACHE_MAX_BYTES,
+    INTERACTIVE_RASTER_WIDTH,
+    PREVIEW_SIMPLIFY
+)
+from data_loader import get_latlon
+from field_cache import FieldCache
+from grid_locator import get_grid_locator
+from lazy_imports import lazy_module
+from plot_utils import MAP_EXTENT, colour_range, field_units, plot_field
+from product_store import product_key
+from tracing import traced
+from zonal import grid_hash
+
+gpd = lazy_module('geopandas')
+matplotlib = lazy_module('matplotlib')
+
+PAYLOAD_CACHE = FieldCache(max_bytes=INTERACTIVE_CACHE_MAX_BYTES)
+_RASTER_INDEXES = {}
+
+
+def raster_size(width=INTERACTIVE_RASTER_WIDTH, extent=MAP_EXTENT):
+    lon0, lon1, lat0, lat1 = extent
+    return width, max(1, int(round(width * (lat1 - lat0) / (lon1 - lon0))))
+
+
+def raster_index(lats, lons, width, height, extent=MAP_EXTENT):
+    """
+    Flat index into the WRF grid of the cell nearest each raster pixel
+    (row 0 at the northern edge), and a mask of pixels outside the domain.
+    Built once per (grid, raster) and reused for every field on that grid.
+    """
+    key = (grid_hash(lats, lons), width, height, extent)
+    if key not in _RASTER_INDEXES:
+        lon0, lon1, lat0, lat1 = extent
+        px_lon = lon0 + (np.arange(width) + 0.5) * (lon1 - lon0) / width
+        px_lat = lat1 - (np.arange(height) + 0.5) * (lat1 - lat0) / height
+        grid_lon, grid_lat = np.meshgrid(px_lon, px_lat)
+
+        locator = get_grid_locator(lats, lons)
+        j, i = locator.nearest(grid_lat.ravel(), grid_lon.ravel())
+        # Off the domain when further from the nearest centre than about one cell
+        spacing = max(np.abs(np.diff(locator.lats, axis=0)).max(), np.abs(np.diff(locator.lons, axis=1)).max())
+        outside = ((np.abs(locator.lats[j, i] - grid_lat.ravel()) > spacing) |
+                   (np.abs(locator.lons[j, i] - grid_lon.ravel()) > spacing))
+        _RASTER_INDEXES[key] = (np.ravel_multi_index((j, i), locator.shape), outside)
+    return _RASTER_INDEXES[key]
+
+
+def quantize(values, bits=8):
+    """
+    (codes, scale, offset, nodata) with values ~= offset + codes * scale.
+    NaNs map to `nodata`, the largest code, which is never used for data.
+    """
+    dtype = np.uint8 if bits == 8 else np.uint16
+    nodata = np.iinfo(dtype).max
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.full(values.shape, nodata, dtype=dtype), 1.0, 0.0, int(nodata)
+    offset = float(values[finite].min())
+    span = float(values[finite].max()) - offset
+    scale = span / (nodata - 1) if span > 0 else 1.0
+    codes = np.full(values.shape, nodata, dtype=dtype)
+    codes[finite] = np.round((values[finite] - offset) / scale).astype(dtype)
+    return codes, scale, offset, int(nodata)
+
+
+def dequantize(codes, scale, offset, nodata):
+    values = offset + codes.astype(np.float64) * scale
+    values[codes == nodata] = np.nan
+    return values
+
+
+@traced()
+def field_payload(nc, var_type, time_idx=0, pressure_level=None, bits=INTERACTIVE_BITS,
+                  width=INTERACTIVE_RASTER_WIDTH):
+    """
+    JSON payload (bytes) of one field as a quantized raster: size, extent,
+    scale/offset/nodata, the colour range of the static plot, units and the
+    little-endian codes deflated and base64-encoded.
+    """
+    key = (product_key(nc), var_type, int(time_idx), pressure_level, bits, width, MAP_EXTENT)
+
+    def build():
+        field = plot_field(nc, var_type, time_idx, pressure_level)
+        if field is None:
+            return None
+        lats, lons = get_latlon(nc, time_idx)
+        w, h = raster_size(width)
+        index, outside = raster_index(lats, lons, w, h)
+        raster = field.ravel()[index]
+        raster[outside] = np.nan
+        codes, scale, offset, nodata = quantize(raster.reshape(h, w), bits)
+        vmin, vmax = colour_range(var_type, field)
+        return json.dumps({
+            'width': w, 'height': h, 'extent': MAP_EXTENT, 'bits': bits,
+            'scale': scale, 'offset': offset, 'nodata': nodata,
+            'vmin': vmin, 'vmax': vmax, 'units': field_units(var_type, pressure_level),
+            'title': f"{var_type} at {pressure_level} hPa" if pressure_level else var_type,
+            'data': base64.b64encode(zlib.compress(codes.astype(codes.dtype.newbyteorder('<')).tobytes(), 6)).decode()
+        }).encode()
+
+    return PAYLOAD_CACHE.get_or_compute(key, build)
+
+
+@functools.lru_cache(maxsize=16)
+def colormap_lut(name):
+    """256 [r, g, b] entries of a matplotlib colormap."""
+    colours = matplotlib.colormaps[name or 'viridis'](np.linspace(0, 1, 256))[:, :3]
+    return json.dumps(np.round(colours * 255).astype(int).tolist())
+
+
+@functools.lru_cache(maxsize=4)
+def county_outlines(tolerance=PREVIEW_SIMPLIFY):
+    """Simplified county boundary rings as JSON [[[lon, lat], ...], ...]; [] if unavailable."""
+    try:
+        gdf = gpd.read_file(COUNTY_SHAPEFILE_PATH)
+    except Exception:
+        return '[]'
+    gdf = gdf.set_crs(epsg=4326) if gdf.crs is None else gdf.to_crs(epsg=4326)
+    rings = []
+    for geom in gdf.geometry.simplify(tolerance, preserve_topology=True):
+        for polygon in getattr(geom, 'geoms', [geom]):
+            rings.append(np.round(np.asarray(polygon.exterior.coords)[:, :2], 3).tolist())
+    return json.dumps(rings)
+
+
+_VIEWER_TEMPLATE = """
+<div style="font-family: sans-serif">
+  <div id="title" style="font-weight: bold; margin-bottom: 4px"></div>
+  <canvas id="map" style="width: 100%; border: 1px solid #ccc; image-rendering: pixelated"></canvas>
+  <canvas id="bar" style="width: 100%; height: 14px"></canvas>
+  <div style="display: flex; justify-content: space-between; font-size: 12px">
+    <span id="vmin"></span><span id="readout"></span><span id="vmax"></span>
+  </div>
+</div>
+<script>
+const P = __PAYLOAD__, LUT = __LUT__, OUTLINES = __OUTLINES__;
+const [W, E, S, N] = P.extent;
+
+async function inflate(b64) {
+  const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+function colour(value) {
+  const k = Math.min(255, Math.max(0, Math.round((value - P.vmin) / ((P.vmax - P.vmin) || 1) * 255)));
+  return LUT[k];
+}
+
+(async () => {
+  const raw = await inflate(P.data);
+  const codes = P.bits === 16 ? new Uint16Array(raw.buffer) : raw;
+  const value = i => codes[i] === P.nodata ? NaN : P.offset + codes[i] * P.scale;
+
+  // Colour the raster at its native size, then scale it onto the display canvas
+  const raster = document.createElement('canvas');
+  raster.width = P.width; raster.height = P.height;
+  const image = raster.getContext('2d').createImageData(P.width, P.height);
+  for (let i = 0; i < codes.length; i++) {
+    const v = value(i);
+    if (Number.isNaN(v)) continue;
+    const [r, g, b] = colour(v);
+    image.data.set([r, g, b, 255], 4 * i);
+  }
+  raster.getContext('2d').putImageData(image, 0, 0);
+
+  const map = document.getElementById('map');
+  map.width = 2 * P.width; map.height = 2 * P.height;
+  const ctx = map.getContext('2d');
+  ctx.imageSmoothingEnabled = false;
+  ctx.drawImage(raster, 0, 0, map.width, map.height);
+
+  // County outlines drawn by the browser at display resolution
+  const x = lon => (lon - W) / (E - W) * map.width, y = lat => (N - lat) / (N - S) * map.height;
+  ctx.strokeStyle = 'black'; ctx.lineWidth = 1;
+  for (const ring of OUTLINES) {
+    ctx.beginPath();
+    ring.forEach(([lon, lat], k) => k ? ctx.lineTo(x(lon), y(lat)) : ctx.moveTo(x(lon), y(lat)));
+    ctx.stroke();
+  }
+
+  const bar = document.getElementById('bar');
+  bar.width = 256; bar.height = 1;
+  const strip = bar.getContext('2d').createImageData(256, 1);
+  LUT.forEach(([r, g, b], k) => strip.data.set([r, g, b, 255], 4 * k));
+  bar.getContext('2d').putImageData(strip, 0, 0);
+  document.getElementById('title').textContent = P.title;
+  document.getElementById('vmin').textContent = `${P.vmin.toFixed(1)} ${P.units}`;
+  document.getElementById('vmax').textContent = `${P.vmax.toFixed(1)} ${P.units}`;
+
+  const readout = document.getElementById('readout');
+  map.addEventListener('mousemove', event => {
+    const rect = map.getBoundingClientRect();
+    const col = Math.floor((event.clientX - rect.left) / rect.width * P.width);
+    const row = Math.floor((event.clientY - rect.top) / rect.height * P.height);
+    const v = value(row * P.width + col);
+    const lon = W + (col + 0.5) / P.width * (E - W), lat = N - (row + 0.5) / P.height * (N - S);
+    readout.textContent = `${lat.toFixed(2)}°, ${lon.toFixed(2)}°: ` +
+      (Number.isNaN(v) ? 'outside domain' : `${v.toFixed(2)} ${P.units}`);
+  });
+})();
+</script>
+"""
+
+
+def viewer_html(payload, cmap):
+    """Self-contained HTML/JS viewer for a field_payload."""
+    return (_VIEWER_TEMPLATE
+            .replace('__PAYLOAD__', payload.decode())
+            .replace('__LUT__', colormap_lut(cmap))
+            .replace('__OUTLINES__', county_outlines()))
+
+
+def viewer_height(width=INTERACTIVE_RASTER_WIDTH, display_width=700):
+    """Pixel height for the Streamlit component showing a raster `display_width` wide."""
+    w, h = raster_size(width)
+    return int(display_width * h / w) + 70
@@ -0,0 +1,48 @@
+"""
+Deferred imports of the heavy scientific libraries.
+
+`lazy_module('cartopy.crs')` returns a stand-in that imports the real module
+on first attribute access, so a page only pays for wrf-python, cartopy,
+geopandas or tephi when one of its code paths actually uses them. How long
+each deferred import took is kept in IMPORT_TIMES and shows up as a span when
+tracing.
+"""
+import importlib
+import threading
+import time
+
+from tracing import span
+
+IMPORT_TIMES = {}
+_lock = threading.Lock()
+
+
+class LazyModule:
+    __slots__ = ('_name', '_module')
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    with span(f'import {self._name}'):
+                        module = importlib.import_module(self._name)
+                    IMPORT_TIMES[self._name] = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name):
+    """Stand-in for `import name` that defers the import to first use."""
+    return LazyModule(name)
@@ -0,0 +1,224 @@
+"""
+Per-file metadata index persisted as a small JSON sidecar.
+
+Everything the pages need to build their selectors - the valid times, the
+variable inventory (dims, shape, units, stagger), the grid extent and the
+pressure range the model levels actually cover - is extracted once per file
+and written next to it (or next to its cached download). Later reruns and
+processes read the sidecar without opening the NetCDF file. Each sidecar is
+stamped with the version of the data it describes (size and mtime of a local
+file, ETag/Last-Modified/size of a remote object), so it is rebuilt when the
+data changes.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import requests
+
+from config import CACHE_DIR, DATA_ACCESS_MODE, STANDARD_PRESSURE_LEVELS
+from remote_reader import remote_version
+
+METADATA_VERSION = 1
+SIDECAR_SUFFIX = '.meta.json'
+TIME_FORMAT = "%Y-%m-%d_%H:%M:%S"
+GLOBAL_ATTRIBUTES = ['SIMULATION_START_DATE', 'START_DATE', 'GRID_ID', 'PARENT_ID', 'MAP_PROJ',
+                     'DX', 'DY', 'CEN_LAT', 'CEN_LON', 'TRUELAT1', 'TRUELAT2', 'STAND_LON']
+
+
+def available_variables(names):
+    """(display name, 'surface'|'pressure') for the products the variables in `names` support."""
+    available = []
+    if all(var in names for var in ['U10', 'V10']):
+        available.append(('Wind Speed (10m)', 'surface'))
+    if 'T2' in names:
+        available.append(('Temperature (2m)', 'surface'))
+    if 'RAINNC' in names or 'RAINC' in names:
+        available.append(('Rainfall', 'surface'))
+    if 'Q2' in names or 'RH2' in names:
+        available.append(('Humidity (2m)', 'surface'))
+    if all(var in names for var in ['U', 'V']):
+        available.append(('Wind Speed', 'pressure'))
+    if 'T' in names:
+        available.append(('Temperature', 'pressure'))
+    if 'rh' in names:
+        available.append(('Relative Humidity', 'pressure'))
+    return available
+
+
+def _is_url(location):
+    return location.startswith(('http://', 'https://'))
+
+
+def _dim_size(dim):
+    return dim if isinstance(dim, int) else len(dim)
+
+
+def _attr(obj, name):
+    try:
+        value = obj.getncattr(name)
+    except (AttributeError, KeyError):
+        return None
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    return value
+
+
+def step_pressure_ranges(nc, n_times):
+    """
+    (low, high) in hPa of the levels the getters can interpolate to at each
+    time, read from the top and bottom model levels only. None when P/PB are absent.
+    """
+    if not all(name in nc.variables for name in ('P', 'PB')):
+        return None
+    p, pb = nc.variables['P'], nc.variables['PB']
+    ranges = []
+    for t in range(n_times):
+        bottom = (np.asarray(p[t, 0], dtype=np.float64) + np.asarray(pb[t, 0], dtype=np.float64)) / 100
+        top = (np.asarray(p[t, -1], dtype=np.float64) + np.asarray(pb[t, -1], dtype=np.float64)) / 100
+        # Same bounds LevelInterpolator checks: p_min = min over the top, p_max = max over the bottom
+        ranges.append((float(np.nanmin(top)), float(np.nanmax(bottom))))
+    return ranges
+
+
+def _pressure_range(nc, n_times):
+    """(low, high) in hPa covered by every column at every time, or None."""
+    ranges = step_pressure_ranges(nc, n_times)
+    if ranges is None:
+        return None
+    return [max([-np.inf] + [low for low, _ in ranges]), min([np.inf] + [high for _, high in ranges])]
+
+
+def build_metadata(nc):
+    """Metadata dict for an open netCDF4.Dataset or RemoteDataset."""
+    from catalog import _read_valid_times
+
+    times = _read_valid_times(nc) if 'Times' in nc.variables else []
+    variables = {}
+    for name, var in nc.variables.items():
+        variables[name] = {
+            'dims': list(var.dimensions),
+            'shape': [int(s) for s in var.shape],
+            'dtype': str(var.dtype),
+            'units': _attr(var, 'units'),
+            'stagger': _attr(var, 'stagger'),
+            'description': _attr(var, 'description')
+        }
+
+    grid = {name: _dim_size(dim) for name, dim in nc.dimensions.items() if name != 'Time'}
+    if 'XLAT' in nc.variables and 'XLONG' in nc.variables:
+        lats = np.asarray(nc.variables['XLAT'][0], dtype=np.float64)
+        lons = np.asarray(nc.variables['XLONG'][0], dtype=np.float64)
+        grid.update(lat_min=float(lats.min()), lat_max=float(lats.max()),
+                    lon_min=float(lons.min()), lon_max=float(lons.max()))
+
+    pressure_range = _pressure_range(nc, len(times))
+    levels = STANDARD_PRESSURE_LEVELS.copy()
+    if pressure_range is not None:
+        levels = [lvl for lvl in levels if pressure_range[0] <= lvl <= pressure_range[1]]
+
+    return {
+        'version': METADATA_VERSION,
+        'times': [t.strftime(TIME_FORMAT) for t in times],
+        'variables': variables,
+        'grid': grid,
+        'attributes': {name: _attr(nc, name) for name in GLOBAL_ATTRIBUTES if _attr(nc, name) is not None},
+        'pressure_range_hpa': pressure_range,
+        'available': available_variables(variables),
+        'pressure_levels': levels
+    }
+
+
+def _data_path(location):
+    """Local file holding the data for `location`, or None (range-read URLs)."""
+    if not _is_url(location):
+        return location
+    if DATA_ACCESS_MODE == 'range':
+        return None
+    # Download mode: the cached copy recorded by data_loader.fetch_to_cache
+    meta_path = os.path.join(CACHE_DIR, hashlib.sha256(location.encode()).hexdigest() + '.json')
+    try:
+        with open(meta_path) as f:
+            path = json.load(f).get('path')
+    except (OSError, ValueError):
+        return None
+    return path if path and os.path.exists(path) else None
+
+
+def _stamp(location):
+    """Version of the data behind `location`, recorded in and checked against its sidecar."""
+    if _is_url(location):
+        try:
+            return remote_version(location)  # the version_key dataset_identity keys fields by
+        except requests.RequestException:
+            if DATA_ACCESS_MODE == 'range':
+                raise
+            # Offline in download mode: the cached copy is all there is
+    data_path = _data_path(location)
+    if data_path is None:
+        return None
+    stat = os.stat(data_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def sidecar_paths(location):
+    """Candidate sidecar locations: next to the data file, then under CACHE_DIR."""
+    data_path = _data_path(location)
+    paths = [data_path + SIDECAR_SUFFIX] if data_path else []
+    key = hashlib.sha256(os.path.abspath(location).encode() if not _is_url(location) else location.encode())
+    paths.append(os.path.join(CACHE_DIR, 'metadata', key.hexdigest() + SIDECAR_SUFFIX))
+    return paths
+
+
+def load_metadata(location, stamp=None):
+    """Stored metadata for `location` if a current sidecar exists, else None."""
+    if stamp is None:
+        stamp = _stamp(location)
+    for path in sidecar_paths(location):
+        try:
+            with open(path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get('version') == METADATA_VERSION and meta.get('source') == stamp:
+            return meta
+    return None
+
+
+def save_metadata(location, meta):
+    """Write the sidecar atomically to the first writable candidate location."""
+    for path in sidecar_paths(location):
+        directory = os.path.dirname(path) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        except OSError:
+            continue
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return path
+    return None
+
+
+def file_metadata(location, open_dataset):
+    """
+    Metadata for `location`, built on the first call from the dataset the
+    context manager `open_dataset(location)` yields.
+    """
+    stamp = _stamp(location)
+    meta = load_metadata(location, stamp)
+    if meta is None:
+        with open_dataset(location) as nc:
+            meta = build_metadata(nc)
+        meta['source'] = stamp
+        save_metadata(location, meta)
+    return meta
+
+
+def valid_times(meta):
+    return [datetime.strptime(t, TIME_FORMAT) for t in meta['times']]
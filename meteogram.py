@@ -0,0 +1,110 @@
+"""
+Point forecasts for many stations across the whole forecast.
+
+Station cells are located once with the grid locator, then each surface
+variable is read for all stations and all times in a single pointwise-indexed
+read, instead of loading a full 2-D field per station per hour.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from grid_locator import get_grid_locator
+
+POINT_VARIABLES = ['T2', 'Q2', 'RH2', 'PSFC', 'U10', 'V10', 'RAINNC', 'RAINC']
+
+
+def read_station_list(csv_file):
+    """Parse an uploaded station list with name, lat and lon columns."""
+    table = pd.read_csv(csv_file)
+    table.columns = [c.strip().lower() for c in table.columns]
+    return list(table[['name', 'lat', 'lon']].itertuples(index=False, name=None))
+
+
+def _read_points(ds, times, js, is_, weights):
+    """(n_times, n_stations) values of every available point variable."""
+    n_stations, n_corners = js.shape
+    sel = {
+        'Time': list(times),
+        'south_north': xr.DataArray(js.ravel(), dims='point'),
+        'west_east': xr.DataArray(is_.ravel(), dims='point')
+    }
+    names = [name for name in POINT_VARIABLES if name in ds]
+    # One vectorized read per variable covering all stations and times
+    points = ds[names].isel(sel).load()
+    out = {}
+    for name in names:
+        values = points[name].values.reshape(len(times), n_stations, n_corners)
+        out[name] = (values * weights[None]).sum(axis=2)
+    return out
+
+
+def _relative_humidity(fields):
+    if 'RH2' in fields:
+        return fields['RH2']
+    if not all(name in fields for name in ('Q2', 'T2', 'PSFC')):
+        return None
+    q, t_c, p_hpa = fields['Q2'], fields['T2'] - 273.15, fields['PSFC'] / 100
+    e = (q * p_hpa) / (0.622 + q)
+    es = 6.112 * np.exp(17.67 * t_c / (t_c + 243.5))
+    return np.clip(100 * e / es, 0, 100)
+
+
+def extract_point_forecasts(time_axis, open_dataset, to_xarray, stations, method='nearest'):
+    """
+    Tidy DataFrame of T2, RH, rainfall and 10 m wind for every station at
+    every step of a catalog time axis. `stations` is a list of
+    (name, lat, lon); `method` is 'nearest' or 'bilinear'.
+    `open_dataset(location)` is a context manager such as Catalog.open.
+    """
+    names = [s[0] for s in stations]
+    lats = np.array([s[1] for s in stations], dtype=np.float64)
+    lons = np.array([s[2] for s in stations], dtype=np.float64)
+
+    by_file = OrderedDict()
+    for step in time_axis:
+        by_file.setdefault(step.location, []).append(step)
+
+    frames = []
+    for location, steps in by_file.items():
+        with open_dataset(location) as nc:
+            ds = to_xarray(nc)
+            locator = get_grid_locator(ds['XLAT'][0].values, ds['XLONG'][0].values)
+            if method == 'bilinear':
+                js, is_, weights = locator.bilinear(lats, lons)
+            else:
+                js, is_ = locator.nearest(lats, lons)
+                js, is_, weights = js[:, None], is_[:, None], np.ones((len(stations), 1))
+
+            fields = _read_points(ds, [s.time_idx for s in steps], js, is_, weights)
+        columns = {}
+        if 'T2' in fields:
+            columns['t2_c'] = fields['T2'] - 273.15
+        rh = _relative_humidity(fields)
+        if rh is not None:
+            columns['rh_pct'] = rh
+        rain = sum(fields[name] for name in ('RAINNC', 'RAINC') if name in fields)
+        if not np.isscalar(rain):
+            columns['rain_total_mm'] = rain
+        if 'U10' in fields and 'V10' in fields:
+            u, v = fields['U10'], fields['V10']
+            columns['wind_speed_ms'] = np.hypot(u, v)
+            columns['wind_dir_deg'] = (270 - np.degrees(np.arctan2(v, u))) % 360  # direction wind blows from
+
+        n_times = len(steps)
+        frame = pd.DataFrame({
+            'station': np.tile(names, n_times),
+            'lat': np.tile(lats, n_times),
+            'lon': np.tile(lons, n_times),
+            'time': np.repeat([s.valid_time for s in steps], len(stations)),
+            **{name: values.ravel() for name, values in columns.items()}
+        })
+        frames.append(frame)
+
+    table = pd.concat(frames, ignore_index=True).sort_values(['station', 'time'], kind='stable')
+    if 'rain_total_mm' in table:
+        # Rainfall since the previous forecast step at each station
+        table['rain_mm'] = table.groupby('station')['rain_total_mm'].diff().fillna(table['rain_total_mm']).clip(lower=0)
+    return table.reset_index(drop=True)
@@ -1,19 +1,29 @@
 import streamlit as st
-from config import CMAP_OPTIONS, STANDARD_PRESSURE_LEVELS, R2_PUBLIC_URL
-from data_loader import load_wrf_data_from_r2, get_available_variables
-from wrf import getvar, ALL_TIMES
-from dateutil.parser import parse
-from plot_utils import create_plot
+import streamlit.components.v1 as components
+from config import CMAP_OPTIONS, STANDARD_PRESSURE_LEVELS, R2_PUBLIC_URL, PREVIEW_ENABLED
+from data_loader import load_catalog
+from plot_utils import render_plot_image, render_plot_progressive
+from interactive_map import field_payload, viewer_height, viewer_html
+from prefetch import prefetch_neighbours
+from rainfall import get_run_rainfall_stack, window_label, windows_ending_at
+from tracing import begin_page, render_trace_panel
+import numpy as np
 
 st.title("📡 WRF Variable Visualizer")
+begin_page("Visualizer")
 
-nc, xr_ds = load_wrf_data_from_r2()
-if nc:
-    available_vars, pressure_levels = get_available_variables(nc)
-    times = getvar(nc, 'times', timeidx=ALL_TIMES)
-    time_strs = [parse(str(t)).strftime("%Y-%m-%d %H:%M") for t in times.values]
+catalog = load_catalog()
+runs = catalog.runs()
+run = st.sidebar.selectbox("Model Run", runs) if len(runs) > 1 else runs[0]
+domains = catalog.domains(run)
+domain = st.sidebar.selectbox("Domain", domains) if len(domains) > 1 else domains[0]
+time_axis = catalog.time_axis(run, domain)
+
+if time_axis:
+    time_strs = [step.valid_time.strftime("%Y-%m-%d %H:%M") for step in time_axis]
     selected_time_str = st.selectbox("Select Time", time_strs)
-    time_idx = time_strs.index(selected_time_str)
+    step = time_axis[time_strs.index(selected_time_str)]
+    available_vars, pressure_levels = catalog.available_variables(step.location)
 
     var_names = [v[0] for v in available_vars]
     selected_var_name = st.selectbox("Select Variable", var_names)
@@ -31,11 +41,43 @@ if nc:
     if var_type == 'pressure':
         pressure_level = st.selectbox("Select Pressure Level", level_options)
 
+    # === Rainfall accumulation window ===
+    rain_hours = None
+    if selected_var_name == 'Rainfall':
+        # Windows over the whole run, across file boundaries
+        windows = windows_ending_at([s.valid_time for s in time_axis], time_strs.index(selected_time_str))
+        rain_hours = st.selectbox("Accumulation", [None] + windows,
+                                  format_func=lambda h: f"Last {h} h" if h else "Since model start")
+        selected_var_name = window_label(rain_hours)
+
     cmap_group = selected_var_name.split(' ')[0]
     cmap = st.selectbox("Colormap", CMAP_OPTIONS.get(cmap_group))
 
-    fig, _ = create_plot(nc, selected_var_name, time_idx, cmap, pressure_level)
-    if fig:
-        st.pyplot(fig)
+    map_mode = st.sidebar.radio("Map Mode", ["Static", "Interactive"],
+                                help="Interactive sends the raw field and lets the browser colour it")
+
+    if map_mode == "Interactive":
+        with catalog.locate(step) as (nc, time_idx):
+            payload = field_payload(nc, selected_var_name, time_idx, pressure_level)
+        image = payload is not None
+        if image:
+            components.html(viewer_html(payload, cmap), height=viewer_height())
+    elif PREVIEW_ENABLED:
+        # Shows the preview and returns; the full render swaps in on a later rerun
+        image = render_plot_progressive(catalog.locate, step, selected_var_name, cmap, pressure_level)
     else:
-        st.error("Plot generation failed.")
\ No newline at end of file
+        with catalog.locate(step) as (nc, time_idx):
+            image = render_plot_image(nc, selected_var_name, time_idx, cmap, pressure_level)
+        if image:
+            st.image(image)
+    if not image:
+        st.error("Plot generation failed.")
+    elif rain_hours:
+        heaviest = get_run_rainfall_stack(catalog, run, domain).window_max(rain_hours)
+        st.caption(f"🌧 Heaviest {rain_hours} h total anywhere in this run: {np.nanmax(heaviest):.1f} mm")
+    if image:
+        # Warm the next/previous times and adjacent levels while the user looks at this one
+        prefetch_neighbours(catalog, time_axis, [time_strs.index(selected_time_str)], selected_var_name,
+                            pressure_level, level_options if pressure_level else ())
+
+render_trace_panel()
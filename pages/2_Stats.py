@@ -1,18 +1,18 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import tephi
-import xarray as xr
 from dateutil.parser import parse
-from scipy import stats
-from config import R2_PUBLIC_URL
-from data_loader import load_wrf_data_from_r2, get_available_variables
-from wrf import getvar, ALL_TIMES
-from metpy.plots import SkewT
-from metpy.units import units
-import metpy.calc as mpcalc
-import io
+from config import R2_PUBLIC_URL, COUNTY_SHAPEFILE_PATH, SUBCOUNTY_SHAPEFILE_PATH, STATIONS
+from grid_locator import extract_profiles
+from data_loader import load_catalog, as_xarray, get_latlon, load_kenya_shapefiles
+from plot_utils import plot_field, summarize_over_county
+from timeseries import SERIES_UNITS, compute_time_series, county_mask
+from soundings import draw_tephigram
+from tracing import begin_page, render_trace_panel
+from lazy_imports import lazy_module
+
+# pyplot is only imported once a series is plotted
+plt = lazy_module('matplotlib.pyplot')
+mdates = lazy_module('matplotlib.dates')
 
 # --------------------------
 # Page Configuration
@@ -23,6 +23,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+begin_page("Stats")
 
 # Custom CSS Styling
 st.markdown("""
@@ -90,28 +91,55 @@ st.markdown("""
 # --------------------------
 # Data Loading
 # --------------------------
-nc, xr_ds = load_wrf_data_from_r2()
-
-if nc:
+@st.cache_resource
+def load_boundaries():
+    try:
+        return load_kenya_shapefiles(COUNTY_SHAPEFILE_PATH, SUBCOUNTY_SHAPEFILE_PATH)
+    except Exception:
+        return None, None
+
+def load_counties():
+    return load_boundaries()[0]
+
+@st.cache_data(show_spinner=False)
+def load_series(_catalog, time_axis, var_name, pressure_level, region):
+    mask = None
+    if region != "Whole Domain":
+        with _catalog.open(time_axis[0].location) as nc:
+            ds = as_xarray(nc)
+            mask = county_mask(load_counties(), region, ds['XLAT'][0].values, ds['XLONG'][0].values)
+    return compute_time_series(time_axis, _catalog.open, as_xarray, var_name, pressure_level, mask)
+
+catalog = load_catalog()
+runs = catalog.runs()
+run = st.sidebar.selectbox("Model Run", runs) if len(runs) > 1 else runs[0]
+domains = catalog.domains(run)
+domain = st.sidebar.selectbox("Domain", domains) if len(domains) > 1 else domains[0]
+time_axis = catalog.time_axis(run, domain)
+
+if time_axis:
      
     # --------------------------
     # Control Panel
     # --------------------------
     with st.expander("⚙ CONTROL PANEL", expanded=True):
-        available_vars, pressure_levels = get_available_variables(nc)
-        times = getvar(nc, 'times', timeidx=ALL_TIMES)
-        time_strs = [parse(str(t)).strftime("%Y-%m-%d %H:%M") for t in times.values]
+        time_strs = [step.valid_time.strftime("%Y-%m-%d %H:%M") for step in time_axis]
         
         col1, col2, col3 = st.columns(3)
         with col1:
             selected_time_str = st.selectbox("⏰ Select Time Period", time_strs)
-            time_idx = time_strs.index(selected_time_str)
+            step = time_axis[time_strs.index(selected_time_str)]
+            available_vars, pressure_levels = catalog.available_variables(step.location)
         with col2:
             filtered_vars = [v for v in available_vars if v[0] !='Temperature' and 'Wind Speed' not in v[0]]
             selected_var_name = st.selectbox("📊 Select Variable", [v[0] for v in filtered_vars])
         with col3:
             var_type = next(v[1] for v in available_vars if v[0] == selected_var_name)
             pressure_level = st.selectbox("↕ Pressure Level", pressure_levels) if var_type == 'pressure' else None
+
+        counties = load_counties()
+        region_options = ["Whole Domain"] + (sorted(counties['NAME_1']) if counties is not None else [])
+        region = st.selectbox("🗺 Region", region_options)
     
     # Update decorative icons based on selection
     icon_map = {
@@ -128,9 +156,14 @@ if nc:
     </script>
     """, unsafe_allow_html=True)
     
-    # Generate sample data 
-    time_points = np.arange(len(time_strs))
-    current_data = 10 * np.sin(time_points/10) + 15 + np.random.normal(0, 2, len(time_strs))
+    # Spatial statistics over the whole forecast
+    with st.spinner("Computing time series..."):
+        series = load_series(catalog, time_axis, selected_var_name, pressure_level, region)
+    current_data = series['mean'].to_numpy()
+    # Steps where the region has no valid cells (e.g. the level is below ground) are NaN
+    finite = np.isfinite(current_data)
+    finite_data = current_data[finite]
+    series_units = SERIES_UNITS.get(selected_var_name, 'units')
     
     # --------------------------
     # Data Visualization Section
@@ -138,7 +171,7 @@ if nc:
     st.header("📊 DATA VISUALIZATION")
 
     # Add a tab system to organize plots
-    tab1, tab2, tab3 = st.tabs(["Time Series", "Distributions", "Tephigram"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Time Series", "Distributions", "Tephigram", "Sub-counties"])
     
     with tab1:
         # Main Time Series Plot
@@ -149,17 +182,19 @@ if nc:
             # Convert time strings to datetime objects for plotting
             time_dates = [parse(t) for t in time_strs]
 
-            ax.plot(time_dates, current_data, color='#1f77b4', linewidth=2)
+            ax.plot(time_dates, current_data, color='#1f77b4', linewidth=2, label=f'{region} mean')
+            ax.fill_between(time_dates, series['min'], series['max'], color='#1f77b4', alpha=0.15, label='Min–max range')
             
             # Add trend line
             time_points = np.arange(len(time_dates))
-            z = np.polyfit(time_points, current_data, 1)
-            p = np.poly1d(z)
-            ax.plot(time_dates, p(time_points), "r--", label=f'Trend ({z[0]:.2f} units/hr)')
+            if finite.sum() >= 2:
+                z = np.polyfit(time_points[finite], finite_data, 1)
+                p = np.poly1d(z)
+                ax.plot(time_dates, p(time_points), "r--", label=f'Trend ({z[0]:.2f} {series_units}/step)')
             
             ax.set_title(f"{selected_var_name} Time Series", fontsize=14, pad=15)
             # ax.set_xlabel("Time", fontsize=12)
-            ax.set_ylabel(f"{selected_var_name} (units)", fontsize=12)
+            ax.set_ylabel(f"{selected_var_name} ({series_units})", fontsize=12)
 
             # Format x-axis to show dates 
             ax.set_xticks(time_dates)  # Force all timestamps to be shown
@@ -180,107 +215,93 @@ if nc:
         col1, col2 = st.columns(2)
         with col1:
             fig2, ax2 = plt.subplots(figsize=(8, 5))
-            n, bins, patches = ax2.hist(current_data, bins=20, color='#1f77b4', alpha=0.7)
+            n, bins, patches = ax2.hist(finite_data, bins=20, color='#1f77b4', alpha=0.7)
             
             # Add normal distribution curve
-            mu, sigma = np.mean(current_data), np.std(current_data)
+            mu, sigma = np.mean(finite_data), np.std(finite_data)
 
             y = ((1 / (np.sqrt(2 * np.pi) * sigma))) * \
             np.exp(-0.5 * ((bins - mu) / sigma)**2) * \
-            len(current_data) * (bins[1] - bins[0])
+            len(finite_data) * (bins[1] - bins[0])
 
             y = ((1 / (np.sqrt(2 * np.pi) * sigma)) * 
-                np.exp(-0.5 * (1 / sigma * (bins - mu))**2) * len(current_data) * (bins[1] - bins[0]))
+                np.exp(-0.5 * (1 / sigma * (bins - mu))**2) * len(finite_data) * (bins[1] - bins[0]))
 
             ax2.plot(bins, y, 'r--', linewidth=2)
             
             ax2.set_title("Value Distribution", fontsize=14)
-            ax2.set_xlabel(f"{selected_var_name} (units)", fontsize=12)
+            ax2.set_xlabel(f"{selected_var_name} ({series_units})", fontsize=12)
             ax2.set_ylabel("Frequency", fontsize=12)
             ax2.grid(True, alpha=0.3)
             st.pyplot(fig2)
         
         with col2:
             fig3, ax3 = plt.subplots(figsize=(8, 5))
-            ax3.boxplot(current_data, vert=False, patch_artist=True,
+            ax3.boxplot(finite_data, vert=False, patch_artist=True,
                     boxprops=dict(facecolor='#1f77b4', alpha=0.7),
                     medianprops=dict(color='red', linewidth=2))
             
             ax3.set_title("Statistical Distribution", fontsize=14)
-            ax3.set_xlabel(f"{selected_var_name} (units)", fontsize=12)
+            ax3.set_xlabel(f"{selected_var_name} ({series_units})", fontsize=12)
             st.pyplot(fig3)
 
         with tab3:
             st.header("🌡 Tephigram")
             try:
 
-                # Load WRF output
-                ds = xr_ds
-
-                # Define Nairobi grid point (adjust as needed)
-                i, j = 40, 38
-
-                # Extract base + perturbation pressure and temperature
-                P = ds['P'] + ds['PB']                         # Total pressure [Pa]
-                T = (ds['T'] + 300)                            # Potential temperature [K]
-                QV = ds['QVAPOR']                              # Water vapor mixing ratio [kg/kg]
-
-                # Get two time indices (hardcoded for now; can be improved later)
-                t1, t2 = 0, 8  # 2024-05-20_06:00:00 and 2024-05-21_06:00:00
-
-                def get_profile(time_idx):
-                    pressure = P[time_idx, :, j, i].values / 100  # Convert to hPa
-                    theta = T[time_idx, :, j, i].values
-                    qv = QV[time_idx, :, j, i].values
-
-                    temp = theta / ((1000 / pressure) ** 0.286)  # Actual temperature
-
-                    # Calculate dewpoint from vapor pressure
-                    e = (qv * pressure) / (0.622 + qv)
-                    dewpoint = (243.5 * np.log(e / 6.112)) / (17.67 - np.log(e / 6.112))
-                    return pressure, temp, dewpoint
-
-                # Extract both profiles
-                p1, t1_vals, td1_vals = get_profile(t1)
-                p2, t2_vals, td2_vals = get_profile(t2)
-
-                # Zip into tephi format
-                temp_zip_1 = zip(p1, t1_vals)
-                dewpoint_zip_1 = zip(p1, td1_vals)
-                temp_zip_2 = zip(p2, t2_vals)
-                dewpoint_zip_2 = zip(p2, td2_vals)
-
-                # Customize tephigram
-                tephi.MIXING_RATIO_LINE.update({'color': 'purple', 'linewidth': 1, 'linestyle': '--'})
-                tpg = tephi.Tephigram(anchor=[(850, 30), (100, -100)])
-
-                # Plot 1st radiosonde (dashed)
-                tpg.plot(temp_zip_1, linestyle='--', color='red')
-                tpg.plot(dewpoint_zip_1, linestyle='--', color='blue')
-
-                # Plot 2nd radiosonde (solid)
-                tpg.plot(temp_zip_2, linestyle='-', color='red')
-                tpg.plot(dewpoint_zip_2, linestyle='-', color='blue')
-
-                # Add title
-                plt.suptitle('Nairobi Tephigram:\n2024-05-20_06:00 (Dashed) vs 2024-05-21_06:00 (Solid)', fontsize=14)
-
-                # Show in Streamlit
-                st.pyplot(plt)
+                # Station and the two sounding times to compare
+                scol1, scol2, scol3 = st.columns(3)
+                with scol1:
+                    station = st.selectbox("📍 Station", list(STATIONS), index=list(STATIONS).index('Nairobi'))
+                with scol2:
+                    sounding_str1 = st.selectbox("Dashed profile", time_strs, index=0)
+                with scol3:
+                    sounding_str2 = st.selectbox("Solid profile", time_strs, index=min(8, len(time_strs) - 1))
+
+                def get_profile(time_str):
+                    # Reads only the station column at that time
+                    with catalog.locate(time_axis[time_strs.index(time_str)]) as (step_nc, step_idx):
+                        pressure, temp, dewpoint = extract_profiles(as_xarray(step_nc), [station], [step_idx])
+                    return pressure[0, 0], temp[0, 0], dewpoint[0, 0]
+
+                # Tabs all run on every rerun, so only draw (and load tephi) on request
+                if st.toggle("Draw tephigram", value=False):
+                    fig_tephi = draw_tephigram(station, get_profile(sounding_str1), get_profile(sounding_str2),
+                                               sounding_str1, sounding_str2)
+                    st.pyplot(fig_tephi)
 
             except Exception as e:
                 st.error(f"Tephigram generation failed: {str(e)}")
 
+        with tab4:
+            st.header("🏘 Sub-county Means")
+            counties, subcounties = load_boundaries()
+            if region == "Whole Domain" or subcounties is None:
+                st.info("Select a county in the control panel to break it down by sub-county.")
+            else:
+                try:
+                    with catalog.locate(step) as (step_nc, step_idx):
+                        field = plot_field(step_nc, selected_var_name, step_idx, pressure_level)
+                        lats, lons = get_latlon(step_nc, step_idx)
+                    county_stats, _ = summarize_over_county(counties, subcounties, region, field, lats, lons)
+                    if county_stats is None:
+                        st.warning(f"{region} is outside the model domain.")
+                    else:
+                        st.caption(f"{selected_time_str}: mean over each sub-county, weighted by the area of every grid cell inside it")
+                        st.dataframe(county_stats['subcounties'].rename(f"{selected_var_name} ({series_units})"))
+                except Exception as e:
+                    st.error(f"Sub-county summary failed: {str(e)}")
+
     # --------------------------
     # Statistical Analysis
     # --------------------------
     st.header("🧮 STATISTICAL ANALYSIS")
     
     stats_metrics = [
-        ("📉 Minimum", np.min(current_data), "Lowest observed value"),
-        ("📈 Maximum", np.max(current_data), "Highest observed value"),
-        ("📊 Mean", np.mean(current_data), "Average value"),
-        ("📐 Std Dev", np.std(current_data), "Measure of variability"),
+        ("📉 Minimum", np.nanmin(series['min']), "Lowest observed value"),
+        ("📈 Maximum", np.nanmax(series['max']), "Highest observed value"),
+        ("📊 Mean", np.nanmean(current_data), "Average value"),
+        ("📐 Std Dev", np.nanstd(current_data), "Measure of variability"),
     ]
     
     cols = st.columns(4)
@@ -299,4 +320,6 @@ st.markdown("""
 <div style="text-align: center; margin-top: 40px; color: #666666; font-size: 12px;">
     Weather Analytics Dashboard • Powered by WRF Model
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+render_trace_panel()
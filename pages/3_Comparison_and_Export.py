@@ -2,37 +2,46 @@ import streamlit as st
 import pandas as pd
 import io
 from dateutil.parser import parse
-from config import CMAP_OPTIONS,CMAP_OPTIONS, R2_PUBLIC_URL
-from data_loader import load_wrf_data_from_r2, get_available_variables
-from wrf import getvar, ALL_TIMES
-from plot_utils import create_plot, save_figure, summarize_over_county
+from config import CMAP_OPTIONS,CMAP_OPTIONS, R2_PUBLIC_URL, IMAGE_FORMAT, STATIONS
+from data_loader import load_catalog, as_xarray
+from plot_utils import summarize_over_county
+from comparison import render_comparison
+from prefetch import prefetch_neighbours
+from animation_export import FORMATS, export_animation
+from meteogram import extract_point_forecasts, read_station_list
+from tracing import begin_page, render_trace_panel
 import numpy as np
 
 
 # == App Title ==
 st.title("🆚 Forecast Comparison Mode")
+begin_page("Comparison and Export")
 
-# ==Load NetCDF4 Data ==
-nc , xr_ds = load_wrf_data_from_r2()
+# ==Load the wrfout catalog ==
+catalog = load_catalog()
+runs = catalog.runs()
+run = st.sidebar.selectbox("Model Run", runs) if len(runs) > 1 else runs[0]
+domains = catalog.domains(run)
+domain = st.sidebar.selectbox("Domain", domains) if len(domains) > 1 else domains[0]
+time_axis = catalog.time_axis(run, domain)
 
-if nc:
+if time_axis:
     # == Load Available Varibles ==
-    available_vars, pressure_levels = get_available_variables(nc)
+    available_vars, pressure_levels = catalog.available_variables(time_axis[0].location)
     var_names = [v[0] for v in available_vars]
     selected_var_name = st.selectbox("Select Variable", var_names)
     var_type = next(v[1] for v in available_vars if v[0] == selected_var_name)
 
     # ==Load the time steps ==
-    times = getvar(nc, 'times', timeidx=ALL_TIMES)
-    time_strs = [parse(str(t)).strftime("%Y-%m-%d %H:%M") for t in times.values]
+    time_strs = [step.valid_time.strftime("%Y-%m-%d %H:%M") for step in time_axis]
 
     col1, col2 = st.columns(2)
     with col1:
       selected_time_str1 = st.selectbox("Select Time Step 1", time_strs, key="time1")
-      time_idx1 = time_strs.index(selected_time_str1)
+      step1 = time_axis[time_strs.index(selected_time_str1)]
     with col2:
         selected_time_str2 = st.selectbox("Select Time Step 2", time_strs, key="time2")
-        time_idx2 = time_strs.index(selected_time_str2)
+        step2 = time_axis[time_strs.index(selected_time_str2)]
 
     # == Load pressure level if needed ==    
     pressure_level = None
@@ -45,33 +54,104 @@ if nc:
     selected_cmap = st.selectbox("🎨 Select Colormap", cmap_options)
 
     # === Plotting ===
+    with catalog.locate(step1) as (nc1, time_idx1), catalog.locate(step2) as (nc2, time_idx2):
+        image1, image2, image_diff = render_comparison(
+            nc1, time_idx1, nc2, time_idx2, selected_var_name, selected_cmap, pressure_level,
+            title=f"{selected_var_name} change: {selected_time_str2} minus {selected_time_str1}"
+        )
+    prefetch_neighbours(catalog, time_axis, [time_strs.index(selected_time_str1), time_strs.index(selected_time_str2)],
+                        selected_var_name, pressure_level, pressure_levels if pressure_level else ())
     col3, col4 = st.columns(2)
     with col3:
-        fig1, field1 = create_plot(nc, selected_var_name, time_idx1, selected_cmap, pressure_level)
-        if fig1:
-            st.pyplot(fig1)
+        if image1:
+            st.image(image1)
             st.caption(f"🕐 Time Step 1:{selected_time_str1}")
 
     with col4:
-            fig2, field2 = create_plot(nc, selected_var_name, time_idx2, selected_cmap, pressure_level)
-            if fig2:
-                st.pyplot(fig2)
+            if image2:
+                st.image(image2)
                 st.caption(f"🕐 Time Step 2:{selected_time_str2}")
 
-    if fig1 and fig2:
-        selected_plot = st.selectbox("🖼️ Choose Plot to Download", ["Time Step 1", "Time Step 2"])
+    if image_diff:
+        st.image(image_diff)
+        st.caption(f"➖ Difference: Time Step 2 − Time Step 1 ({selected_time_str2} minus {selected_time_str1})")
+
+    if image1 and image2:
+        plot_choices = ["Time Step 1", "Time Step 2"] + (["Difference"] if image_diff else [])
+        selected_plot = st.selectbox("🖼️ Choose Plot to Download", plot_choices)
         
         if selected_plot =="Time Step 1":
-            buf = save_figure(fig1)
+            buf = image1
             clean_time = parse(selected_time_str1).strftime("%Y%m%d_%H%M")
-        else:
-            buf = save_figure(fig2)
+        elif selected_plot == "Time Step 2":
+            buf = image2
             clean_time = parse(selected_time_str2).strftime("%Y%m%d_%H%M")   
-        filename = f"{selected_var_name.replace(' ', '_')}_{clean_time}.png"
+        else:
+            buf = image_diff
+            clean_time = (parse(selected_time_str2).strftime("%Y%m%d_%H%M") + "_minus_"
+                          + parse(selected_time_str1).strftime("%Y%m%d_%H%M"))
+        filename = f"{selected_var_name.replace(' ', '_')}_{clean_time}.{IMAGE_FORMAT}"
 
         st.download_button(
             label=f"⬇️ Download {selected_plot} Plot",
             data=buf,
             file_name=filename,
-            mime="image/png"
+            mime=f"image/{IMAGE_FORMAT}"
         )
+
+    # === Animation Export ===
+    st.subheader("🎞️ Animate Across All Time Steps")
+    anim_format = st.selectbox("Animation Format", list(FORMATS), key="anim_format")
+    anim_fps = st.slider("Frames per Second", 1, 10, 2, key="anim_fps")
+    if st.button("🎬 Render Animation"):
+        frames = [(step.location, step.time_idx, time_str) for step, time_str in zip(time_axis, time_strs)]
+        with st.spinner(f"Rendering {len(frames)} frames..."):
+            try:
+                anim_bytes, anim_mime = export_animation(
+                    frames, selected_var_name, selected_cmap, pressure_level, anim_format, anim_fps
+                )
+            except Exception as e:
+                st.error(f"Animation export failed: {e}")
+                anim_bytes = None
+        if anim_bytes:
+            extension = 'png' if anim_format == 'apng' else anim_format
+            level_tag = f"_{pressure_level}hPa" if pressure_level else ""
+            st.download_button(
+                label=f"⬇️ Download {anim_format.upper()} Animation",
+                data=anim_bytes,
+                file_name=f"{selected_var_name.replace(' ', '_')}{level_tag}_animation.{extension}",
+                mime=anim_mime
+            )
+
+    # === Station Point Forecasts ===
+    st.subheader("📍 Station Point Forecasts")
+    station_file = st.file_uploader("Station list (CSV with name, lat, lon)", type="csv")
+    if station_file is not None:
+        stations = read_station_list(station_file)
+    else:
+        station_names = st.multiselect("Stations", list(STATIONS), default=list(STATIONS))
+        stations = [(name, *STATIONS[name]) for name in station_names]
+    point_method = st.radio("Point Method", ["nearest", "bilinear"], horizontal=True)
+    if stations and st.button("📋 Extract Point Forecasts"):
+        with st.spinner(f"Extracting {len(stations)} stations over {len(time_axis)} time steps..."):
+            points = extract_point_forecasts(time_axis, catalog.open, as_xarray, stations, point_method)
+        st.dataframe(points, use_container_width=True)
+        st.download_button(
+            label="⬇️ Download CSV",
+            data=points.to_csv(index=False).encode(),
+            file_name=f"point_forecasts_{run}_{domain}.csv",
+            mime="text/csv"
+        )
+        try:
+            parquet = points.to_parquet(index=False)
+        except ImportError:
+            parquet = None  # pyarrow/fastparquet not installed
+        if parquet is not None:
+            st.download_button(
+                label="⬇️ Download Parquet",
+                data=parquet,
+                file_name=f"point_forecasts_{run}_{domain}.parquet",
+                mime="application/octet-stream"
+            )
+
+render_trace_panel()
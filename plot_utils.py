@@ -1,32 +1,165 @@
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import geopandas as gpd
-from wrf import getvar, latlon_coords, to_np
-from cartopy.io.shapereader import Reader
-from cartopy.feature import ShapelyFeature
 import streamlit as st
-from config import COUNTY_SHAPEFILE_PATH
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config import (
+    COUNTY_SHAPEFILE_PATH,
+    IMAGE_FORMAT,
+    PREVIEW_BASEMAP_SCALE,
+    PREVIEW_DPI,
+    PREVIEW_MAX_CELLS,
+    PREVIEW_POLL_INTERVAL,
+    PREVIEW_RENDER_WORKERS,
+    PREVIEW_SIMPLIFY
+)
+from image_cache import get_image_cache
+from product_store import product_key
+from tracing import span, traced, traced_submit
+from lazy_imports import lazy_module
+from zonal import county_label_grid, subcounty_means, zonal_stats
+from rainfall import get_interval_rainfall, parse_window
 from data_loader import (
     get_rainfall,
     get_temperature,
     get_humidity,
     get_pressure,
-    get_wind_speed
+    get_wind_speed,
+    get_latlon
 )
 
-def create_plot(nc, var_type, time_idx=0, cmap='viridis', pressure_level=None):
-    fig = plt.figure(figsize=(12, 8), dpi=150)
-    ax = plt.axes(projection=ccrs.PlateCarree())
-    ax.set_extent([33.5, 42.0, -5.0, 5.5], crs=ccrs.PlateCarree())
+# Plotting stack, loaded on the first render rather than on every page import
+mfigure = lazy_module('matplotlib.figure')
+backend_agg = lazy_module('matplotlib.backends.backend_agg')
+ccrs = lazy_module('cartopy.crs')
+cfeature = lazy_module('cartopy.feature')
+shapereader = lazy_module('cartopy.io.shapereader')
+gpd = lazy_module('geopandas')
+wrf = lazy_module('wrf')
+
+MAP_EXTENT = (33.5, 42.0, -5.0, 5.5)
+FIGSIZE = (12, 8)
+DPI = 150
+# Bump when the look of create_plot changes so cached images are not reused
+RENDER_STYLE_VERSION = 1
+
+_BASEMAP_LOCK = threading.Lock()
+
+
+def get_basemap_layers(extent=MAP_EXTENT, figsize=FIGSIZE, dpi=DPI, scale='10m', simplify=0.0):
+    """
+    Rasterize the static map layers once per (extent, size, dpi, scale).
+    `scale` picks the Natural Earth resolution and `simplify` (degrees)
+    simplifies the county outlines, for the cheaper preview basemap.
+    Returns (underlay, overlay, county_error): RGBA arrays for the land/ocean
+    fills drawn beneath the data and the coastline/border/county lines drawn
+    above it, plus the error message if the county shapefile failed to load.
+    """
+    # Held through the first computation: render and comparison threads may
+    # ask for the same basemap at once, and it should be rasterized only once
+    with _BASEMAP_LOCK:
+        return _basemap_layers(extent, figsize, dpi, scale, simplify)
+
+
+@functools.lru_cache(maxsize=8)
+def _basemap_layers(extent, figsize, dpi, scale, simplify):
+    lon0, lon1, lat0, lat1 = extent
+    height = figsize[1]
+    size = (height * (lon1 - lon0) / (lat1 - lat0), height)
+
+    def render(add_layers):
+        fig = mfigure.Figure(figsize=size, dpi=dpi)
+        canvas = backend_agg.FigureCanvasAgg(fig)
+        fig.patch.set_alpha(0)
+        ax = fig.add_axes([0, 0, 1, 1], projection=ccrs.PlateCarree())
+        ax.set_extent(extent, crs=ccrs.PlateCarree())
+        ax.set_axis_off()
+        ax.patch.set_alpha(0)
+        add_layers(ax)
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba()).copy()
+
+    def fills(ax):
+        ax.add_feature(cfeature.OCEAN.with_scale(scale), facecolor='lightblue')
+        ax.add_feature(cfeature.LAKES.with_scale(scale), facecolor='lightblue', edgecolor='blue')
+        ax.add_feature(cfeature.LAND.with_scale(scale), facecolor='#e0dccd')  # light beige land
+
+    county_error = []
+    def lines(ax):
+        ax.add_feature(cfeature.COASTLINE.with_scale(scale))
+        ax.add_feature(cfeature.BORDERS.with_scale(scale), linestyle=':', edgecolor='gray')
+        # === County Boundaries ===
+        try:
+            geometries = shapereader.Reader(COUNTY_SHAPEFILE_PATH).geometries()
+            if simplify:
+                geometries = [g.simplify(simplify, preserve_topology=True) for g in geometries]
+            counties = cfeature.ShapelyFeature(geometries, ccrs.PlateCarree(), edgecolor='black', facecolor='none')
+            ax.add_feature(counties, linewidth=0.8)
+        except Exception as e:
+            county_error.append(str(e))
+
+    underlay = render(fills)
+    overlay = render(lines)
+    return underlay, overlay, county_error[0] if county_error else None
+
+
+def rainfall_field(nc, time_idx, var_type):
+    """Run-total rainfall for 'Rainfall', the window total for e.g. 'Rainfall (3h)'."""
+    hours = parse_window(var_type)
+    return get_interval_rainfall(nc, time_idx, hours) if hours else get_rainfall(nc, time_idx)
+
+
+def plot_field(nc, var_type, time_idx=0, pressure_level=None):
+    """The plotted field of `var_type` as a float array (wind: the speed)."""
+    if 'Wind Speed' in var_type:
+        field = get_wind_speed(nc, time_idx, pressure_level if '10m' not in var_type else None)[0]
+    elif 'Temperature' in var_type:
+        field = get_temperature(nc, time_idx, level=pressure_level)
+    elif var_type.startswith('Rainfall'):
+        field = rainfall_field(nc, time_idx, var_type)
+    else:
+        field = get_humidity(nc, time_idx, level=pressure_level)
+    return None if field is None else np.asarray(field, dtype=np.float64)
+
+
+def field_units(var_type, pressure_level=None):
+    if 'Wind Speed' in var_type:
+        return 'm/s'
+    if 'Temperature' in var_type:
+        return '°C'
+    if var_type.startswith('Rainfall'):
+        return 'mm'
+    return '% RH' if pressure_level else 'g/kg'
+
+
+def _map_axes(fig, **basemap):
+    # Figures (basemap included) are built without pyplot so panels can render on worker threads
+    ax = fig.add_subplot(projection=ccrs.PlateCarree())
+    underlay, overlay, county_error = get_basemap_layers(**basemap)
+    ax.imshow(underlay, origin='upper', extent=MAP_EXTENT, transform=ccrs.PlateCarree(), zorder=0)
+    ax.set_extent(MAP_EXTENT, crs=ccrs.PlateCarree())
+    return ax, overlay, county_error
+
+
+def _finish_map(ax, overlay):
+    ax.imshow(overlay, origin='upper', extent=MAP_EXTENT, transform=ccrs.PlateCarree(), zorder=3)
+    ax.set_extent(MAP_EXTENT, crs=ccrs.PlateCarree())
+    ax.gridlines(draw_labels=True)
+
+
+@traced()
+def create_plot(nc, var_type, time_idx=0, cmap='viridis', pressure_level=None, contour_levels=None):
+    fig = mfigure.Figure(figsize=FIGSIZE, dpi=DPI)
 
     try:
-        # === Get Lat/Lon T & T2 as reference ===
-        if '2m' in var_type or '10m' in var_type:
-            lats, lons = latlon_coords(getvar(nc, "T2", timeidx=time_idx))
-        else:
-            lats, lons = latlon_coords(getvar(nc, "T", timeidx=time_idx))
+        # === Cached static layers ===
+        with span('basemap underlay'):
+            ax, overlay, county_error = _map_axes(fig)
+
+        # === Mass-grid Lat/Lon, cached per time ===
+        with span('coordinates'):
+            lats, lons = get_latlon(nc, time_idx)
 
         current_data = None
         label = None
@@ -40,63 +173,54 @@ def create_plot(nc, var_type, time_idx=0, cmap='viridis', pressure_level=None):
                 except Exception:
                     st.error("Invalid pressure level format in variable name. ")  
 
-            u, v, Wind_Speed = get_wind_speed(nc, time_idx, level=pressure_level if '10m' not in var_type else None)   
+            Wind_Speed, u, v = get_wind_speed(nc, time_idx, level=pressure_level if '10m' not in var_type else None)   
 
             subset = 10
-            ax.barbs(to_np(lons[::subset, ::subset]), to_np(lats[::subset, ::subset]),
-                    to_np(u[::subset, ::subset]), to_np(v[::subset, ::subset]),
-                    length=6, color='black', linewidth=0.5,
-                    transform=ccrs.PlateCarree()
-                    ) 
-            
-            # --- DRAW BACKGROUND FEATURES ---
-            ax.add_feature(cfeature.OCEAN.with_scale('10m'), facecolor='lightblue')
-            ax.add_feature(cfeature.LAKES.with_scale('10m'), facecolor='lightblue', edgecolor='blue')
-            ax.add_feature(cfeature.LAND.with_scale('10m'), facecolor='#e0dccd')  # light beige land
+            with span('barbs'):
+                ax.barbs(wrf.to_np(lons[::subset, ::subset]), wrf.to_np(lats[::subset, ::subset]),
+                        wrf.to_np(u[::subset, ::subset]), wrf.to_np(v[::subset, ::subset]),
+                        length=6, color='black', linewidth=0.5,
+                        transform=ccrs.PlateCarree()
+                        ) 
             current_data = Wind_Speed
 
         # === TEMPERATURE ===
         elif 'Temperature' in var_type:               
             temp = get_temperature(nc, time_idx, level=pressure_level)
-            levels = np.linspace(np.min(temp), np.max(temp), 20)
-            contour = ax.contourf(lons, lats, temp, levels=levels, cmap=cmap, transform=ccrs.PlateCarree())
-            plt.colorbar(contour, ax=ax, label=f'Temperature (°C) at {pressure_level} hPa' if pressure_level else 'Temperature (°C)')
+            levels = contour_levels if contour_levels is not None else np.linspace(np.min(temp), np.max(temp), 20)
+            with span('contourf'):
+                contour = ax.contourf(lons, lats, temp, levels=levels, cmap=cmap, transform=ccrs.PlateCarree())
+            fig.colorbar(contour, ax=ax, label=f'Temperature (°C) at {pressure_level} hPa' if pressure_level else 'Temperature (°C)')
             current_data = temp
 
-        elif var_type == 'Rainfall':
-            rain = get_rainfall(nc, time_idx)
-            levels = np.linspace(0, 50, 11)
-            contour = ax.contourf(lons, lats, rain, levels=levels, cmap=cmap, transform=ccrs.PlateCarree(), extend='max')
-            plt.colorbar(contour, ax=ax, label='Rainfall (mm)')
+        elif var_type.startswith('Rainfall'):
+            rain = rainfall_field(nc, time_idx, var_type)
+            levels = contour_levels if contour_levels is not None else np.linspace(0, 50, 11)
+            with span('contourf'):
+                contour = ax.contourf(lons, lats, rain, levels=levels, cmap=cmap, transform=ccrs.PlateCarree(), extend='max')
+            fig.colorbar(contour, ax=ax, label='Rainfall (mm)')
             current_data = rain
 
         elif  'Humidity' in var_type:
             rh = get_humidity(nc, time_idx, level=pressure_level)
-            levels = np.linspace(np.nanmin(rh), 20)
-            contour = ax.contourf(lons, lats, rh, levels=levels, cmap=cmap, transform=ccrs.PlateCarree())
+            levels = contour_levels if contour_levels is not None else np.linspace(np.nanmin(rh), 20)
+            with span('contourf'):
+                contour = ax.contourf(lons, lats, rh, levels=levels, cmap=cmap, transform=ccrs.PlateCarree())
             cb_label = f"Humidity (% RH) at {pressure_level} hpa" if pressure_level else "Specific Humidity (g/kg)"
-            plt.colorbar(contour, ax=ax, label=cb_label)
+            fig.colorbar(contour, ax=ax, label=cb_label)
 
             current_data = rh
         
-        # === Background Features ===
-        ax.add_feature(cfeature.OCEAN.with_scale('10m'), facecolor='lightblue')
-        ax.add_feature(cfeature.LAKES.with_scale('10m'), facecolor='lightblue', edgecolor='blue')
-        ax.add_feature(cfeature.LAND.with_scale('10m'), facecolor='#e0dccd')
-        ax.add_feature(cfeature.COASTLINE.with_scale('10m'))
-        ax.add_feature(cfeature.BORDERS.with_scale('10m'), linestyle=':', edgecolor='gray')
-        ax.gridlines(draw_labels=True)
-
-        # === County Boundaries ===
-        try:
-            counties = ShapelyFeature(Reader(COUNTY_SHAPEFILE_PATH).geometries(), ccrs.PlateCarree(), edgecolor='black', facecolor='none')
-            ax.add_feature(counties, linewidth=0.8)
-        except Exception as e:
-            st.warning(f"Could not load counties: {e}")
+        # === Boundary lines above the data ===
+        with span('overlay and gridlines'):
+            _finish_map(ax, overlay)
+        if county_error:
+            st.warning(f"Could not load counties: {county_error}")
 
         title = f"{var_type} at {pressure_level} hPa" if pressure_level else var_type
         ax.set_title(title, fontsize=16)
-        plt.tight_layout()
+        with span('tight_layout'):
+            fig.tight_layout()
         return fig, current_data
 
     except Exception as e:
@@ -104,42 +228,247 @@ def create_plot(nc, var_type, time_idx=0, cmap='viridis', pressure_level=None):
         return None, None
 
 
+def colour_range(var_type, field):
+    """(vmin, vmax) spanned by create_plot's default colour levels."""
+    if var_type.startswith('Rainfall'):
+        return 0.0, 50.0
+    if 'Humidity' in var_type:
+        return float(np.nanmin(field)), 20.0
+    return float(np.nanmin(field)), float(np.nanmax(field))
+
+
+@traced()
+def create_preview_plot(nc, var_type, time_idx=0, cmap='viridis', pressure_level=None):
+    """
+    Low level-of-detail version of create_plot: the field coarsened to at
+    most PREVIEW_MAX_CELLS per side and drawn as a pcolormesh raster at
+    PREVIEW_DPI over a basemap with simplified boundaries. Wind keeps its
+    barbs, only sparser. Returns the Figure, or None on failure.
+    """
+    fig = mfigure.Figure(figsize=FIGSIZE, dpi=PREVIEW_DPI)
+    try:
+        ax, overlay, _ = _map_axes(fig, dpi=PREVIEW_DPI, scale=PREVIEW_BASEMAP_SCALE, simplify=PREVIEW_SIMPLIFY)
+        lats, lons = get_latlon(nc, time_idx)
+        step = max(1, int(np.ceil(max(lats.shape) / PREVIEW_MAX_CELLS)))
+
+        if 'Wind Speed' in var_type:
+            level = pressure_level if '10m' not in var_type else None
+            _, u, v = get_wind_speed(nc, time_idx, level=level)
+            subset = 20
+            ax.barbs(lons[::subset, ::subset], lats[::subset, ::subset],
+                     wrf.to_np(u[::subset, ::subset]), wrf.to_np(v[::subset, ::subset]),
+                     length=6, color='black', linewidth=0.5, transform=ccrs.PlateCarree())
+        else:
+            field = plot_field(nc, var_type, time_idx, pressure_level)
+            vmin, vmax = colour_range(var_type, field)
+            with span('pcolormesh'):
+                mesh = ax.pcolormesh(lons[::step, ::step], lats[::step, ::step], field[::step, ::step],
+                                     cmap=cmap, vmin=vmin, vmax=vmax, shading='auto',
+                                     transform=ccrs.PlateCarree())
+            fig.colorbar(mesh, ax=ax, label=field_units(var_type, pressure_level))
+
+        _finish_map(ax, overlay)
+        title = f"{var_type} at {pressure_level} hPa" if pressure_level else var_type
+        ax.set_title(f"{title} (preview)", fontsize=16)
+        fig.tight_layout()
+        return fig
+    except Exception:
+        return None
+
+
+@traced()
+def create_difference_plot(lats, lons, diff, var_type, pressure_level=None, title=None, cmap='RdBu_r'):
+    """
+    Map of a field difference on a diverging scale symmetric about zero, so
+    equal increases and decreases get equally strong colours.
+    """
+    fig = mfigure.Figure(figsize=FIGSIZE, dpi=DPI)
+    ax, overlay, _ = _map_axes(fig)
+
+    limit = float(np.nanmax(np.abs(diff))) if np.isfinite(diff).any() else 0.0
+    limit = limit or 1.0  # identical fields: keep a valid, centred scale
+    levels = np.linspace(-limit, limit, 21)
+    with span('contourf'):
+        contour = ax.contourf(lons, lats, diff, levels=levels, cmap=cmap, transform=ccrs.PlateCarree())
+    fig.colorbar(contour, ax=ax, label=f"Difference ({field_units(var_type, pressure_level)})")
+
+    _finish_map(ax, overlay)
+    base = f"{var_type} at {pressure_level} hPa" if pressure_level else var_type
+    ax.set_title(title or f"{base} difference", fontsize=16)
+    fig.tight_layout()
+    return fig
+
+
 def summarize_over_county(gdf, sub_gdf, county_name, data, lats, lons):
-    import pandas as pd
-    from shapely.geometry import Point
-
-    flat_points = []
-    for i in range(lats.shape[0]):
-        for j in range(lats.shape[1]):
-            flat_points.append({
-                'lat': float(lats[i, j]),
-                'lon': float(lons[i, j]),
-                'value': float(data[i, j])
-            })
-    df = pd.DataFrame(flat_points)
-    geometry = gpd.points_from_xy(df['lon'], df['lat'])
-    df_gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
-
-    target_county = gdf[gdf['NAME_1'].str.lower() == county_name.lower()]
-    if target_county.empty:
+    """
+    (stats, county points) of `data` over one county: mean/min/max of the
+    cells whose centres fall inside it and, when `sub_gdf` is given, the
+    area-weighted mean of each of its sub-counties under 'subcounties'.
+    """
+    matches = np.flatnonzero(gdf['NAME_1'].str.lower().to_numpy() == county_name.lower())
+    if not len(matches):
         return None, None
 
-    county_points = df_gdf[df_gdf.within(target_county.geometry.values[0])]
-    if county_points.empty:
+    labels = county_label_grid(gdf, wrf.to_np(lats), wrf.to_np(lons))
+    in_county = labels == matches[0]
+    if not in_county.any():
         return None, None
 
+    values = np.asarray(wrf.to_np(data), dtype=np.float64)
+    stats = zonal_stats(np.where(in_county, 0, -1), values, 1)
     stats = {
-        'mean': round(county_points['value'].mean(), 2),
-        'min': round(county_points['value'].min(), 2),
-        'max': round(county_points['value'].max(), 2)
+        'mean': round(stats['mean'][0], 2),
+        'min': round(stats['min'][0], 2),
+        'max': round(stats['max'][0], 2)
     }
+    if sub_gdf is not None:
+        # Sub-counties span few cells, so weight by exact overlap instead of cell centres
+        stats['subcounties'] = subcounty_means(sub_gdf, county_name, values, wrf.to_np(lats), wrf.to_np(lons)).round(2)
+
+    lat_vals = np.asarray(wrf.to_np(lats), dtype=np.float64)[in_county]
+    lon_vals = np.asarray(wrf.to_np(lons), dtype=np.float64)[in_county]
+    county_points = gpd.GeoDataFrame(
+        {'lat': lat_vals, 'lon': lon_vals, 'value': values[in_county]},
+        geometry=gpd.points_from_xy(lon_vals, lat_vals), crs="EPSG:4326"
+    )
 
     return stats, county_points
 
 
-def save_figure(fig):
+@traced()
+def save_figure(fig, fmt='png', dpi=DPI):
     from io import BytesIO
     buf = BytesIO()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight')
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
     buf.seek(0)
     return buf
+
+
+@traced()
+def render_plot_image(nc, var_type, time_idx=0, cmap='viridis', pressure_level=None):
+    """
+    Encoded image bytes for a plot, served from the shared image cache when
+    any session has already rendered the same combination.
+    Returns None if the plot could not be created.
+    """
+    key = _image_key(nc, var_type, time_idx, cmap, pressure_level)
+
+    def render():
+        fig, _ = create_plot(nc, var_type, time_idx, cmap, pressure_level)
+        if fig is None:
+            return None
+        return save_figure(fig, IMAGE_FORMAT).getvalue()
+
+    return get_image_cache().get_or_render(key, render)
+
+
+def _image_key(nc, var_type, time_idx, cmap, pressure_level, dpi=DPI):
+    return (product_key(nc), var_type, int(time_idx), pressure_level, cmap,
+            MAP_EXTENT, FIGSIZE, dpi, IMAGE_FORMAT, RENDER_STYLE_VERSION)
+
+
+@traced()
+def render_preview_image(nc, var_type, time_idx=0, cmap='viridis', pressure_level=None):
+    """Encoded bytes of create_preview_plot, cached like the full images."""
+    key = _image_key(nc, var_type, time_idx, cmap, pressure_level, dpi=PREVIEW_DPI) + ('preview',)
+
+    def render():
+        fig = create_preview_plot(nc, var_type, time_idx, cmap, pressure_level)
+        return None if fig is None else save_figure(fig, IMAGE_FORMAT, PREVIEW_DPI).getvalue()
+
+    return get_image_cache().get_or_render(key, render)
+
+
+_RENDER_EXECUTOR = None
+_RENDER_LOCK = threading.Lock()
+_FULL_RENDER = '_full_render'  # session_state key of the session's pending full render
+
+
+class _FullRender:
+    def __init__(self, key, future):
+        self.key = key
+        self.future = future
+
+    def result(self):
+        """Image bytes of a finished render, None if it failed or was cancelled."""
+        try:
+            return self.future.result()
+        except Exception:  # includes CancelledError
+            return None
+
+
+def _render_executor():
+    global _RENDER_EXECUTOR
+    with _RENDER_LOCK:
+        if _RENDER_EXECUTOR is None:
+            _RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=PREVIEW_RENDER_WORKERS, thread_name_prefix='full-render')
+        return _RENDER_EXECUTOR
+
+
+def _render_in_background(ctx, locate, step, var_type, cmap, pressure_level):
+    add_script_run_ctx(threading.current_thread(), ctx)
+    # Its own checkout: the page releases its dataset as soon as the preview is up
+    with locate(step) as (nc, time_idx):
+        return render_plot_image(nc, var_type, time_idx, cmap, pressure_level)
+
+
+@st.fragment(run_every=PREVIEW_POLL_INTERVAL)
+def _show_until_rendered(key, preview):
+    # Reruns on its own until the full render is done, then reruns the page,
+    # which finds the image in the cache
+    job = st.session_state.get(_FULL_RENDER)
+    if job is not None and job.key == key and job.future.done():
+        st.rerun()
+    if preview:
+        st.image(preview, caption="Preview - rendering full quality...")
+    else:
+        st.info("Rendering full quality...")
+
+
+def render_plot_progressive(locate, step, var_type, cmap='viridis', pressure_level=None):
+    """
+    Show a plot as fast as possible: a cached full-quality image straight
+    away, otherwise the preview, while the full render runs on a background
+    thread and the page reruns to swap it in when it is ready. Nothing waits
+    for the full render, and a new selection cancels the session's previous
+    one if it has not started. `locate` is a context manager such as
+    Catalog.locate turning `step` into (dataset, time index).
+    Returns the image bytes shown (the preview while rendering), True while
+    only a placeholder is shown, or None if the full render failed.
+    """
+    preview = None
+    with locate(step) as (nc, time_idx):
+        key = _image_key(nc, var_type, time_idx, cmap, pressure_level)
+        job = st.session_state.get(_FULL_RENDER)
+        if job is not None and job.key != key:
+            job.future.cancel()  # the selection changed: drop it if it has not started
+            job = st.session_state[_FULL_RENDER] = None
+        image = get_image_cache().get(key)
+        if image is None and job is not None and job.future.done():
+            image = job.result()  # finished but not in the cache: failed, or already evicted
+            if image is None:
+                return None
+        elif image is None:
+            # Fills the field and coordinate caches, so the full render never reads the file
+            preview = render_preview_image(nc, var_type, time_idx, cmap, pressure_level)
+            if job is None:
+                future = traced_submit(_render_executor(), _render_in_background, get_script_run_ctx(),
+                                       locate, step, var_type, cmap, pressure_level)
+                job = st.session_state[_FULL_RENDER] = _FullRender(key, future)
+    if image:
+        st.image(image)
+        return image
+    _show_until_rendered(key, preview)
+    return preview or True  # no preview (it failed): a placeholder until the full render lands
+
+
+def warm_up_images(nc, combinations):
+    """
+    Pre-render (var_type, time_idx, cmap, pressure_level) combinations, e.g.
+    the default view of every time step when a new run lands.
+    """
+    rendered = 0
+    for var_type, time_idx, cmap, pressure_level in combinations:
+        if render_plot_image(nc, var_type, time_idx, cmap, pressure_level) is not None:
+            rendered += 1
+    return rendered
@@ -0,0 +1,156 @@
+"""
+Headless batch job that materializes every derived 2-D product of a wrfout
+file into the product store, so the Streamlit pages never run wrf-python on
+the interactive path.
+
+    python precompute.py <wrfout path or URL> [--store DIR] [--workers N] [--render]
+
+Work is split into (variable, time step) units across processes. Each field is
+written atomically, so an interrupted run simply resumes where it stopped.
+Levels outside a time step's pressure range are never planned, so they are
+not retried on every run. The app reads products from PRODUCT_STORE_DIR
+(WRF_PRODUCT_STORE) only: a --store elsewhere must be exported there too.
+With --render the default view of every product is also rendered into the
+shared image cache.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from catalog import open_wrf_file
+from config import CMAP_OPTIONS, DATA_ACCESS_MODE, PRODUCT_STORE_DIR
+from data_loader import (
+    fetch_to_cache,
+    get_available_variables,
+    get_humidity,
+    get_rainfall,
+    get_temperature,
+    get_wind_speed
+)
+from metadata_index import step_pressure_ranges
+from product_store import product_key, product_path, write_product
+
+# Display name from get_available_variables -> (getter variable, uses pressure levels)
+PRODUCTS = {
+    'Wind Speed (10m)': ('wind', False),
+    'Temperature (2m)': ('temperature', False),
+    'Rainfall': ('rainfall', False),
+    'Humidity (2m)': ('humidity', False),
+    'Wind Speed': ('wind', True),
+    'Temperature': ('temperature', True),
+    'Relative Humidity': ('humidity', True)
+}
+
+GETTERS = {
+    'wind': get_wind_speed,
+    'temperature': get_temperature,
+    'rainfall': get_rainfall,
+    'humidity': get_humidity
+}
+
+
+def plan_units(nc, store):
+    """List the (variable, time_idx, levels) units that still have missing fields."""
+    key = product_key(nc)
+    available, pressure_levels = get_available_variables(nc)
+    n_times = len(nc.dimensions['Time']) if not isinstance(nc.dimensions['Time'], int) else nc.dimensions['Time']
+
+    ranges = step_pressure_ranges(nc, n_times)
+
+    units = []
+    for name, _ in available:
+        variable, on_levels = PRODUCTS[name]
+        for time_idx in range(n_times):
+            levels = [None]
+            if on_levels:
+                # The getters raise for levels outside this step's columns; there is nothing to store
+                low, high = ranges[time_idx] if ranges else (-float('inf'), float('inf'))
+                levels = [lvl for lvl in pressure_levels if low <= lvl <= high]
+            missing = [lvl for lvl in levels
+                       if not os.path.exists(product_path(store, key, variable, lvl, time_idx))]
+            if missing:
+                units.append((variable, time_idx, missing))
+    return key, units
+
+
+def compute_unit(location, store, key, variable, time_idx, levels):
+    """Worker: compute one variable at one time for the given levels and store it."""
+    nc = open_wrf_file(location)
+    getter = GETTERS[variable]
+    written = 0
+    try:
+        for level in levels:
+            try:
+                value = getter(nc, time_idx, level) if level else getter(nc, time_idx)
+            except ValueError:
+                continue  # invalid pressure data; plan_units already leaves out-of-range levels
+            if value is None:
+                continue
+            write_product(product_path(store, key, variable, level, time_idx), value)
+            written += 1
+    finally:
+        nc.close()
+    return written
+
+
+def warm_images(location):
+    """Render every product with its default colormap into the image cache."""
+    from plot_utils import warm_up_images
+
+    nc = open_wrf_file(location)
+    try:
+        available, pressure_levels = get_available_variables(nc)
+        n_times = len(nc.dimensions['Time']) if not isinstance(nc.dimensions['Time'], int) else nc.dimensions['Time']
+        combinations = []
+        for name, var_type in available:
+            group = name.split(' ')[0] if name != 'Relative Humidity' else 'Humidity'
+            cmap = CMAP_OPTIONS.get(group, ['viridis'])[0]
+            levels = pressure_levels if var_type == 'pressure' else [None]
+            combinations += [(name, t, cmap, lvl) for t in range(n_times) for lvl in levels]
+        rendered = warm_up_images(nc, combinations)
+    finally:
+        nc.close()
+    print(f"Rendered {rendered}/{len(combinations)} images")
+    return rendered
+
+
+def run(location, store=PRODUCT_STORE_DIR, workers=None, render=False):
+    if location.startswith(('http://', 'https://')) and DATA_ACCESS_MODE != 'range':
+        location = fetch_to_cache(location)  # download once, not once per worker
+
+    nc = open_wrf_file(location)
+    try:
+        key, units = plan_units(nc, store)
+    finally:
+        nc.close()
+    print(f"{len(units)} units to compute for {key} -> {store}")
+
+    start = time.perf_counter()
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(compute_unit, location, store, key, *unit): unit for unit in units}
+        for done, future in enumerate(as_completed(futures), 1):
+            variable, time_idx, _ = futures[future]
+            try:
+                written += future.result()
+            except Exception as e:
+                print(f"[{done}/{len(units)}] {variable} t={time_idx} failed: {e}")
+            else:
+                print(f"[{done}/{len(units)}] {variable} t={time_idx}")
+    print(f"Wrote {written} fields in {time.perf_counter() - start:.1f}s")
+    if render:
+        warm_images(location)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('location', help="wrfout file path or URL")
+    parser.add_argument('--store', default=PRODUCT_STORE_DIR,
+                        help="product store directory (default: %(default)s). The app only reads "
+                             "WRF_PRODUCT_STORE, so set it to the same directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--render', action='store_true', help="also pre-render default plot images")
+    args = parser.parse_args()
+    run(args.location, args.store, args.workers, args.render)
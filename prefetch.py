@@ -0,0 +1,199 @@
+"""
+Speculative prefetch of the fields a user is likely to ask for next.
+
+People step through the forecast one time at a time, or move to the next
+pressure level. After a page has served a selection it schedules the
+neighbouring (time step, level) pairs here, and one low-priority thread
+extracts them with plot_field so the getters leave them in the shared field
+cache: the next rerun is a cache hit.
+
+Each session has at most one pending schedule. A new selection replaces the
+previous schedule, cancelling whatever of it has not started. The worker
+only starts a task while the dataset service has no foreground requests
+waiting, and drops the rest of a schedule once the fields its tasks put
+into the cache pass PREFETCH_MAX_BYTES.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from config import PREFETCH_AHEAD, PREFETCH_BEHIND, PREFETCH_ENABLED, PREFETCH_MAX_BYTES
+from dataset_service import get_dataset_service
+from field_cache import FIELD_CACHE
+from plot_utils import plot_field
+from tracing import register_stats
+
+IDLE_WAIT = 0.05  # seconds between checks for foreground requests
+NICE = 10  # niceness of the prefetch thread where the OS supports per-thread priorities
+
+
+class _Schedule:
+    def __init__(self, locate, tasks):
+        self.locate = locate
+        self.tasks = deque(tasks)
+        self.spent = 0
+        self.cancelled = False
+
+
+class Prefetcher:
+    """Warms the field cache on one background thread, one schedule per session."""
+
+    def __init__(self, max_bytes=PREFETCH_MAX_BYTES, idle_wait=IDLE_WAIT):
+        self.max_bytes = max_bytes
+        self.idle_wait = idle_wait
+        self._schedules = OrderedDict()  # owner -> _Schedule, served round-robin
+        self._wake = threading.Condition()
+        self._worker = None
+        self.scheduled = 0
+        self.warmed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.over_budget = 0
+        self.cached_bytes = 0
+
+    def schedule(self, owner, locate, tasks):
+        """
+        Replace `owner`'s pending prefetch with `tasks`, (step, var_type,
+        pressure_level) triples whose steps the context manager `locate`
+        turns into (dataset, time index).
+        """
+        with self._wake:
+            self._cancel(owner)
+            if tasks:
+                self._schedules[owner] = _Schedule(locate, tasks)
+                self.scheduled += len(tasks)
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='prefetch', daemon=True)
+                    self._worker.start()
+                self._wake.notify()
+
+    def cancel(self, owner):
+        with self._wake:
+            self._cancel(owner)
+
+    def _cancel(self, owner):
+        previous = self._schedules.pop(owner, None)
+        if previous is not None:
+            previous.cancelled = True
+            self.cancelled += len(previous.tasks)
+
+    def _next(self):
+        # Block until some session has work, then take one task from the longest-waiting one
+        with self._wake:
+            while not self._schedules:
+                self._wake.wait()
+            owner, schedule = next(iter(self._schedules.items()))
+            self._schedules.move_to_end(owner)
+            task = schedule.tasks.popleft()
+            if schedule.spent >= self.max_bytes:
+                self.over_budget += 1 + len(schedule.tasks)
+                schedule.tasks.clear()
+                task = None
+            if not schedule.tasks:
+                del self._schedules[owner]
+            return schedule, task
+
+    def _run(self):
+        _lower_priority()
+        service = get_dataset_service()
+        while True:
+            schedule, task = self._next()
+            if task is None:
+                continue
+            # Foreground reads first: wait for the I/O queue to drain
+            while service.pending() and not schedule.cancelled:
+                time.sleep(self.idle_wait)
+            if schedule.cancelled:
+                with self._wake:
+                    self.cancelled += 1
+                continue
+            step, var_type, pressure_level = task
+            # Charged for everything the task caches: the field, its levels, coordinates...
+            with FIELD_CACHE.measure() as added:
+                try:
+                    with schedule.locate(step) as (nc, time_idx):
+                        plot_field(nc, var_type, time_idx, pressure_level)
+                except Exception:
+                    failed = True  # the page reports the error if the user selects it
+                else:
+                    failed = False
+            with self._wake:
+                schedule.spent += added[0]
+                self.cached_bytes += added[0]
+                self.failed += failed
+                self.warmed += not failed
+
+    def stats(self):
+        with self._wake:
+            return {
+                'pending': sum(len(s.tasks) for s in self._schedules.values()),
+                'sessions': len(self._schedules),
+                'scheduled': self.scheduled,
+                'warmed': self.warmed,
+                'failed': self.failed,
+                'cancelled': self.cancelled,
+                'over_budget': self.over_budget,
+                'cached_bytes': self.cached_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+def _lower_priority():
+    # Linux applies nice values per thread; elsewhere the idle check alone keeps it out of the way
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+def neighbour_selections(time_axis, position, pressure_level=None, level_options=(),
+                         ahead=PREFETCH_AHEAD, behind=PREFETCH_BEHIND):
+    """
+    (TimeStep, level) pairs around time_axis[position], most likely first:
+    the next step, the adjacent levels, further steps ahead, then behind.
+    """
+    def steps(offsets):
+        return [(time_axis[position + k], pressure_level) for k in offsets if 0 <= position + k < len(time_axis)]
+
+    forward = steps(range(1, ahead + 1))
+    levels = []
+    if pressure_level in level_options:
+        i = list(level_options).index(pressure_level)
+        levels = [(time_axis[position], level_options[j]) for j in (i + 1, i - 1) if 0 <= j < len(level_options)]
+    return forward[:1] + levels + forward[1:] + steps(range(-1, -behind - 1, -1))
+
+
+def prefetch_neighbours(catalog, time_axis, positions, var_type, pressure_level=None, level_options=()):
+    """
+    After a page has served var_type at time_axis[p] for each p in
+    `positions`, warm the neighbouring steps and levels in the background,
+    replacing this session's previous prefetch.
+    """
+    if not PREFETCH_ENABLED:
+        return
+    selected = {(time_axis[p], pressure_level) for p in positions}
+    tasks = []
+    for p in positions:
+        for selection in neighbour_selections(time_axis, p, pressure_level, level_options):
+            if selection not in selected:
+                selected.add(selection)
+                tasks.append((selection[0], var_type, selection[1]))
+    ctx = get_script_run_ctx()
+    get_prefetcher().schedule(ctx.session_id if ctx else None, catalog.locate, tasks)
+
+
+_PREFETCHER = None
+_INIT_LOCK = threading.Lock()
+
+
+def get_prefetcher():
+    """Process-wide Prefetcher, created on first use."""
+    global _PREFETCHER
+    with _INIT_LOCK:
+        if _PREFETCHER is None:
+            _PREFETCHER = Prefetcher()
+            register_stats('prefetch', _PREFETCHER.stats)
+        return _PREFETCHER
@@ -0,0 +1,202 @@
+"""
+Interval rainfall (1/3/6/24 h totals) from WRF's cumulative RAINNC/RAINC.
+
+The cumulative totals are read once per run and domain as a (time, y, x)
+stack over the catalog's time axis, a few steps from each file, so windows
+span file boundaries (e.g. one output time per file). The bucket counters
+I_RAINNC/I_RAINC are folded back in when the run used bucket_mm. Datasets
+opened outside a catalog fall back to a stack of the file's own times.
+One vectorized diff turns the stack into per-step increments;
+a drop in the total (a restart, or a bucket reset the counters do not
+explain) restarts the accumulation instead of producing negative rain.
+The running sum of the increments is kept, so every window total is a
+single subtraction and the max/min over all windows is one reduction.
+"""
+import re
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+
+from field_cache import FIELD_CACHE, cached_field, dataset_identity
+from tracing import span, traced
+
+WINDOW_HOURS = [1, 3, 6, 24]
+RESET_TOLERANCE_MM = 0.01  # drops smaller than this are float noise, not resets
+RAIN_VARIABLES = ('RAINNC', 'RAINC')
+
+_WINDOW_PATTERN = re.compile(r'^Rainfall \((\d+)h\)$')
+
+
+def window_label(hours):
+    """Display name of a window, e.g. 'Rainfall (3h)'; 'Rainfall' is the run total."""
+    return f"Rainfall ({hours}h)" if hours else "Rainfall"
+
+
+def parse_window(var_type):
+    """Window length in hours of a display name from window_label, or None for the run total."""
+    match = _WINDOW_PATTERN.match(var_type)
+    return int(match.group(1)) if match else None
+
+
+def window_pairs(times, hours):
+    """(end, start) indices into `times` of every complete window of `hours`."""
+    index = {t: i for i, t in enumerate(times)}
+    length = timedelta(hours=hours)
+    pairs = [(end, index[t - length]) for end, t in enumerate(times) if t - length in index]
+    return np.array(pairs, dtype=int).reshape(-1, 2)
+
+
+def available_windows(times, hours_options=WINDOW_HOURS):
+    """Window lengths with at least one complete window in `times`."""
+    return [hours for hours in hours_options if len(window_pairs(times, hours))]
+
+
+def windows_ending_at(times, time_idx, hours_options=WINDOW_HOURS):
+    """Window lengths with a complete window ending at `time_idx`."""
+    return [hours for hours in hours_options if time_idx in window_pairs(times, hours)[:, 0]]
+
+
+def _read_cumulative(nc, time_indices=None):
+    # One contiguous read per variable covering the requested steps
+    if time_indices is None:
+        rows, picks = slice(None), slice(None)
+    else:
+        first = min(time_indices)
+        rows, picks = slice(first, max(time_indices) + 1), [t - first for t in time_indices]
+    bucket_mm = float(getattr(nc, 'BUCKET_MM', 0) or 0)
+    total = None
+    for name in RAIN_VARIABLES:
+        if name not in nc.variables:
+            continue
+        values = np.ma.filled(nc.variables[name][rows], 0).astype(np.float64)[picks]
+        counter = f'I_{name}'
+        if bucket_mm > 0 and counter in nc.variables:
+            values += np.ma.filled(nc.variables[counter][rows], 0)[picks] * bucket_mm
+        total = values if total is None else total + values
+    return total
+
+
+class RainfallStack:
+    """Per-step rainfall increments and their running total for one file."""
+
+    def __init__(self, times, cumulative):
+        self.times = list(times)
+        self._pair_cache = {}
+        increments = np.diff(cumulative, axis=0, prepend=np.zeros_like(cumulative[:1]))
+        reset = increments < -RESET_TOLERANCE_MM
+        # After a reset the accumulation starts again from zero
+        increments = np.where(reset, cumulative, np.maximum(increments, 0))
+        self.resets = np.flatnonzero(reset.reshape(len(self.times), -1).any(axis=1)).tolist()
+        self.increments = increments.astype(np.float32)
+        self.totals = np.cumsum(increments, axis=0)
+
+    @property
+    def nbytes(self):
+        return self.increments.nbytes + self.totals.nbytes
+
+    def _pairs(self, hours):
+        if hours not in self._pair_cache:
+            self._pair_cache[hours] = window_pairs(self.times, hours)
+        return self._pair_cache[hours]
+
+    def window(self, time_idx, hours):
+        """Rain (mm) in the `hours` ending at `time_idx`, or None before a full window exists."""
+        pairs = self._pairs(hours)
+        match = pairs[pairs[:, 0] == time_idx]
+        if not len(match):
+            return None
+        end, start = match[0]
+        return self.totals[end] - self.totals[start]
+
+    def windows(self, hours):
+        """(end time indices, totals stacked over every complete window)."""
+        pairs = self._pairs(hours)
+        return pairs[:, 0], self.totals[pairs[:, 0]] - self.totals[pairs[:, 1]]
+
+    def window_max(self, hours):
+        """Largest `hours` total at each grid cell over the run, or None."""
+        ends, totals = self.windows(hours)
+        return totals.max(axis=0) if len(ends) else None
+
+    def window_min(self, hours):
+        ends, totals = self.windows(hours)
+        return totals.min(axis=0) if len(ends) else None
+
+
+_RUN_CATALOG = None
+
+
+def use_catalog(catalog):
+    """Build window totals over `catalog`'s run time axes for the datasets it checks out."""
+    global _RUN_CATALOG
+    _RUN_CATALOG = catalog
+
+
+@traced()
+def get_run_rainfall_stack(catalog, run, domain):
+    """RainfallStack over the (run, domain) time axis, kept in the field cache."""
+    axis = catalog.time_axis(run, domain)
+    by_file = OrderedDict()
+    for position, step in enumerate(axis):
+        by_file.setdefault(step.location, []).append((position, step.time_idx))
+    versions = tuple(repr(catalog.metadata(location).get('source')) for location in by_file)
+
+    def build():
+        cumulative = None
+        with span('read cumulative rainfall', files=len(by_file)):
+            for location, steps in by_file.items():
+                with catalog.open(location) as nc:
+                    values = _read_cumulative(nc, [time_idx for _, time_idx in steps])
+                if values is None:
+                    return None
+                if cumulative is None:
+                    cumulative = np.empty((len(axis),) + values.shape[1:])
+                cumulative[[position for position, _ in steps]] = values
+        if cumulative is None:
+            return None
+        return RainfallStack([step.valid_time for step in axis], cumulative)
+
+    return FIELD_CACHE.get_or_compute((('run', run, domain) + versions, 'rainfall_stack', -1, None), build)
+
+
+def _run_stack(nc, time_idx):
+    # (run stack, position on the run axis) for a dataset the catalog has checked out
+    catalog = _RUN_CATALOG
+    location = catalog.pool.location_of(nc) if catalog is not None else None
+    run = catalog.run_of(location) if location is not None else None
+    if run is None:
+        return None, None
+    from metadata_index import valid_times
+
+    valid_time = valid_times(catalog.metadata(location))[time_idx]
+    positions = {step.valid_time: i for i, step in enumerate(catalog.time_axis(*run))}
+    return get_run_rainfall_stack(catalog, *run), positions.get(valid_time)
+
+
+@traced()
+def get_rainfall_stack(nc):
+    """RainfallStack of one dataset's own times, built on the first call and kept in the field cache."""
+    from catalog import _read_valid_times
+
+    def build():
+        with span('read cumulative rainfall'):
+            cumulative = _read_cumulative(nc)
+        if cumulative is None:
+            return None
+        return RainfallStack(_read_valid_times(nc), cumulative)
+
+    return FIELD_CACHE.get_or_compute((dataset_identity(nc), 'rainfall_stack', -1, None), build)
+
+
+@traced()
+@cached_field('rainfall_interval')
+def get_interval_rainfall(nc, time_idx, hours):
+    """Rain (mm) in the `hours` ending at `time_idx`, over the whole run where the catalog knows it."""
+    stack, position = _run_stack(nc, time_idx)
+    if stack is None or position is None:
+        stack, position = get_rainfall_stack(nc), time_idx
+    total = stack.window(position, hours) if stack is not None else None
+    if total is None:
+        raise ValueError(f"A {hours}h total needs {hours} hours of earlier output in this run")
+    return total
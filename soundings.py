@@ -0,0 +1,29 @@
+"""
+Tephigram of two station soundings.
+
+tephi is imported only when a tephigram is actually drawn, so the Stats page
+does not load it on reruns that never show one.
+"""
+from lazy_imports import lazy_module
+from tracing import traced
+
+tephi = lazy_module('tephi')
+plt = lazy_module('matplotlib.pyplot')
+
+
+@traced()
+def draw_tephigram(station, profile1, profile2, label1, label2):
+    """
+    Tephigram figure of two (pressure, temperature, dewpoint) profiles, the
+    first drawn dashed and the second solid.
+    """
+    # Customize tephigram
+    tephi.MIXING_RATIO_LINE.update({'color': 'purple', 'linewidth': 1, 'linestyle': '--'})
+    tpg = tephi.Tephigram(anchor=[(850, 30), (100, -100)])
+
+    for (pressure, temp, dewpoint), linestyle in ((profile1, '--'), (profile2, '-')):
+        tpg.plot(zip(pressure, temp), linestyle=linestyle, color='red')
+        tpg.plot(zip(pressure, dewpoint), linestyle=linestyle, color='blue')
+
+    plt.suptitle(f'{station} Tephigram:\n{label1} (Dashed) vs {label2} (Solid)', fontsize=14)
+    return plt.gcf()
@@ -0,0 +1,175 @@
+"""
+Synthetic WRF-like output files for benchmarking.
+
+    python synthetic_wrf.py out.nc [--ny 120] [--nx 150] [--levels 33] [--times 8]
+
+The file has the dimensions, global attributes and variables the app reads
+(every variable get_available_variables checks for, plus the pressure,
+geopotential and staggered wind fields wrf-python needs), filled with smooth,
+physically plausible values over the Kenya map extent. Fields are written one
+time step at a time, so large grids do not need to fit in memory.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import netCDF4
+import numpy as np
+
+KENYA_EXTENT = (33.5, 42.0, -5.0, 5.5)  # plot_utils.MAP_EXTENT, without importing the plotting stack
+P_TOP = 5000.0  # model top pressure [Pa]
+G = 9.81
+
+
+def _eta_levels(nz):
+    # Denser near the surface, like real WRF eta levels
+    znw = 1 - np.linspace(0, 1, nz + 1) ** 1.6
+    return 0.5 * (znw[:-1] + znw[1:]), znw
+
+
+def _variable(ds, name, dims, units, description, stagger='', dtype='f4', zlib=False):
+    var = ds.createVariable(name, dtype, dims, zlib=zlib)
+    var.FieldType = 104
+    var.MemoryOrder = {3: 'XY ', 4: 'XYZ', 2: 'Z  '}.get(len(dims), '0  ')
+    var.description = description
+    var.units = units
+    var.stagger = stagger
+    return var
+
+
+def make_synthetic_wrfout(path, ny=120, nx=150, nz=33, nt=8, interval_hours=3,
+                          start='2024-05-20_06:00:00', fmt='NETCDF4', zlib=False, seed=0,
+                          extent=KENYA_EXTENT):
+    """Write a synthetic wrfout file to `path` and return the path."""
+    rng = np.random.default_rng(seed)
+    west, east, south, north = extent
+    lon = np.linspace(west, east, nx)
+    lat = np.linspace(south, north, ny)
+    lon2d, lat2d = np.meshgrid(lon, lat)
+    dx = (east - west) / (nx - 1) * 111e3 * np.cos(np.radians(0.5 * (south + north)))
+    dy = (north - south) / (ny - 1) * 111e3
+    znu, znw = _eta_levels(nz)
+    start_time = datetime.strptime(start, '%Y-%m-%d_%H:%M:%S')
+
+    ds = netCDF4.Dataset(path, 'w', format=fmt)
+    try:
+        for name, size in [('Time', None), ('DateStrLen', 19), ('west_east', nx), ('south_north', ny),
+                           ('bottom_top', nz), ('bottom_top_stag', nz + 1),
+                           ('west_east_stag', nx + 1), ('south_north_stag', ny + 1)]:
+            ds.createDimension(name, size)
+        ds.setncatts({
+            'TITLE': ' OUTPUT FROM WRF V4.4 MODEL (SYNTHETIC)',
+            'START_DATE': start, 'SIMULATION_START_DATE': start,
+            'WEST-EAST_GRID_DIMENSION': nx + 1, 'SOUTH-NORTH_GRID_DIMENSION': ny + 1,
+            'BOTTOM-TOP_GRID_DIMENSION': nz + 1,
+            'DX': np.float32(dx), 'DY': np.float32(dy), 'DT': np.float32(60),
+            'GRID_ID': 1, 'PARENT_ID': 0, 'MAP_PROJ': 3, 'MAP_PROJ_CHAR': 'Mercator',
+            'CEN_LAT': np.float32(lat.mean()), 'CEN_LON': np.float32(lon.mean()),
+            'TRUELAT1': np.float32(0), 'TRUELAT2': np.float32(0),
+            'MOAD_CEN_LAT': np.float32(lat.mean()), 'STAND_LON': np.float32(lon.mean()),
+            'POLE_LAT': np.float32(90), 'POLE_LON': np.float32(0),
+            'MMINLU': 'MODIFIED_IGBP_MODIS_NOAH', 'NUM_LAND_CAT': 21
+        })
+
+        H = ('Time', 'south_north', 'west_east')
+        V = ('Time', 'bottom_top', 'south_north', 'west_east')
+        times = ds.createVariable('Times', 'S1', ('Time', 'DateStrLen'))
+        xtime = _variable(ds, 'XTIME', ('Time',), 'minutes since ' + start.replace('_', ' '), 'minutes since start')
+        fields = {
+            'XLAT': _variable(ds, 'XLAT', H, 'degree_north', 'LATITUDE, SOUTH IS NEGATIVE'),
+            'XLONG': _variable(ds, 'XLONG', H, 'degree_east', 'LONGITUDE, WEST IS NEGATIVE'),
+            'XLAT_U': _variable(ds, 'XLAT_U', ('Time', 'south_north', 'west_east_stag'), 'degree_north', 'LATITUDE', 'X'),
+            'XLONG_U': _variable(ds, 'XLONG_U', ('Time', 'south_north', 'west_east_stag'), 'degree_east', 'LONGITUDE', 'X'),
+            'XLAT_V': _variable(ds, 'XLAT_V', ('Time', 'south_north_stag', 'west_east'), 'degree_north', 'LATITUDE', 'Y'),
+            'XLONG_V': _variable(ds, 'XLONG_V', ('Time', 'south_north_stag', 'west_east'), 'degree_east', 'LONGITUDE', 'Y'),
+            'ZNU': _variable(ds, 'ZNU', ('Time', 'bottom_top'), '', 'eta values on half (mass) levels'),
+            'ZNW': _variable(ds, 'ZNW', ('Time', 'bottom_top_stag'), '', 'eta values on full (w) levels', 'Z'),
+            'HGT': _variable(ds, 'HGT', H, 'm', 'Terrain Height'),
+            'PSFC': _variable(ds, 'PSFC', H, 'Pa', 'SFC PRESSURE', zlib=zlib),
+            'T2': _variable(ds, 'T2', H, 'K', 'TEMP at 2 M', zlib=zlib),
+            'Q2': _variable(ds, 'Q2', H, 'kg kg-1', 'QV at 2 M', zlib=zlib),
+            'U10': _variable(ds, 'U10', H, 'm s-1', 'U at 10 M', zlib=zlib),
+            'V10': _variable(ds, 'V10', H, 'm s-1', 'V at 10 M', zlib=zlib),
+            'RAINC': _variable(ds, 'RAINC', H, 'mm', 'ACCUMULATED TOTAL CUMULUS PRECIPITATION', zlib=zlib),
+            'RAINNC': _variable(ds, 'RAINNC', H, 'mm', 'ACCUMULATED TOTAL GRID SCALE PRECIPITATION', zlib=zlib),
+            'P': _variable(ds, 'P', V, 'Pa', 'perturbation pressure', zlib=zlib),
+            'PB': _variable(ds, 'PB', V, 'Pa', 'BASE STATE PRESSURE', zlib=zlib),
+            'T': _variable(ds, 'T', V, 'K', 'perturbation potential temperature theta-t0', zlib=zlib),
+            'QVAPOR': _variable(ds, 'QVAPOR', V, 'kg kg-1', 'Water vapor mixing ratio', zlib=zlib),
+            'rh': _variable(ds, 'rh', V, '%', 'Relative Humidity', zlib=zlib),
+            'U': _variable(ds, 'U', ('Time', 'bottom_top', 'south_north', 'west_east_stag'), 'm s-1',
+                           'x-wind component', 'X', zlib=zlib),
+            'V': _variable(ds, 'V', ('Time', 'bottom_top', 'south_north_stag', 'west_east'), 'm s-1',
+                           'y-wind component', 'Y', zlib=zlib),
+            'PH': _variable(ds, 'PH', ('Time', 'bottom_top_stag', 'south_north', 'west_east'), 'm2 s-2',
+                            'perturbation geopotential', 'Z', zlib=zlib),
+            'PHB': _variable(ds, 'PHB', ('Time', 'bottom_top_stag', 'south_north', 'west_east'), 'm2 s-2',
+                             'base-state geopotential', 'Z', zlib=zlib),
+        }
+
+        # Time-invariant structure: highlands in the west, lower towards the coast
+        hgt = 2000 * np.exp(-((lon2d - 36.5) ** 2 + (lat2d + 0.5) ** 2) / 4) + 50
+        psfc = 101325 * np.exp(-hgt / 8000)
+        pb = P_TOP + znu[:, None, None] * (psfc - P_TOP)
+        phb = -287.0 * 280 * np.log((P_TOP + znw[:, None, None] * (psfc - P_TOP)) / psfc) + G * hgt
+        theta0 = np.broadcast_to(298 + 60 * (1 - znu[:, None, None]) ** 2, (nz, ny, nx))  # stable, increasing with height
+        rain = np.zeros((ny, nx))
+
+        for t in range(nt):
+            valid = start_time + timedelta(hours=t * interval_hours)
+            times[t] = np.frombuffer(valid.strftime('%Y-%m-%d_%H:%M:%S').encode(), dtype='S1')
+            xtime[t] = t * interval_hours * 60
+            phase = 2 * np.pi * (valid.hour / 24)
+            diurnal = 4 * np.sin(phase - np.pi / 2)
+
+            fields['XLAT'][t], fields['XLONG'][t] = lat2d, lon2d
+            lon_u = np.concatenate([lon - 0.5 * (lon[1] - lon[0]), [lon[-1] + 0.5 * (lon[1] - lon[0])]])
+            lat_v = np.concatenate([lat - 0.5 * (lat[1] - lat[0]), [lat[-1] + 0.5 * (lat[1] - lat[0])]])
+            fields['XLONG_U'][t], fields['XLAT_U'][t] = np.meshgrid(lon_u, lat)
+            fields['XLONG_V'][t], fields['XLAT_V'][t] = np.meshgrid(lon, lat_v)
+            fields['ZNU'][t], fields['ZNW'][t] = znu, znw
+            fields['HGT'][t] = hgt
+            fields['PSFC'][t] = psfc + rng.normal(0, 50, (ny, nx))
+
+            noise = rng.normal(0, 0.3, (nz, ny, nx))
+            theta = theta0 + diurnal * znu[:, None, None] ** 8 + noise
+            p = rng.normal(0, 30, (nz, ny, nx))
+            temp = theta * ((pb + p) / 100000) ** 0.286
+            qv = 0.016 * znu[:, None, None] ** 3 * (0.6 + 0.4 * np.cos(lat2d / 3 + phase))
+            es = 611.2 * np.exp(17.67 * (temp - 273.15) / (temp - 29.65))
+            e = qv * (pb + p) / (0.622 + qv)
+
+            fields['PB'][t], fields['P'][t] = pb, p
+            fields['T'][t] = theta - 300
+            fields['QVAPOR'][t] = qv
+            fields['rh'][t] = np.clip(100 * e / es, 0, 100)
+            fields['PHB'][t] = phb
+            fields['PH'][t] = rng.normal(0, 5, (nz + 1, ny, nx))
+
+            jet = 5 + 25 * (1 - znu) ** 2
+            fields['U'][t] = jet[:, None, None] * np.cos(np.radians(lat[None, :, None] * 10)) + rng.normal(0, 1, (nz, ny, nx + 1))
+            fields['V'][t] = 3 * np.sin(lon[None, None, :] + phase) + rng.normal(0, 1, (nz, ny + 1, nx))
+
+            fields['T2'][t] = temp[0] - 0.5
+            fields['Q2'][t] = qv[0]
+            fields['U10'][t] = 0.6 * (fields['U'][t, 0, :, :-1] + fields['U'][t, 0, :, 1:]) / 2
+            fields['V10'][t] = 0.6 * (fields['V'][t, 0, :-1, :] + fields['V'][t, 0, 1:, :]) / 2
+
+            # Convective showers over the highlands in the afternoon
+            rain += interval_hours * np.clip(rng.gamma(0.5, 1.0, (ny, nx)) * (hgt / 2000) * (1 + np.sin(phase)), 0, None)
+            fields['RAINNC'][t] = 0.7 * rain
+            fields['RAINC'][t] = 0.3 * rain
+    finally:
+        ds.close()
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('path', help="output NetCDF file")
+    parser.add_argument('--ny', type=int, default=120)
+    parser.add_argument('--nx', type=int, default=150)
+    parser.add_argument('--levels', type=int, default=33)
+    parser.add_argument('--times', type=int, default=8)
+    parser.add_argument('--zlib', action='store_true', help="deflate-compress the data variables")
+    args = parser.parse_args()
+    make_synthetic_wrfout(args.path, args.ny, args.nx, args.levels, args.times, zlib=args.zlib)
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The app is a set of flat modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep indexes and caches written during the tests out of the user's cache
+os.environ.setdefault('WRF_CACHE_DIR', tempfile.mkdtemp(prefix='wrf-tests-'))
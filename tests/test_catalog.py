@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+
+from catalog import Catalog
+from synthetic_wrf import make_synthetic_wrfout
+
+
+def test_single_file_with_a_wrfout_name(tmp_path):
+    path = make_synthetic_wrfout(str(tmp_path / 'wrfout_d02_2024-05-20_06:00:00'), ny=6, nx=8, nz=3, nt=2)
+    catalog = Catalog.from_source(path)
+    assert catalog.domains('default') == ['d02']
+    assert len(catalog.time_axis('default', 'd02')) == 2
+
+
+def test_single_file_with_any_name_reads_its_times(tmp_path):
+    path = make_synthetic_wrfout(str(tmp_path / 'run.nc'), ny=6, nx=8, nz=3, nt=3, start='2024-05-21_00:00:00')
+    catalog = Catalog.from_source(path)
+    entry, = catalog.entries
+    assert entry.start_time == datetime(2024, 5, 21)
+    assert [s.valid_time.hour for s in catalog.time_axis('default', entry.domain)] == [0, 3, 6]
+
+
+def test_file_without_times_is_rejected(tmp_path):
+    import netCDF4
+
+    path = str(tmp_path / 'empty.nc')
+    netCDF4.Dataset(path, 'w').close()
+    with pytest.raises(ValueError, match='empty.nc'):
+        Catalog.from_source(path)
@@ -0,0 +1,98 @@
+import os
+
+import netCDF4
+import numpy as np
+import pytest
+
+from field_cache import FieldCache, cached_field, dataset_identity
+from synthetic_wrf import make_synthetic_wrfout
+
+
+def _array(kb):
+    return np.zeros(kb * 1024 // 8)
+
+
+@pytest.fixture
+def wrfout(tmp_path):
+    path = make_synthetic_wrfout(str(tmp_path / 'wrfout_d01_2024-05-20_06:00:00'), ny=10, nx=12, nz=4, nt=2)
+    nc = netCDF4.Dataset(path)
+    yield nc
+    nc.close()
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = FieldCache(max_bytes=3 * 1024)
+    for key in 'abc':
+        cache.put(key, _array(1))
+    cache.get('a')  # now most recently used
+    cache.put('d', _array(1))
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.current_bytes == 3 * 1024
+    assert cache.evictions == 1
+
+
+def test_large_entry_evicts_several():
+    cache = FieldCache(max_bytes=4 * 1024)
+    for key in 'abcd':
+        cache.put(key, _array(1))
+    cache.put('big', _array(3))
+    assert [key in cache for key in 'abcd'] == [False, False, False, True]
+    assert cache.current_bytes == 4 * 1024
+
+
+def test_tuples_are_sized_by_their_arrays():
+    cache = FieldCache(max_bytes=10 * 1024)
+    cache.put('wind', (_array(2), _array(1), _array(1)))
+    assert cache.current_bytes == 4 * 1024
+
+
+def test_oversized_values_are_not_cached():
+    cache = FieldCache(max_bytes=1024)
+    cache.put('small', _array(1))
+    cache.put('huge', _array(2))
+    assert 'huge' not in cache
+    assert 'small' in cache
+
+
+def test_replacing_a_key_updates_the_size():
+    cache = FieldCache(max_bytes=10 * 1024)
+    cache.put('a', _array(2))
+    cache.put('a', _array(1))
+    assert cache.current_bytes == 1024
+    assert cache.stats()['entries'] == 1
+
+
+def test_none_is_not_cached():
+    cache = FieldCache()
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute('missing', lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_cached_field_keys_by_file_time_and_level(wrfout):
+    cache = FieldCache()
+    calls = []
+
+    @cached_field('t2', cache=cache)
+    def getter(nc, time_idx, level=None):
+        calls.append((time_idx, level))
+        return np.asarray(nc.variables['T2'][time_idx]) + (level or 0)
+
+    first = getter(wrfout, 1)
+    assert getter(wrfout, np.int64(1)) is first  # numpy indices share the entry
+    getter(wrfout, 1, 850)
+    getter(wrfout, 1, level=850)  # positional and keyword levels share the entry
+    getter(wrfout, 0)
+    assert calls == [(1, None), (1, 850), (0, None)]
+    assert (dataset_identity(wrfout), 't2', 1, 850) in cache
+    assert cache.hits == 2 and cache.misses == 3
+
+
+def test_identity_changes_with_the_file(wrfout):
+    before = dataset_identity(wrfout)
+    assert before[0] == wrfout.filepath()
+    stat = os.stat(wrfout.filepath())
+    os.utime(wrfout.filepath(), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert dataset_identity(wrfout) != before
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+pytest.importorskip('scipy')
+
+from grid_locator import GridLocator, read_columns
+
+NY, NX = 14, 18
+
+
+def _affine_grid():
+    # Rotated and sheared, so lat and lon both vary along each grid axis
+    j, i = np.mgrid[0:NY, 0:NX].astype(np.float64)
+    return -3.0 + 0.09 * j + 0.02 * i, 35.0 - 0.015 * j + 0.1 * i
+
+
+def _curved_grid():
+    # Lambert-like: meridians converge and parallels bend towards the edges
+    j, i = np.mgrid[0:NY, 0:NX].astype(np.float64)
+    lats = -3.0 + 0.09 * j + 0.0015 * (i - NX / 2) ** 2
+    lons = 35.0 + 0.1 * i * (1 - 0.01 * j)
+    return lats, lons
+
+
+def _interpolate(locator, field, lats, lons):
+    js, is_, weights = locator.bilinear(lats, lons)
+    return (field[js, is_] * weights).sum(axis=1)
+
+
+@pytest.mark.parametrize('make_grid', [_affine_grid, _curved_grid])
+def test_grid_node_returns_node_value(make_grid):
+    lats, lons = make_grid()
+    locator = GridLocator(lats, lons)
+    field = np.random.default_rng(1).normal(size=(NY, NX))
+    nodes = (np.array([0, 3, 7, NY - 1, 10]), np.array([0, 5, NX - 1, 4, 12]))
+    _, _, weights = locator.bilinear(lats[nodes], lons[nodes])
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+    np.testing.assert_allclose(_interpolate(locator, field, lats[nodes], lons[nodes]), field[nodes], atol=1e-9)
+
+
+def test_bilinear_field_is_reproduced():
+    lats, lons = _affine_grid()
+    locator = GridLocator(lats, lons)
+    j, i = np.mgrid[0:NY, 0:NX].astype(np.float64)
+    field = 2.0 + 0.5 * j - 1.5 * i + 0.25 * j * i
+
+    rng = np.random.default_rng(2)
+    fj, fi = rng.uniform(0, NY - 1, 50), rng.uniform(0, NX - 1, 50)
+    point_lats, point_lons = -3.0 + 0.09 * fj + 0.02 * fi, 35.0 - 0.015 * fj + 0.1 * fi
+    expected = 2.0 + 0.5 * fj - 1.5 * fi + 0.25 * fj * fi
+    np.testing.assert_allclose(_interpolate(locator, field, point_lats, point_lons), expected, atol=1e-9)
+
+
+def test_read_columns_matches_fancy_indexing():
+    rng = np.random.default_rng(3)
+    data = rng.normal(size=(4, 5, NY, NX))
+    var = xr.DataArray(data, dims=('Time', 'bottom_top', 'south_north', 'west_east'))
+    js, is_ = np.array([[2, 2, 3, 3], [9, 9, 10, 10]]), np.array([[4, 5, 4, 5], [15, 16, 15, 16]])
+    columns = read_columns(var, [0, 2, 3], js, is_)
+    assert columns.shape == (3, js.size, 5)
+    np.testing.assert_array_equal(columns, np.moveaxis(data[[0, 2, 3]][:, :, js.ravel(), is_.ravel()], 1, 2))
+
+
+def test_bilinear_columns_reproduce_bilinear_profiles():
+    lats, lons = _affine_grid()
+    locator = GridLocator(lats, lons)
+    j, i = np.mgrid[0:NY, 0:NX].astype(np.float64)
+    levels = np.arange(5.0)[:, None, None]
+    var = xr.DataArray((levels + 0.3 * j + 0.1 * j * i)[None], dims=('Time', 'bottom_top', 'south_north', 'west_east'))
+
+    fj, fi = np.array([1.25, 8.6]), np.array([3.5, 12.9])
+    js, is_, weights = locator.bilinear(-3.0 + 0.09 * fj + 0.02 * fi, 35.0 - 0.015 * fj + 0.1 * fi)
+    columns = read_columns(var, [0], js, is_).reshape(1, 2, 4, -1)
+    profiles = (columns * weights[None, :, :, None]).sum(axis=2)
+    expected = np.arange(5.0)[None, None, :] + (0.3 * fj + 0.1 * fj * fi)[None, :, None]
+    np.testing.assert_allclose(profiles, expected, atol=1e-9)
@@ -0,0 +1,67 @@
+import contextlib
+import os
+
+import netCDF4
+import pytest
+
+import metadata_index
+from metadata_index import file_metadata, load_metadata, sidecar_paths
+from synthetic_wrf import make_synthetic_wrfout
+
+
+class _Opener:
+    """open_dataset stand-in that reads `path` and counts how often it is called."""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    @contextlib.contextmanager
+    def __call__(self, location):
+        self.calls += 1
+        with netCDF4.Dataset(self.path) as nc:
+            yield nc
+
+
+@pytest.fixture
+def wrfout(tmp_path):
+    return make_synthetic_wrfout(str(tmp_path / 'wrfout_d01_2024-05-20_06:00:00'), ny=8, nx=10, nz=4, nt=2)
+
+
+def test_local_sidecar_is_reused_until_the_file_changes(wrfout):
+    opener = _Opener(wrfout)
+    first = file_metadata(wrfout, opener)
+    assert os.path.exists(wrfout + metadata_index.SIDECAR_SUFFIX)
+    assert file_metadata(wrfout, opener)['times'] == first['times'] and opener.calls == 1
+
+    # Same size, new mtime: a rewrite of the same cycle
+    stat = os.stat(wrfout)
+    os.utime(wrfout, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_metadata(wrfout) is None
+    file_metadata(wrfout, opener)
+    assert opener.calls == 2
+
+    # Different size: more output times appended
+    make_synthetic_wrfout(wrfout, ny=8, nx=10, nz=4, nt=3)
+    rebuilt = file_metadata(wrfout, opener)
+    assert opener.calls == 3
+    assert len(rebuilt['times']) == 3 and rebuilt['source'] != first['source']
+
+
+def test_remote_sidecar_follows_the_etag(wrfout, monkeypatch):
+    url = 'http://example.invalid/wrfout_d01_2024-05-20_06:00:00'
+    version = ['"v1"', 'Mon, 20 May 2024 06:00:00 GMT', 1234]
+    monkeypatch.setattr(metadata_index, 'DATA_ACCESS_MODE', 'range')
+    monkeypatch.setattr(metadata_index, 'remote_version', lambda location: '|'.join(map(str, version)))
+    opener = _Opener(wrfout)
+
+    file_metadata(url, opener)
+    file_metadata(url, opener)
+    assert opener.calls == 1
+    assert os.path.exists(sidecar_paths(url)[-1])
+
+    version[0] = '"v2"'
+    assert load_metadata(url) is None
+    file_metadata(url, opener)
+    assert opener.calls == 2
+    assert load_metadata(url)['source'].startswith('"v2"')
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import netCDF4
+import numpy as np
+import pytest
+
+from rainfall import RESET_TOLERANCE_MM, RainfallStack, _read_cumulative
+
+BUCKET_MM = 10.0
+RESTART = 5  # the model restarts from zero at this step
+
+
+@pytest.fixture(scope='module')
+def run():
+    """(valid times, true cumulative rain, dataset with bucketed RAINNC/RAINC)."""
+    rng = np.random.default_rng(3)
+    nt, ny, nx = 9, 3, 4
+    rain = rng.gamma(2.0, 2.5, size=(nt, ny, nx))  # mm per hour, large enough to tip the bucket
+    rain[0] = 0
+    cumulative = np.cumsum(rain, axis=0)
+    cumulative[RESTART:] -= cumulative[RESTART - 1]
+    nonconvective, convective = 0.6 * cumulative, 0.4 * cumulative
+
+    nc = netCDF4.Dataset('rain.nc', 'w', diskless=True)
+    nc.BUCKET_MM = BUCKET_MM
+    nc.createDimension('Time', None)
+    nc.createDimension('south_north', ny)
+    nc.createDimension('west_east', nx)
+    for name, total in (('RAINNC', nonconvective), ('RAINC', convective)):
+        counter = np.floor(total / BUCKET_MM)
+        nc.createVariable(name, 'f4', ('Time', 'south_north', 'west_east'))[:] = total - counter * BUCKET_MM
+        nc.createVariable(f'I_{name}', 'i4', ('Time', 'south_north', 'west_east'))[:] = counter
+    times = [datetime(2024, 5, 20) + timedelta(hours=t) for t in range(nt)]
+    yield times, cumulative, nc
+    nc.close()
+
+
+def _reference(cumulative):
+    # Per-cell loop: a drop in the total restarts the accumulation
+    increments = np.zeros_like(cumulative)
+    for t in range(cumulative.shape[0]):
+        for j in range(cumulative.shape[1]):
+            for i in range(cumulative.shape[2]):
+                previous = cumulative[t - 1, j, i] if t else 0.0
+                step = cumulative[t, j, i] - previous
+                increments[t, j, i] = cumulative[t, j, i] if step < -RESET_TOLERANCE_MM else max(step, 0.0)
+    return increments, np.cumsum(increments, axis=0)
+
+
+def test_bucket_counters_are_folded_back(run):
+    _, cumulative, nc = run
+    assert (np.asarray(nc.variables['I_RAINNC'][:]) > 0).any()  # the bucket did tip
+    np.testing.assert_allclose(_read_cumulative(nc), cumulative, atol=1e-5)
+    np.testing.assert_allclose(_read_cumulative(nc, [2, 4, 7]), cumulative[[2, 4, 7]], atol=1e-5)
+
+
+def test_increments_and_totals_match_loop(run):
+    times, cumulative, nc = run
+    stack = RainfallStack(times, _read_cumulative(nc))
+    increments, totals = _reference(cumulative)
+    assert stack.resets == [RESTART]
+    np.testing.assert_allclose(stack.increments, increments, atol=1e-4)
+    np.testing.assert_allclose(stack.totals, totals, atol=1e-4)
+    assert (stack.increments >= 0).all()
+
+
+def test_windows_span_the_restart(run):
+    times, cumulative, nc = run
+    stack = RainfallStack(times, _read_cumulative(nc))
+    increments, _ = _reference(cumulative)
+    assert stack.window(1, 3) is None
+    for end in range(3, len(times)):
+        np.testing.assert_allclose(stack.window(end, 3), increments[end - 2:end + 1].sum(axis=0), atol=1e-4)
+    ends, windows = stack.windows(3)
+    np.testing.assert_allclose(stack.window_max(3), windows.max(axis=0))
+    assert list(ends) == list(range(3, len(times)))
+
+
+def test_unfolded_bucket_tip_restarts_instead_of_going_negative(run):
+    times, _, nc = run
+    remainder = np.asarray(nc.variables['RAINNC'][:], dtype=np.float64)
+    stack = RainfallStack(times, remainder)
+    _, totals = _reference(remainder)
+    np.testing.assert_allclose(stack.totals, totals, atol=1e-4)
+    assert len(stack.resets) > 1 and (stack.increments >= 0).all()
@@ -0,0 +1,160 @@
+import http.server
+import io
+import os
+import re
+import threading
+
+import netCDF4
+import numpy as np
+import pytest
+
+from remote_reader import RemoteDataset
+from synthetic_wrf import make_synthetic_wrfout
+
+FORMATS = [
+    ('NETCDF3_CLASSIC', False),
+    ('NETCDF3_64BIT_OFFSET', False),
+    ('NETCDF4', False),
+    ('NETCDF4', True)
+]
+
+
+class _RangeHandler(http.server.SimpleHTTPRequestHandler):
+    # SimpleHTTPRequestHandler ignores Range; answer single ranges with 206
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        match = re.match(r'bytes=(\d+)-(\d+)$', self.headers.get('Range', ''))
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start, end = int(match[1]), min(int(match[2]), size - 1)
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        self.send_response(206)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('ETag', f'"{os.stat(path).st_mtime_ns}"')
+        self.end_headers()
+        return io.BytesIO(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def served(tmp_path_factory):
+    """(base URL, directory) of a Range-capable HTTP server."""
+    root = tmp_path_factory.mktemp('served')
+    handler = lambda *args, **kwargs: _RangeHandler(*args, directory=str(root), **kwargs)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}', root
+    server.shutdown()
+
+
+@pytest.fixture(params=FORMATS, ids=lambda p: p[0] + ('-zlib' if p[1] else ''))
+def remote_file(request, served, tmp_path):
+    fmt, zlib = request.param
+    base, root = served
+    name = f"wrfout_d01_{fmt}{'_zlib' if zlib else ''}_2024-05-20_06:00:00"
+    make_synthetic_wrfout(str(root / name), ny=12, nx=15, nz=6, nt=3, fmt=fmt, zlib=zlib)
+    local = netCDF4.Dataset(str(root / name))
+    local.set_auto_mask(False)
+    remote = RemoteDataset(f'{base}/{name}', cache_dir=str(tmp_path))
+    yield local, remote
+    remote.close()
+    local.close()
+
+
+def test_header_matches(remote_file):
+    local, remote = remote_file
+    assert {name: len(dim) for name, dim in local.dimensions.items()} == \
+        {name: dim if isinstance(dim, int) else len(dim) for name, dim in remote.dimensions.items()}
+    assert list(local.variables) == list(remote.variables)
+    assert remote.getncattr('DX') == pytest.approx(local.getncattr('DX'))
+    for name, var in local.variables.items():
+        assert remote.variables[name].shape == var.shape
+        assert remote.variables[name].dimensions == var.dimensions
+        assert remote.variables[name].ncattrs() == var.ncattrs()
+        if 'units' in var.ncattrs():
+            assert remote.variables[name].units == var.units
+
+
+@pytest.mark.parametrize('name, key', [
+    ('T2', np.s_[:]),
+    ('T2', np.s_[1]),
+    ('RAINNC', np.s_[-1, 3:9, 2:11]),
+    ('P', np.s_[0, 2]),
+    ('U', np.s_[2, :, 4:7, :]),
+    ('V', np.s_[1:, 1:5, 3, ::2]),
+    ('QVAPOR', np.s_[..., 5]),
+    ('XLAT', np.s_[0, :, 0]),
+    ('Times', np.s_[:])
+])
+def test_hyperslabs_match(remote_file, name, key):
+    local, remote = remote_file
+    expected = np.asarray(local.variables[name][key])
+    actual = np.asarray(remote.variables[name][key])
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_index_is_reused(remote_file, tmp_path):
+    local, remote = remote_file
+    again = RemoteDataset(remote.reader.url, cache_dir=str(tmp_path))
+    try:
+        assert again.reader.requests_made == 0  # header index read from the cache
+        np.testing.assert_array_equal(again.variables['T2'][2], local.variables['T2'][2])
+    finally:
+        again.close()
+
+
+def test_reads_only_requested_bytes(remote_file):
+    local, remote = remote_file
+    remote.reader.bytes_fetched = 0
+    remote.variables['PSFC'][1, 4, 5]
+    assert remote.reader.bytes_fetched < os.path.getsize(local.filepath()) / 4
+
+
+def test_unwritten_chunks_read_as_fill(served, tmp_path):
+    base, root = served
+    name = 'wrfout_d01_sparse_2024-05-20_06:00:00'
+    with netCDF4.Dataset(str(root / name), 'w', format='NETCDF4') as nc:
+        nc.createDimension('Time', None)
+        nc.createDimension('west_east', 8)
+        plain = nc.createVariable('A', 'f4', ('Time', 'west_east'), chunksizes=(1, 4))
+        filled = nc.createVariable('B', 'i2', ('Time', 'west_east'), chunksizes=(1, 4), fill_value=-99)
+        plain[0, :4] = np.arange(4)
+        filled[0, 4:] = np.arange(4)
+        plain[2, :] = 1
+        filled[2, :] = 1
+    local = netCDF4.Dataset(str(root / name))
+    local.set_auto_mask(False)
+    remote = RemoteDataset(f'{base}/{name}', cache_dir=str(tmp_path))
+    try:
+        for var in ('A', 'B'):
+            np.testing.assert_array_equal(remote.variables[var][:], local.variables[var][:])
+    finally:
+        remote.close()
+        local.close()
+
+
+@pytest.mark.parametrize('key', [np.s_[1:, 1:5, 3, ::2], np.s_[::2, ::3, 1:4, [0, 2, 5]]])
+def test_h5py_fallback_strided(served, tmp_path, key):
+    base, root = served
+    name = 'wrfout_d01_fletcher_2024-05-20_06:00:00'
+    data = np.random.default_rng(0).normal(size=(3, 6, 12, 15)).astype(np.float32)
+    with netCDF4.Dataset(str(root / name), 'w', format='NETCDF4') as nc:
+        for dim, size in zip(('Time', 'bottom_top', 'south_north', 'west_east'), data.shape):
+            nc.createDimension(dim, size)
+        # fletcher32 is not decoded natively, so reads go through h5py
+        nc.createVariable('V', 'f4', ('Time', 'bottom_top', 'south_north', 'west_east'),
+                          fletcher32=True)[:] = data
+    remote = RemoteDataset(f'{base}/{name}', cache_dir=str(tmp_path))
+    try:
+        np.testing.assert_array_equal(remote.variables['V'][key], data[key])
+    finally:
+        remote.close()
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from tracing import span, traced, traced_submit
+
+
+@traced()
+def _work(n):
+    with span('inner', n=n):
+        return n * 2
+
+
+def test_pool_spans_nest_under_the_submitting_span():
+    recorder = tracing.begin('rerun', enabled=True)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with span('panels'):
+            futures = [traced_submit(pool, _work, n) for n in range(3)]
+            assert [future.result() for future in futures] == [0, 2, 4]
+    assert tracing.finish() is recorder
+
+    (root,) = recorder.roots
+    (panels,) = root.children
+    assert [task.name for task in panels.children] == ['_work'] * 3
+    for task in panels.children:
+        assert task.attrs['thread'].startswith('ThreadPoolExecutor')
+        (call,) = task.children
+        assert call.name == '_work' and [c.name for c in call.children] == ['inner']
+        assert call.thread_id != root.thread_id and call.end_ns is not None
+    assert recorder.stack == []
+
+
+def test_submit_without_a_trace_runs_plainly():
+    tracing.begin('off', enabled=False)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert traced_submit(pool, _work, 4).result() == 8
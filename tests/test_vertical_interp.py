@@ -0,0 +1,70 @@
+import netCDF4
+import numpy as np
+import pytest
+
+from config import STANDARD_PRESSURE_LEVELS
+from synthetic_wrf import make_synthetic_wrfout
+from vertical_interp import LevelInterpolator
+
+
+@pytest.fixture(scope='module')
+def columns(tmp_path_factory):
+    """(pressure hPa, theta, QVAPOR) at one time of a synthetic file, each (nz, ny, nx)."""
+    path = make_synthetic_wrfout(str(tmp_path_factory.mktemp('interp') / 'wrfout_d01_2024-05-20_06:00:00'),
+                                 ny=14, nx=18, nz=20, nt=1)
+    with netCDF4.Dataset(path) as nc:
+        v = nc.variables
+        pressure = (np.asarray(v['P'][0], dtype=np.float64) + v['PB'][0]) / 100
+        return pressure, np.asarray(v['T'][0], dtype=np.float64) + 300, np.asarray(v['QVAPOR'][0], dtype=np.float64)
+
+
+def _reference(pressure, field, levels):
+    # The per-column loop the interpolator replaced; np.interp needs increasing pressure
+    out = np.full((len(levels),) + pressure.shape[1:], np.nan)
+    for j in range(pressure.shape[1]):
+        for i in range(pressure.shape[2]):
+            p, f = pressure[::-1, j, i], field[::-1, j, i]
+            out[:, j, i] = np.interp(levels, p, f, left=np.nan, right=np.nan)
+    return out
+
+
+def test_matches_np_interp(columns):
+    pressure, theta, qv = columns
+    interp = LevelInterpolator(pressure, STANDARD_PRESSURE_LEVELS)
+    theta_levels, qv_levels = interp.apply(theta, qv)
+    np.testing.assert_allclose(theta_levels, _reference(pressure, theta, STANDARD_PRESSURE_LEVELS), rtol=1e-10)
+    np.testing.assert_allclose(qv_levels, _reference(pressure, qv, STANDARD_PRESSURE_LEVELS), rtol=1e-10)
+
+
+def test_levels_outside_the_column_are_nan(columns):
+    pressure, theta, _ = columns
+    levels = [pressure[0].max() + 10, pressure[-1].min() - 1, 500]
+    result, = LevelInterpolator(pressure, levels).apply(theta)
+    assert np.isnan(result[0]).all()
+    assert np.isnan(result[1]).all()
+    assert np.isfinite(result[2]).all()
+
+
+def test_exact_model_levels(columns):
+    pressure, theta, _ = columns
+    # A target equal to a column's top or bottom pressure is inside it
+    column = pressure[:, 3, 4]
+    levels = [column[0], column[7], column[-1]]
+    result, = LevelInterpolator(pressure, levels).apply(theta)
+    np.testing.assert_allclose(result[:, 3, 4], theta[[0, 7, -1], 3, 4], rtol=1e-12)
+
+
+def test_non_standard_level(columns):
+    pressure, theta, _ = columns
+    single, = LevelInterpolator(pressure, [612.5]).apply(theta)
+    np.testing.assert_allclose(single, _reference(pressure, theta, [612.5]), rtol=1e-10)
+
+
+def test_level_index(columns):
+    pressure, _, _ = columns
+    interp = LevelInterpolator(pressure, STANDARD_PRESSURE_LEVELS)
+    assert interp.level_index(STANDARD_PRESSURE_LEVELS[2]) == 2
+    with pytest.raises(KeyError):
+        interp.level_index(612.5)
+    assert interp.p_min == pytest.approx(pressure.min())
+    assert interp.p_max == pytest.approx(pressure.max())
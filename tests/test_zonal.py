@@ -0,0 +1,136 @@
+import os
+
+import netCDF4
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip('geopandas')
+from shapely.geometry import Polygon, box
+
+from synthetic_wrf import make_synthetic_wrfout
+import zonal
+from zonal import county_label_grid, overlay_weights, summarize_all_counties, zonal_stats
+
+
+@pytest.fixture(scope='module')
+def grid(tmp_path_factory):
+    """(lats, lons, T2 with a few NaN cells) from a synthetic file."""
+    path = make_synthetic_wrfout(str(tmp_path_factory.mktemp('zonal') / 'wrfout_d01_2024-05-20_06:00:00'),
+                                 ny=40, nx=50, nz=4, nt=1)
+    with netCDF4.Dataset(path) as nc:
+        lats = np.asarray(nc.variables['XLAT'][0], dtype=np.float64)
+        lons = np.asarray(nc.variables['XLONG'][0], dtype=np.float64)
+        data = np.asarray(nc.variables['T2'][0], dtype=np.float64)
+    data[::7, ::5] = np.nan
+    return lats, lons, data
+
+
+@pytest.fixture(scope='module')
+def counties():
+    return gpd.GeoDataFrame({
+        'NAME_1': ['Alpha', 'Beta', 'Gamma', 'Offshore'],
+        'geometry': [
+            box(34.0, -4.0, 36.3, -1.2),
+            Polygon([(36.5, 0.0), (40.5, 0.5), (38.0, 4.5)]),
+            box(38.7, -4.6, 41.8, -0.3),
+            box(45.0, 0.0, 46.0, 1.0)  # outside the domain
+        ]
+    }, crs="EPSG:4326")
+
+
+def _reference(gdf, county_name, data, lats, lons):
+    # The per-point loop summarize_over_county used before the label grid
+    import pandas as pd
+
+    flat_points = []
+    for i in range(lats.shape[0]):
+        for j in range(lats.shape[1]):
+            flat_points.append({'lat': float(lats[i, j]), 'lon': float(lons[i, j]), 'value': float(data[i, j])})
+    df = pd.DataFrame(flat_points)
+    df_gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df['lon'], df['lat']), crs="EPSG:4326")
+    target = gdf[gdf['NAME_1'].str.lower() == county_name.lower()]
+    points = df_gdf[df_gdf.within(target.geometry.values[0])]
+    if points.empty:
+        return None
+    return {'count': int(points['value'].notna().sum()), 'mean': points['value'].mean(),
+            'min': points['value'].min(), 'max': points['value'].max()}
+
+
+def test_label_grid_matches_point_in_polygon(grid, counties):
+    lats, lons, data = grid
+    labels = county_label_grid(counties, lats, lons)
+    assert labels.shape == lats.shape
+    for k, name in enumerate(counties['NAME_1']):
+        expected = _reference(counties, name, data, lats, lons)
+        stats = zonal_stats(np.where(labels == k, 0, -1), data, 1)
+        if expected is None:
+            assert not (labels == k).any()
+            assert stats['count'][0] == 0 and np.isnan(stats['mean'][0])
+            continue
+        assert stats['count'][0] == expected['count']
+        for name_ in ('mean', 'min', 'max'):
+            assert stats[name_][0] == pytest.approx(expected[name_], rel=1e-12)
+
+
+def test_all_counties_in_one_pass(grid, counties):
+    lats, lons, data = grid
+    table = summarize_all_counties(counties, data, lats, lons)
+    assert list(table.index) == list(counties['NAME_1'])
+    for name in ('Alpha', 'Beta', 'Gamma'):
+        expected = _reference(counties, name, data, lats, lons)
+        assert table.loc[name, 'mean'] == pytest.approx(expected['mean'], rel=1e-12)
+        assert table.loc[name, 'max'] == pytest.approx(expected['max'], rel=1e-12)
+    assert table.loc['Offshore', 'count'] == 0
+
+
+def test_label_grid_is_reused(grid, counties):
+    lats, lons, _ = grid
+    assert county_label_grid(counties, lats, lons) is county_label_grid(counties, lats.copy(), lons.copy())
+    moved = counties.copy()
+    moved.geometry = moved.geometry.translate(xoff=0.5)
+    assert county_label_grid(moved, lats, lons) is not county_label_grid(counties, lats, lons)
+
+
+def test_zonal_stats_ignores_nan_and_unlabelled_cells():
+    labels = np.array([[0, 0, 1], [-1, 1, 2]])
+    data = np.array([[1.0, 3.0, np.nan], [100.0, 4.0, np.nan]])
+    stats = zonal_stats(labels, data, 4)
+    np.testing.assert_array_equal(stats['count'], [2, 1, 0, 0])
+    np.testing.assert_array_equal(stats['mean'][:2], [2.0, 4.0])
+    np.testing.assert_array_equal(stats['min'][:2], [1.0, 4.0])
+    assert np.isnan(stats['mean'][2:]).all() and np.isnan(stats['max'][2:]).all()
+
+
+def test_memory_caches_are_bounded(grid, counties, monkeypatch):
+    lats, lons, _ = grid
+    monkeypatch.setattr(zonal, 'ZONAL_MEMORY_ENTRIES', 2)
+    for shift in range(4):
+        county_label_grid(counties, lats + shift, lons)
+    assert len(zonal._LABEL_GRIDS) == 2
+
+
+def test_truncated_overlay_is_rebuilt(grid, counties, tmp_path):
+    lats, lons, _ = grid
+    lats, lons = lats[:10, :12], lons[:10, :12]
+    zonal._OVERLAYS.clear()
+    expected = overlay_weights(counties, lats, lons, cache_dir=str(tmp_path))
+    (path,) = tmp_path.glob('*.npz')
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+    zonal._OVERLAYS.clear()
+    rebuilt = overlay_weights(counties, lats, lons, cache_dir=str(tmp_path))
+    assert (rebuilt != expected).nnz == 0
+    assert zonal._OVERLAYS  # served from memory next time
+
+
+def test_overlay_files_stay_under_budget(grid, counties, tmp_path):
+    lats, lons, _ = grid
+    lats, lons = lats[:10, :12], lons[:10, :12]
+    zonal._OVERLAYS.clear()
+    overlay_weights(counties, lats, lons, cache_dir=str(tmp_path))
+    os.utime(next(tmp_path.glob('*.npz')), (0, 0))  # oldest
+    overlay_weights(counties, lats + 0.1, lons, cache_dir=str(tmp_path))
+    files = sorted(tmp_path.glob('*.npz'), key=os.path.getmtime)
+    assert len(files) == 2
+    zonal._evict_overlays(str(tmp_path), keep=str(files[1]), max_bytes=os.path.getsize(files[1]))
+    assert list(tmp_path.glob('*.npz')) == [files[1]]
@@ -0,0 +1,161 @@
+"""
+Spatial statistics of a variable over the whole forecast.
+
+The xarray dataset is read in blocks of time steps; each block is reduced
+over the domain (or one county's cells) in a single vectorized pass, so
+memory stays bounded by the block size rather than the forecast length.
+Pressure-level blocks interpolate every column of every step in the block
+to the level in one LevelInterpolator pass over the model-level variables.
+"""
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import TIMESERIES_LEVEL_CHUNK, TIMESERIES_TIME_CHUNK
+from vertical_interp import LevelInterpolator
+
+SERIES_UNITS = {
+    'Temperature (2m)': '°C',
+    'Rainfall': 'mm',
+    'Humidity (2m)': 'g/kg',
+    'Relative Humidity': '%',
+    'Wind Speed (10m)': 'm/s'
+}
+
+
+def _surface_block(ds, var_name, times):
+    """Surface field for the given time indices as an (nt, ny, nx) array."""
+    block = ds.isel(Time=times)
+    if var_name == 'Temperature (2m)':
+        return block['T2'].values - 273.15
+    if var_name == 'Rainfall':
+        return sum(block[name].values for name in ('RAINNC', 'RAINC') if name in block)
+    if var_name == 'Humidity (2m)':
+        if 'RH2' in block:
+            return block['RH2'].values
+        return block['Q2'].values * 1000  # Convert to g/kg
+    if var_name == 'Wind Speed (10m)':
+        return np.hypot(block['U10'].values, block['V10'].values)
+    return None
+
+
+def _relative_humidity(theta, p, qv):
+    """RH (%) from theta (K), pressure (Pa) and QVAPOR, as wrf-python's 'rh' diagnostic."""
+    tk = theta * (p / 100000.0) ** (287.0 / 1004.5)
+    es = 6.112 * np.exp(17.67 * (tk - 273.15) / (tk - 29.65))  # hPa
+    qvs = 0.622 * es / (0.01 * p - (1 - 0.622) * es)
+    return 100 * np.clip(qv / qvs, 0, 1)
+
+
+_LEVEL_INPUTS = {
+    'Wind Speed': ('U', 'V'),
+    'Temperature': ('T',),
+    'Relative Humidity': ('T', 'QVAPOR')
+}
+
+
+def _level_block(ds, var_name, times, pressure_level):
+    """Pressure-level field for the given time indices as an (nt, ny, nx) array."""
+    kind = next((k for k in _LEVEL_INPUTS if k in var_name), None)
+    if kind is None or not all(name in ds for name in _LEVEL_INPUTS[kind] + ('P', 'PB')):
+        return None
+    block = ds.isel(Time=times)
+    p = block['P'].values + block['PB'].values  # Pa, (nt, nz, ny, nx)
+    if kind == 'Wind Speed':
+        u, v = block['U'].values, block['V'].values
+        fields = [0.5 * (u[..., :-1] + u[..., 1:]), 0.5 * (v[:, :, :-1] + v[:, :, 1:])]  # destagger
+    elif kind == 'Temperature':
+        fields = [block['T'].values + 300.0]  # T is perturbation theta
+    else:
+        fields = [_relative_humidity(block['T'].values + 300.0, p, block['QVAPOR'].values)]
+
+    # Stack the steps' columns side by side so one interpolator covers the whole block
+    nt, nz, ny, nx = p.shape
+    def columns(a):
+        return a.transpose(1, 0, 2, 3).reshape(nz, nt * ny, nx)
+
+    interp = LevelInterpolator(columns(p) / 100, [pressure_level])
+    levelled = [field[0].reshape(nt, ny, nx) for field in interp.apply(*[columns(f) for f in fields])]
+    if kind == 'Wind Speed':
+        return np.hypot(*levelled)
+    if kind == 'Temperature':
+        return levelled[0] / ((1000.0 / pressure_level) ** 0.286) - 273.15
+    return levelled[0]
+
+
+def _getter_block(nc, var_name, times, pressure_level):
+    # Fallback through the wrf-python getters, one step at a time
+    from data_loader import get_humidity, get_temperature, get_wind_speed
+
+    fields = []
+    for t in times:
+        if 'Wind Speed' in var_name:
+            field = get_wind_speed(nc, t, pressure_level)[0]
+        elif 'Temperature' in var_name:
+            field = get_temperature(nc, t, pressure_level)
+        else:
+            field = get_humidity(nc, t, pressure_level)
+        fields.append(np.asarray(field, dtype=np.float64))
+    return np.stack(fields)
+
+
+def reduce_block(block, mask=None):
+    """mean/min/max/std over space for every time in an (nt, ny, nx) block."""
+    values = np.asarray(block, dtype=np.float64).reshape(block.shape[0], -1)
+    if mask is not None:
+        values = values[:, np.asarray(mask).ravel()]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN steps give NaN
+        return {
+            'mean': np.nanmean(values, axis=1),
+            'min': np.nanmin(values, axis=1),
+            'max': np.nanmax(values, axis=1),
+            'std': np.nanstd(values, axis=1)
+        }
+
+
+def compute_time_series(time_axis, open_dataset, to_xarray, var_name, pressure_level=None,
+                        mask=None, chunk=None):
+    """
+    Spatial mean/min/max/std of `var_name` at every step of a catalog time
+    axis, as a DataFrame indexed by valid time. `mask` restricts the
+    reduction to a boolean (ny, nx) region such as a county.
+    `open_dataset(location)` is a context manager such as Catalog.open.
+    """
+    if chunk is None:
+        chunk = TIMESERIES_TIME_CHUNK if pressure_level is None else TIMESERIES_LEVEL_CHUNK
+    by_file = OrderedDict()
+    for step in time_axis:
+        by_file.setdefault(step.location, []).append(step)
+
+    frames = []
+    for location, steps in by_file.items():
+        with open_dataset(location) as nc:
+            ds = to_xarray(nc)
+            for start in range(0, len(steps), chunk):
+                part = steps[start:start + chunk]
+                times = [s.time_idx for s in part]
+                if pressure_level is None:
+                    block = _surface_block(ds, var_name, times)
+                else:
+                    block = _level_block(ds, var_name, times, pressure_level)
+                if block is None:
+                    block = _getter_block(nc, var_name, times, pressure_level)
+                stats = reduce_block(block, mask)
+                frames.append(pd.DataFrame(stats, index=pd.DatetimeIndex([s.valid_time for s in part], name='time')))
+
+    if not frames:
+        return pd.DataFrame(columns=['mean', 'min', 'max', 'std'])
+    return pd.concat(frames).sort_index()
+
+
+def county_mask(gdf, county_name, lats, lons):
+    """Boolean (ny, nx) mask of the cells inside `county_name`, or None."""
+    from zonal import county_label_grid
+
+    matches = np.flatnonzero(gdf['NAME_1'].str.lower().to_numpy() == county_name.lower())
+    if not len(matches):
+        return None
+    return county_label_grid(gdf, lats, lons) == matches[0]
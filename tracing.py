@@ -0,0 +1,284 @@
+"""
+Lightweight span tracing of the data and plotting hot paths.
+
+Spans are recorded per thread, only while a trace has been started on that
+thread (a page rerun with WRF_TRACE=1 or ?debug=1 in the URL). Otherwise
+`span()` returns a shared no-op and `traced` calls straight through, so the
+instrumentation costs one thread-local lookup when disabled. Work handed
+to a thread pool through `traced_submit` records its spans under the span
+that submitted it, on the worker's own thread row.
+
+The span tree can be exported as nested JSON or in the Chrome trace event
+format (load it in chrome://tracing or https://ui.perfetto.dev).
+"""
+import functools
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from config import TRACE_ALLOCATIONS, TRACE_ENABLED
+
+MAX_ROOT_SPANS = 1000  # bound for threads that record without ever being read
+STATS_PROVIDERS = {}  # name -> callable returning a dict, shown in the debug panel
+
+class _TraceState(threading.local):
+    recorder = None  # class default keeps the disabled lookup free of AttributeError
+
+
+_local = _TraceState()
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'children', 'start_ns', 'end_ns', 'thread_id', '_alloc_start')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+        self.start_ns = None
+        self.end_ns = None
+        self.thread_id = threading.get_ident()
+        self._alloc_start = None
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'duration_ms': round(self.duration_ms, 3),
+            'attrs': self.attrs,
+            'children': [child.to_dict() for child in self.children]
+        }
+
+
+class _NullSpan:
+    """Stand-in returned when tracing is off; every operation is a no-op."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Recorder:
+    def __init__(self, allocations=False):
+        self.roots = []
+        self.stack = []
+        self.allocations = allocations
+        self.origin_ns = time.perf_counter_ns()
+
+    def open(self, span):
+        if self.allocations:
+            span._alloc_start = tracemalloc.get_traced_memory()[0]
+        span.start_ns = time.perf_counter_ns()
+        if self.stack:
+            self.stack[-1].children.append(span)
+        else:
+            if len(self.roots) >= MAX_ROOT_SPANS:
+                del self.roots[0]
+            self.roots.append(span)
+        self.stack.append(span)
+
+    def close(self, span):
+        span.end_ns = time.perf_counter_ns()
+        if self.allocations and span._alloc_start is not None:
+            span.attrs['alloc_mb'] = round((tracemalloc.get_traced_memory()[0] - span._alloc_start) / 2 ** 20, 3)
+        if self.stack and self.stack[-1] is span:
+            self.stack.pop()
+
+
+class _ActiveSpan:
+    __slots__ = ('recorder', 'span')
+
+    def __init__(self, recorder, span):
+        self.recorder = recorder
+        self.span = span
+
+    def __enter__(self):
+        self.recorder.open(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.span.attrs['error'] = exc_type.__name__
+        self.recorder.close(self.span)
+        return False
+
+
+def _recorder():
+    return _local.recorder
+
+
+def span(name, **attrs):
+    """Context manager recording `name` as a child of the current span."""
+    recorder = _recorder()
+    if recorder is None:
+        return _NULL_SPAN
+    return _ActiveSpan(recorder, Span(name, attrs))
+
+
+def annotate(**attrs):
+    """Attach attributes to the innermost open span, if any."""
+    recorder = _recorder()
+    if recorder is not None and recorder.stack:
+        recorder.stack[-1].attrs.update(attrs)
+
+
+def result_nbytes(value):
+    """Bytes held by an array result, or a tuple/list of them."""
+    if isinstance(value, (tuple, list)):
+        return sum(result_nbytes(v) for v in value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, io.BytesIO):
+        return value.getbuffer().nbytes
+    return int(getattr(value, 'nbytes', 0) or 0)
+
+
+def traced(name=None):
+    """Decorator recording each call as a span, with the size of the result."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder()
+            if recorder is None:
+                return func(*args, **kwargs)
+            with _ActiveSpan(recorder, Span(label, {})) as current:
+                result = func(*args, **kwargs)
+                current.attrs['result_mb'] = round(result_nbytes(result) / 2 ** 20, 3)
+                return result
+        return wrapper
+    return decorator
+
+
+def traced_submit(executor, fn, *args, **kwargs):
+    """executor.submit(fn, ...) with fn's spans recorded under the caller's current span."""
+    recorder = _recorder()
+    if recorder is None or not recorder.stack:
+        return executor.submit(fn, *args, **kwargs)
+    return executor.submit(_run_under, recorder.stack[-1], recorder.allocations, fn, args, kwargs)
+
+
+def _run_under(parent, allocations, fn, args, kwargs):
+    # A recorder of the worker's own whose stack starts at the submitting span,
+    # so concurrent workers never push onto the caller's stack
+    branch = Recorder(allocations)
+    branch.stack.append(parent)
+    previous, _local.recorder = _local.recorder, branch
+    try:
+        with _ActiveSpan(branch, Span(getattr(fn, '__name__', 'task'), {'thread': threading.current_thread().name})):
+            return fn(*args, **kwargs)
+    finally:
+        _local.recorder = previous
+
+
+def begin(name, enabled=TRACE_ENABLED, allocations=TRACE_ALLOCATIONS):
+    """
+    Start a fresh trace on this thread with a root span `name`, or stop
+    tracing on this thread when not `enabled`.
+    """
+    if not enabled:
+        _local.recorder = None
+        return None
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    recorder = Recorder(allocations)
+    _local.recorder = recorder
+    recorder.open(Span(name, {'pid': os.getpid()}))
+    return recorder
+
+
+def finish():
+    """Close any open spans, stop tracing on this thread and return the Recorder."""
+    recorder = _recorder()
+    if recorder is None:
+        return None
+    while recorder.stack:
+        recorder.close(recorder.stack[-1])
+    _local.recorder = None
+    return recorder
+
+
+def _walk(spans, depth=0):
+    for s in spans:
+        yield depth, s
+        yield from _walk(s.children, depth + 1)
+
+
+def to_json(recorder):
+    return json.dumps([root.to_dict() for root in recorder.roots], indent=2, default=str)
+
+
+def to_chrome_trace(recorder):
+    """Complete ('X') events in the Chrome trace event format."""
+    pid = os.getpid()
+    events = []
+    for _, s in _walk(recorder.roots):
+        end = s.end_ns if s.end_ns is not None else time.perf_counter_ns()
+        events.append({
+            'name': s.name,
+            'ph': 'X',
+            'ts': (s.start_ns - recorder.origin_ns) / 1e3,
+            'dur': (end - s.start_ns) / 1e3,
+            'pid': pid,
+            'tid': s.thread_id,
+            'args': s.attrs
+        })
+    return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, default=str)
+
+
+def format_tree(recorder):
+    lines = []
+    for depth, s in _walk(recorder.roots):
+        attrs = ' '.join(f"{k}={v}" for k, v in s.attrs.items() if k != 'pid')
+        lines.append(f"{'  ' * depth}{s.name:<{max(40 - 2 * depth, 8)}} {s.duration_ms:9.1f} ms  {attrs}")
+    return '\n'.join(lines)
+
+
+# === Streamlit debug panel ===
+def register_stats(name, provider):
+    """Show provider() (a dict of metrics) in the debug panel under `name`."""
+    STATS_PROVIDERS[name] = provider
+
+
+def begin_page(name):
+    """Trace this page rerun when WRF_TRACE is set or the URL has ?debug=1."""
+    import streamlit as st
+
+    return begin(name, TRACE_ENABLED or st.query_params.get('debug') == '1')
+
+
+def render_trace_panel():
+    """Sidebar expander with the span tree of this rerun; hidden when not tracing."""
+    recorder = finish()
+    if recorder is None:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("🔍 Trace", expanded=False):
+        st.code(format_tree(recorder), language=None)
+        st.download_button("Download JSON", to_json(recorder), file_name="trace.json",
+                           mime="application/json")
+        st.download_button("Download Chrome trace", to_chrome_trace(recorder),
+                           file_name="trace.chrome.json", mime="application/json")
+        for name, provider in STATS_PROVIDERS.items():
+            st.caption(name)
+            st.json(provider(), expanded=False)
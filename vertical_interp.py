@@ -0,0 +1,58 @@
+"""
+Vectorized interpolation of model-level fields to pressure levels.
+
+The bracketing model levels and linear weights are computed once per pressure
+column for every target level together, then applied to any number of 3-D
+fields with a single gather. Picking another level is then just an index.
+"""
+import numpy as np
+
+
+class LevelInterpolator:
+    """
+    Precomputed linear-in-pressure interpolation from model levels to `levels`.
+    `pressure` is (bottom_top, south_north, west_east) in hPa, decreasing upward.
+    """
+
+    def __init__(self, pressure, levels):
+        p = np.asarray(pressure, dtype=np.float64)
+        self.levels = np.asarray(levels, dtype=np.float64)
+        self.p_min = float(np.nanmin(p))
+        self.p_max = float(np.nanmax(p))
+        nz = p.shape[0]
+
+        # Number of model levels at or below each target level, per column
+        above = (p[None, :, :, :] >= self.levels[:, None, None, None]).sum(axis=1)
+        self.k0 = np.clip(above - 1, 0, nz - 2).astype(np.intp)
+        self.valid = (above >= 1) & (above <= nz - 1) | (above == nz) & np.isclose(
+            p[-1][None], self.levels[:, None, None])
+
+        rows, cols = np.indices(p.shape[1:])
+        self._rows, self._cols = rows[None], cols[None]
+        p0 = p[self.k0, self._rows, self._cols]
+        p1 = p[self.k0 + 1, self._rows, self._cols]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.weight = np.where(p1 != p0, (self.levels[:, None, None] - p0) / (p1 - p0), 0.0)
+
+    @property
+    def nbytes(self):
+        return self.k0.nbytes + self.weight.nbytes + self.valid.nbytes
+
+    def level_index(self, level):
+        matches = np.nonzero(np.isclose(self.levels, level))[0]
+        if not len(matches):
+            raise KeyError(f"{level} hPa is not one of the interpolated levels")
+        return int(matches[0])
+
+    def apply(self, *fields):
+        """
+        Interpolate one or more (bottom_top, south_north, west_east) fields.
+        Returns one (level, south_north, west_east) array per field, NaN where
+        a level lies outside the column.
+        """
+        stacked = np.stack([np.asarray(f, dtype=np.float64) for f in fields])
+        lower = stacked[:, self.k0, self._rows, self._cols]
+        upper = stacked[:, self.k0 + 1, self._rows, self._cols]
+        result = lower + self.weight[None] * (upper - lower)
+        result[:, ~self.valid] = np.nan
+        return list(result)
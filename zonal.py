@@ -0,0 +1,241 @@
+"""
+Zonal statistics of WRF fields over county polygons.
+
+Each grid cell is assigned once to the county containing it, producing an
+integer label grid. Statistics for one or all counties then reduce over the
+flattened field with bincount/reduceat instead of testing points per query.
+
+For area-weighted means over many small polygons (sub-counties) the exact
+cell/polygon overlap is stored as a sparse weight matrix on disk, keyed by a
+hash of the grid and the boundaries, so a zonal mean is one mat-vec. Both
+kinds are kept in small in-memory LRUs and the overlay files under a byte budget.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import OVERLAY_CACHE_DIR, OVERLAY_CACHE_MAX_BYTES, ZONAL_MEMORY_ENTRIES
+from lazy_imports import lazy_module
+
+gpd = lazy_module('geopandas')
+shapely = lazy_module('shapely')
+
+EQUAL_AREA_CRS = "EPSG:6933"
+
+_LABEL_GRIDS = OrderedDict()
+_OVERLAYS = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def _recall(cache, key):
+    with _CACHE_LOCK:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _remember(cache, key, value):
+    with _CACHE_LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > ZONAL_MEMORY_ENTRIES:
+            cache.popitem(last=False)
+    return value
+
+
+def grid_hash(lats, lons):
+    digest = hashlib.sha256()
+    for arr in (lats, lons):
+        arr = np.ascontiguousarray(np.asarray(arr, dtype=np.float64))
+        digest.update(str(arr.shape).encode())
+        digest.update(arr.tobytes())
+    return digest.hexdigest()
+
+
+def boundaries_hash(gdf):
+    digest = hashlib.sha256()
+    for wkb in gdf.geometry.to_wkb():
+        digest.update(wkb)
+    return digest.hexdigest()
+
+
+def county_label_grid(gdf, lats, lons):
+    """
+    Integer grid the shape of `lats` holding the row position in `gdf` of the
+    polygon containing each cell centre, or -1 outside every polygon.
+    Built once per (grid, boundaries) pair and reused afterwards.
+    """
+    key = (grid_hash(lats, lons), boundaries_hash(gdf))
+    labels = _recall(_LABEL_GRIDS, key)
+    if labels is None:
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        points = gpd.GeoDataFrame(
+            geometry=gpd.points_from_xy(lons.ravel(), lats.ravel()), crs="EPSG:4326"
+        )
+        polygons = gpd.GeoDataFrame(geometry=gdf.geometry.values, crs=gdf.crs or "EPSG:4326").to_crs("EPSG:4326")
+        polygons['label'] = np.arange(len(polygons))
+        joined = gpd.sjoin(points, polygons, how='inner', predicate='within')
+        joined = joined[~joined.index.duplicated(keep='first')]
+
+        labels = np.full(lats.size, -1, dtype=np.int32)
+        labels[joined.index.to_numpy()] = joined['label'].to_numpy()
+        labels = _remember(_LABEL_GRIDS, key, labels.reshape(lats.shape))
+    return labels
+
+
+def zonal_stats(labels, data, n_regions):
+    """
+    Per-region count, mean, min and max of `data` for labels 0..n_regions-1.
+    NaNs are ignored; regions without valid cells get NaN statistics.
+    """
+    labels = np.asarray(labels).ravel()
+    values = np.asarray(data, dtype=np.float64).ravel()
+    valid = (labels >= 0) & ~np.isnan(values)
+    labels, values = labels[valid], values[valid]
+
+    count = np.bincount(labels, minlength=n_regions)
+    total = np.bincount(labels, weights=values, minlength=n_regions)
+    mean = np.full(n_regions, np.nan)
+    np.divide(total, count, out=mean, where=count > 0)
+
+    minimum = np.full(n_regions, np.nan)
+    maximum = np.full(n_regions, np.nan)
+    if len(labels):
+        order = np.argsort(labels, kind='stable')
+        sorted_labels, sorted_values = labels[order], values[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        present = sorted_labels[starts]
+        minimum[present] = np.minimum.reduceat(sorted_values, starts)
+        maximum[present] = np.maximum.reduceat(sorted_values, starts)
+    return {'count': count, 'mean': mean, 'min': minimum, 'max': maximum}
+
+
+def summarize_all_counties(gdf, data, lats, lons, name_column='NAME_1'):
+    """mean/min/max/count of `data` for every county in `gdf` as a DataFrame."""
+    labels = county_label_grid(gdf, lats, lons)
+    stats = zonal_stats(labels, data, len(gdf))
+    return pd.DataFrame(stats, index=pd.Index(gdf[name_column].to_numpy(), name=name_column))
+
+
+# === Area-weighted overlays ===
+
+def _cell_corners(centres):
+    """Corner coordinates (ny+1, nx+1) of cells given their centres (ny, nx)."""
+    c = np.asarray(centres, dtype=np.float64)
+    # Extrapolate one row/column of centres on each side, then average 2x2 blocks
+    padded = np.pad(c, 1, mode='reflect', reflect_type='odd')
+    return 0.25 * (padded[:-1, :-1] + padded[1:, :-1] + padded[:-1, 1:] + padded[1:, 1:])
+
+
+def cell_polygons(lats, lons):
+    """Quadrilateral footprint of every grid cell, flattened row-major."""
+    clat, clon = _cell_corners(lats), _cell_corners(lons)
+    rings = np.stack([
+        np.stack([clon[:-1, :-1], clat[:-1, :-1]], axis=-1),
+        np.stack([clon[:-1, 1:], clat[:-1, 1:]], axis=-1),
+        np.stack([clon[1:, 1:], clat[1:, 1:]], axis=-1),
+        np.stack([clon[1:, :-1], clat[1:, :-1]], axis=-1),
+    ], axis=-2).reshape(-1, 4, 2)
+    return shapely.polygons(rings)
+
+
+def _compute_overlay(gdf, lats, lons):
+    from scipy import sparse
+
+    cells = gpd.GeoDataFrame(geometry=cell_polygons(lats, lons), crs="EPSG:4326")
+    polygons = gpd.GeoDataFrame(geometry=gdf.geometry.values, crs=gdf.crs or "EPSG:4326").to_crs("EPSG:4326")
+    pairs = gpd.sjoin(cells, polygons, how='inner', predicate='intersects')
+    cell_idx = pairs.index.to_numpy()
+    poly_idx = pairs['index_right'].to_numpy()
+
+    pieces = shapely.intersection(cells.geometry.values[cell_idx], polygons.geometry.values[poly_idx])
+    area = gpd.GeoSeries(pieces, crs="EPSG:4326").to_crs(EQUAL_AREA_CRS).area.to_numpy()
+
+    # Row p holds the area of each cell lying inside polygon p (m^2)
+    return sparse.csr_matrix((area, (poly_idx, cell_idx)), shape=(len(gdf), lats.size))
+
+
+def overlay_weights(gdf, lats, lons, cache_dir=OVERLAY_CACHE_DIR):
+    """
+    Sparse (n_polygons, n_cells) matrix of overlap areas between each polygon
+    and each grid cell. Persisted under `cache_dir`; a changed domain or
+    changed boundaries hash to a new file, so stale overlays are never reused.
+    """
+    from scipy import sparse
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    key = hashlib.sha256((grid_hash(lats, lons) + boundaries_hash(gdf)).encode()).hexdigest()
+    weights = _recall(_OVERLAYS, key)
+    if weights is not None:
+        return weights
+
+    path = os.path.join(cache_dir, f"{key}.npz")
+    try:
+        weights = sparse.load_npz(path).tocsr()
+        os.utime(path)  # mark as recently used for eviction
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # Missing or truncated file: rebuild it
+        weights = _compute_overlay(gdf, lats, lons)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npz.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            sparse.save_npz(f, weights)
+        os.replace(tmp_path, path)
+        _evict_overlays(cache_dir, keep=path)
+    return _remember(_OVERLAYS, key, weights)
+
+
+def _evict_overlays(cache_dir, keep, max_bytes=OVERLAY_CACHE_MAX_BYTES):
+    """Drop the least recently used overlay files beyond the byte budget."""
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.npz') and entry.path != keep:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # removed by another process mid-scan
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = os.path.getsize(keep) + sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def area_weighted_means(gdf, data, lats, lons, name_column=None):
+    """
+    Area-weighted mean of `data` over every polygon in `gdf`, ignoring NaN
+    cells. Returns a Series indexed by `name_column` (or the frame index).
+    """
+    weights = overlay_weights(gdf, lats, lons)
+    values = np.asarray(data, dtype=np.float64).ravel()
+    valid = ~np.isnan(values)
+    total = weights @ np.where(valid, values, 0.0)
+    covered = weights @ valid.astype(np.float64)
+    means = np.full(len(gdf), np.nan)
+    np.divide(total, covered, out=means, where=covered > 0)
+    index = gdf[name_column].to_numpy() if name_column else gdf.index
+    return pd.Series(means, index=index, name='mean')
+
+
+def subcounty_means(sub_gdf, county_name, data, lats, lons):
+    """
+    Area-weighted mean of `data` over every sub-county of `county_name`, as a
+    Series indexed by NAME_2. One overlay covers all sub-counties, so every
+    county reuses it.
+    """
+    means = area_weighted_means(sub_gdf, data, lats, lons, name_column='NAME_2')
+    return means[sub_gdf['NAME_1'].str.lower().to_numpy() == county_name.lower()]